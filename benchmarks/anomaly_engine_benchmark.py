@@ -0,0 +1,152 @@
+"""Throughput of the scalar anomaly detectors versus the vectorised batch engine.
+
+Facts are synthetic: most runs sit close to their baseline and a few percent
+regress on runtime, cost, skew or cluster sizing, roughly like a daily batch.
+Run with::
+
+    python benchmarks/anomaly_engine_benchmark.py --facts 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import time
+
+from dataproc_monitoring_agent.analytics.anomaly_detection import synthesize_anomaly_flags
+from dataproc_monitoring_agent.analytics.batch_anomaly_detection import (
+    AnomalyInput,
+    synthesize_anomaly_flags_batch,
+)
+from dataproc_monitoring_agent.analytics.performance_memory import BaselineStats
+from dataproc_monitoring_agent.repositories.bigquery_repository import DataprocFact
+
+
+def _inputs(count: int, families: int, anomaly_rate: float) -> list[AnomalyInput]:
+    rng = random.Random(0)
+    baselines = [
+        BaselineStats(
+            job_id=f"family_{family}",
+            job_type="SPARK",
+            cluster_name=f"cluster-{family % 10}",
+            p50_duration=600.0,
+            p95_duration=900.0,
+            avg_duration=620.0,
+            p50_app_vcore_seconds=4_000.0,
+            p95_app_vcore_seconds=6_000.0,
+            avg_app_vcore_seconds=4_200.0,
+            p50_app_memory_gb_seconds=16_000.0,
+            p95_app_memory_gb_seconds=24_000.0,
+            avg_app_memory_gb_seconds=16_500.0,
+            avg_max_over_median_ratio=1.4,
+            p95_task_duration_ms=1_200.0,
+            run_count=30,
+        )
+        for family in range(families)
+    ]
+    inputs = []
+    for index in range(count):
+        regress = rng.random() < anomaly_rate
+        scale = rng.uniform(1.6, 2.5) if regress else rng.uniform(0.8, 1.2)
+        fact = DataprocFact(
+            ingest_date="2024-05-01",
+            ingest_timestamp="2024-05-01T00:00:00+00:00",
+            project_id="demo-project",
+            region="us-central1",
+            cluster_name=f"cluster-{index % 10}",
+            job_id=f"family_{index % families}",
+            job_type="SPARK",
+            job_state="SUCCEEDED",
+            job_start_time=None,
+            job_end_time=None,
+            duration_seconds=600.0 * scale,
+            yarn_application_ids=[],
+            cluster_metrics={},
+            job_metrics={},
+            driver_log_excerpt=None,
+            yarn_log_excerpt=None,
+            spark_event_snippet=None,
+            anomaly_flags={},
+        )
+        inputs.append(
+            AnomalyInput(
+                fact=fact,
+                baseline=baselines[index % families],
+                spark_metrics={
+                    "jobs": [
+                        {"job_id": job, "max_over_median_ratio": rng.uniform(1.0, 2.0), "num_tasks": 200}
+                        for job in range(3)
+                    ]
+                    + ([{"job_id": 9, "max_over_median_ratio": 4.5}] if regress else []),
+                    "stages": [
+                        {"stage_id": stage, "name": "shuffle", "max_task_duration_ms": 900, "p95_task_duration_ms": 300}
+                        for stage in range(5)
+                    ],
+                },
+                cost_summary={
+                    "app_vcore_seconds": 4_200.0 * scale,
+                    "app_memory_gb_seconds": 16_500.0 * scale,
+                    "executor_peak": rng.randint(5, 9),
+                },
+                cluster_profile={"total_workers": 10, "primary_workers": 10},
+                job_family=f"family_{index % families}",
+                run_identifier=f"run_{index:08x}",
+            )
+        )
+    return inputs
+
+
+def _scalar(inputs: list[AnomalyInput]) -> list[dict]:
+    return [
+        synthesize_anomaly_flags(
+            item.fact,
+            baseline=item.baseline,
+            spark_metrics=item.spark_metrics,
+            cost_summary=item.cost_summary,
+            cluster_profile=item.cluster_profile,
+            job_family=item.job_family,
+            run_identifier=item.run_identifier,
+        )
+        for item in inputs
+    ]
+
+
+def _best_of(repeats: int, function, inputs: list[AnomalyInput]) -> tuple[float, list[dict]]:
+    best = float("inf")
+    result: list[dict] = []
+    for _ in range(repeats):
+        # Collect the previous run's payloads so they are not charged here.
+        result = []
+        gc.collect()
+        started = time.perf_counter()
+        result = function(inputs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--families", type=int, default=500)
+    parser.add_argument("--anomaly-rate", type=float, default=0.03)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for count in args.facts:
+        inputs = _inputs(count, args.families, args.anomaly_rate)
+
+        scalar_seconds, expected = _best_of(args.repeats, _scalar, inputs)
+        batch_seconds, actual = _best_of(args.repeats, synthesize_anomaly_flags_batch, inputs)
+
+        if actual != expected:
+            raise SystemExit(f"batch engine diverged from scalar detectors at {count} facts")
+        print(
+            f"{count:>7} facts: scalar={count / scalar_seconds:,.0f} facts/s "
+            f"batch={count / batch_seconds:,.0f} facts/s "
+            f"speedup={scalar_seconds / batch_seconds:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Wall time of in-process versus family-sharded process-pool fact building.
+
+Builds facts and anomaly flags for synthetic runs spread over ``--families``
+job families, once in-process and once per ``--workers`` value, and checks the
+serialised facts are identical. Run with::
+
+    python benchmarks/fact_build_parallel_benchmark.py --runs 20000 --workers 4 8 16
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+import os
+import random
+import time
+from typing import Any
+
+from dataproc_monitoring_agent.analytics.cluster_registry import ClusterConfigRegistry
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+from dataproc_monitoring_agent.tools import dataproc_pipeline
+
+AS_OF = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+
+def _runs(count: int, families: int, stages: int) -> list[tuple[Any, Any]]:
+    rng = random.Random(11)
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    run_states = []
+    for index in range(count):
+        family = f"family_{rng.randrange(families)}"
+        began = start + timedelta(seconds=index * 3)
+        run_states.append(
+            SparkRunState.from_payload(
+                {
+                    "application_start_time": began.isoformat(),
+                    "application_end_time": (began + timedelta(seconds=rng.uniform(30, 900))).isoformat(),
+                    "status": "SUCCEEDED",
+                    "dataproc_cluster_uuid": f"uuid-{index % 20}",
+                    "spark_jobid": f"{family}_{index:08x}",
+                    "application_id": f"application_{index}",
+                    "cluster_config_details": {"config": {"workerConfig": {"numInstances": 8}}},
+                    "spark_event_metrics": {
+                        "app": {
+                            "app_vcore_seconds": rng.uniform(10, 400),
+                            "app_memory_gb_seconds": rng.uniform(10, 900),
+                            "executor_peak": rng.randrange(1, 8),
+                        },
+                        "jobs": [{"job_id": 0, "max_over_median_ratio": rng.uniform(1, 4)}],
+                        "stages": [{"stage_id": stage, "max_task_duration_ms": 10} for stage in range(stages)],
+                    },
+                }
+            )
+        )
+    run_states.sort(key=dataproc_pipeline._run_state_sort_key)
+    registry = ClusterConfigRegistry()
+    return [(run_state, replace(registry.register(run_state))) for run_state in run_states]
+
+
+def _timed(config: MonitoringConfig, runs: list[tuple[Any, Any]]) -> tuple[float, list[dict]]:
+    started = time.perf_counter()
+    facts = dataproc_pipeline._build_facts(config, as_of=AS_OF, runs=runs, baselines={})
+    return time.perf_counter() - started, [fact.to_json() for fact in facts]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20_000)
+    parser.add_argument("--families", type=int, default=400)
+    parser.add_argument("--stages", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    runs = _runs(args.runs, args.families, args.stages)
+    config = MonitoringConfig(project_id="benchmark", region="us-central1")
+    baseline_seconds, expected = _timed(config, runs)
+    print(f"cpus={os.cpu_count()} runs={args.runs} in-process={baseline_seconds:.2f}s")
+    for workers in args.workers:
+        seconds, actual = _timed(
+            replace(config, fact_build_workers=workers, fact_build_parallel_min_runs=1), runs
+        )
+        assert actual == expected, f"{workers} workers produced different facts"
+        print(f"  workers={workers:>2}: {seconds:.2f}s speedup={baseline_seconds / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
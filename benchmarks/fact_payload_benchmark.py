@@ -0,0 +1,141 @@
+"""CPU and memory of building and serialising fact ``job_metrics`` payloads.
+
+``legacy`` reproduces the previous ``_build_fact``/``DataprocFact.to_json``
+pair: the run's ``spark_event_metrics`` were deep-copied to add two
+``metadata`` keys, and ``asdict`` copied the result again before it was
+encoded. ``overlay`` keeps the payload shared behind a ``MetadataOverlay``
+and merges the keys while encoding. Run with::
+
+    python benchmarks/fact_payload_benchmark.py --facts 5000 --stages 400
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+from dataclasses import asdict
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from dataproc_monitoring_agent.repositories.bigquery_repository import (
+    DataprocFact,
+    MetadataOverlay,
+)
+
+
+def _metrics(index: int, stages: int, jobs: int) -> dict[str, Any]:
+    return {
+        "app": {"app_id": f"application_{index}", "app_vcore_seconds": 10.0, "executor_peak": 4},
+        "jobs": [
+            {"job_id": job, "num_tasks": 200, "max_over_median_ratio": 1.2, "p95_task_duration_ms": 900}
+            for job in range(jobs)
+        ],
+        "stages": [
+            {
+                "stage_id": stage,
+                "num_tasks": 200,
+                "max_task_duration_ms": 1200,
+                "p95_task_duration_ms": 900,
+                "shuffle_read_bytes": 1 << 20,
+            }
+            for stage in range(stages)
+        ],
+    }
+
+
+def _fact(index: int, job_metrics: Any) -> DataprocFact:
+    return DataprocFact(
+        ingest_date="2024-05-01",
+        ingest_timestamp="2024-05-01T00:00:00+00:00",
+        project_id="demo-project",
+        region="us-central1",
+        cluster_name=f"cluster-{index % 20}",
+        job_id=f"family_{index % 200}",
+        job_type="SPARK",
+        job_state="SUCCEEDED",
+        job_start_time="2024-05-01T00:00:00+00:00",
+        job_end_time="2024-05-01T00:01:30+00:00",
+        duration_seconds=90.0,
+        yarn_application_ids=[f"application_{index}"],
+        cluster_metrics={"cluster_profile": {"total_workers": 8}},
+        job_metrics=job_metrics,
+        driver_log_excerpt=None,
+        yarn_log_excerpt=None,
+        spark_event_snippet=None,
+        anomaly_flags={},
+    )
+
+
+def _metadata(index: int) -> dict[str, str]:
+    return {"run_identifier": f"family_{index % 200}_{index:08x}", "job_family": f"family_{index % 200}"}
+
+
+def _legacy_build(index: int, metrics: dict[str, Any]) -> DataprocFact:
+    payload = copy.deepcopy(metrics)
+    section = payload.setdefault("metadata", {})
+    for key, value in _metadata(index).items():
+        section.setdefault(key, value)
+    return _fact(index, payload)
+
+
+def _legacy_to_json(fact: DataprocFact) -> dict:
+    payload = asdict(fact)
+    for column in ("cluster_metrics", "job_metrics", "anomaly_flags"):
+        payload[column] = json.dumps(payload[column]) if payload[column] else None
+    return payload
+
+
+def _overlay_build(index: int, metrics: dict[str, Any]) -> DataprocFact:
+    return _fact(index, MetadataOverlay(metrics, _metadata(index)))
+
+
+def _measure(
+    label: str,
+    build: Callable[[int, dict[str, Any]], DataprocFact],
+    to_json: Callable[[DataprocFact], dict],
+    payloads: list[dict[str, Any]],
+) -> list[dict]:
+    count = len(payloads)
+    gc.collect()
+    started = time.perf_counter()
+    facts = [build(index, metrics) for index, metrics in enumerate(payloads)]
+    built = time.perf_counter()
+    rows = [to_json(fact) for fact in facts]
+    serialised = time.perf_counter()
+    del facts, rows
+
+    gc.collect()
+    tracemalloc.start()
+    facts = [build(index, metrics) for index, metrics in enumerate(payloads)]
+    resident, _ = tracemalloc.get_traced_memory()
+    rows = [to_json(fact) for fact in facts]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:>8}: build={1e6 * (built - started) / count:.1f}us "
+        f"to_json={1e6 * (serialised - built) / count:.1f}us "
+        f"facts_resident={resident / count / 1024:.1f}KiB "
+        f"peak={peak / count / 1024:.1f}KiB (per fact)"
+    )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facts", type=int, default=5_000)
+    parser.add_argument("--stages", type=int, default=400)
+    parser.add_argument("--jobs", type=int, default=50)
+    args = parser.parse_args()
+
+    payloads = [_metrics(index, args.stages, args.jobs) for index in range(args.facts)]
+    legacy = _measure("legacy", _legacy_build, _legacy_to_json, payloads)
+    overlay = _measure("overlay", _overlay_build, DataprocFact.to_json, payloads)
+    assert legacy == overlay, "serialised rows differ"
+
+
+if __name__ == "__main__":
+    main()
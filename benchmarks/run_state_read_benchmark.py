@@ -0,0 +1,177 @@
+"""Compare the REST and Storage Read API paths of the run state fetch.
+
+The benchmark loads a synthetic ``cag_run_state`` table (unless ``--skip-load``
+is passed) and times the ingest path in both read modes, split into the fetch,
+the per-run payloads ``ingest_dataproc_signals`` stores, and the run states
+``build_performance_memory`` rebuilds from them::
+
+    python benchmarks/run_state_read_benchmark.py \
+        --project my-project --dataset scratch --rows 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from datetime import timedelta
+
+from google.cloud import bigquery
+
+from dataproc_monitoring_agent.config.settings import load_config
+from dataproc_monitoring_agent.repositories.bigquery_repository import utc_now
+from dataproc_monitoring_agent.repositories.run_state_repository import (
+    SparkRunState,
+    fetch_run_state_batch,
+    fetch_run_state_records,
+)
+
+
+def _synthetic_rows(count: int, *, stages: int):
+    now = utc_now()
+    for index in range(count):
+        start = now - timedelta(minutes=random.randint(1, 23 * 60))
+        end = start + timedelta(seconds=random.randint(30, 3600))
+        metrics = {
+            "app": {
+                "app_vcore_seconds": random.uniform(100, 10_000),
+                "app_memory_gb_seconds": random.uniform(100, 50_000),
+                "executor_peak": random.randint(1, 64),
+            },
+            "jobs": [
+                {
+                    "job_id": job_id,
+                    "num_tasks": random.randint(10, 2000),
+                    "max_over_median_ratio": random.uniform(1, 6),
+                    "p95_task_duration_ms": random.randint(100, 60_000),
+                }
+                for job_id in range(5)
+            ],
+            "stages": [
+                {
+                    "stage_id": stage_id,
+                    "name": f"stage-{stage_id}",
+                    "max_task_duration_ms": random.randint(100, 90_000),
+                    "p95_task_duration_ms": random.randint(100, 60_000),
+                }
+                for stage_id in range(stages)
+            ],
+        }
+        yield {
+            "run_date": start.date().isoformat(),
+            "application_start_time": start.isoformat(),
+            "application_end_time": end.isoformat(),
+            "status": "SUCCEEDED",
+            "dataproc_jobid": f"cluster-{index % 40}",
+            "dataproc_cluster_uuid": f"uuid-{index % 40}",
+            "spark_taskid": f"task_{index % 300}_{index:08x}",
+            "spark_jobid": f"job_{index % 300}_{index:08x}",
+            "cluster_config_details": json.dumps(
+                {"config": {"workerConfig": {"numInstances": 8}}}
+            ),
+            "log_location": f"gs://logs/{index}",
+            "application_id": f"application_{index}",
+            "spark_event_metrics": json.dumps(metrics),
+        }
+
+
+def _load_synthetic_table(client: bigquery.Client, table_id: str, rows: int, stages: int) -> None:
+    schema = [
+        bigquery.SchemaField("run_date", "DATE"),
+        bigquery.SchemaField("application_start_time", "TIMESTAMP"),
+        bigquery.SchemaField("application_end_time", "TIMESTAMP"),
+        bigquery.SchemaField("status", "STRING"),
+        bigquery.SchemaField("dataproc_jobid", "STRING"),
+        bigquery.SchemaField("dataproc_cluster_uuid", "STRING"),
+        bigquery.SchemaField("spark_taskid", "STRING"),
+        bigquery.SchemaField("spark_jobid", "STRING"),
+        bigquery.SchemaField("cluster_config_details", "STRING"),
+        bigquery.SchemaField("log_location", "STRING"),
+        bigquery.SchemaField("application_id", "STRING"),
+        bigquery.SchemaField("spark_event_metrics", "STRING"),
+    ]
+    job_config = bigquery.LoadJobConfig(
+        schema=schema,
+        write_disposition="WRITE_TRUNCATE",
+    )
+    client.load_table_from_json(
+        list(_synthetic_rows(rows, stages=stages)),
+        table_id,
+        job_config=job_config,
+    ).result()
+
+
+def _time_ingest(config, *, start_time, end_time) -> tuple[int, str, dict[str, float]]:
+    """Mirror the ingest and build steps of one read mode, timing each stage."""
+
+    timings = {}
+    started = time.perf_counter()
+    if config.run_state_read_mode == "storage":
+        batch = fetch_run_state_batch(config, start_time=start_time, end_time=end_time)
+        timings["fetch"] = time.perf_counter() - started
+        payloads = list(batch.iter_payloads())
+        read_mode = batch.read_mode
+    else:
+        records = fetch_run_state_records(config, start_time=start_time, end_time=end_time)
+        timings["fetch"] = time.perf_counter() - started
+        payloads = [record.to_payload() for record in records]
+        read_mode = "rest"
+    timings["payloads"] = time.perf_counter() - started - timings["fetch"]
+    run_states = [SparkRunState.from_payload(payload) for payload in payloads]
+    timings["total"] = time.perf_counter() - started
+    timings["run_states"] = timings["total"] - timings["fetch"] - timings["payloads"]
+    return len(run_states), read_mode, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--region", default="us-central1")
+    parser.add_argument("--dataset", required=True)
+    parser.add_argument("--table", default="cag_run_state_benchmark")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--stages", type=int, default=50)
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args()
+
+    table_id = f"{args.project}.{args.dataset}.{args.table}"
+    if not args.skip_load:
+        _load_synthetic_table(
+            bigquery.Client(project=args.project), table_id, args.rows, args.stages
+        )
+
+    end_time = utc_now()
+    start_time = end_time - timedelta(hours=24)
+    for read_mode in ("rest", "storage"):
+        config = load_config(
+            {
+                "project_id": args.project,
+                "region": args.region,
+                "run_state_dataset": args.dataset,
+                "run_state_table": args.table,
+                "run_state_read_mode": read_mode,
+                "run_state_read_streams": args.streams,
+            }
+        )
+        runs = []
+        for _ in range(args.repeat):
+            rows, effective_mode, timings = _time_ingest(
+                config, start_time=start_time, end_time=end_time
+            )
+            runs.append(timings)
+        best = min(runs, key=lambda timings: timings["total"])
+        stages = " ".join(
+            f"{stage}={best[stage]:.2f}s" for stage in ("fetch", "payloads", "run_states")
+        )
+        mean = sum(timings["total"] for timings in runs) / len(runs)
+        print(
+            f"{read_mode:>8}: rows={rows} effective_mode={effective_mode} "
+            f"best={best['total']:.2f}s ({stages}) mean={mean:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
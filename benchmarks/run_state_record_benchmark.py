@@ -0,0 +1,167 @@
+"""Per-record CPU and memory of ``SparkRunState`` before and after compilation.
+
+``LegacySparkRunState`` reproduces the previous property-based record, which
+re-ran the job-suffix regex and ``datetime.fromisoformat`` on every access and
+decoded the JSON columns eagerly. Run with::
+
+    python benchmarks/run_state_record_benchmark.py --records 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import json
+import re
+import time
+import tracemalloc
+from typing import Any
+
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+
+_JOB_SUFFIX_PATTERN = re.compile(r"_[0-9a-f]{6,}$", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class LegacySparkRunState:
+    application_start_time: str | None
+    application_end_time: str | None
+    spark_jobid: str | None
+    spark_taskid: str | None
+    application_id: str | None
+    dataproc_jobid: str | None
+    spark_event_metrics: dict[str, Any]
+    cluster_config_details: dict[str, Any]
+
+    @classmethod
+    def from_row(cls, row: dict[str, Any]) -> "LegacySparkRunState":
+        return cls(
+            application_start_time=row["application_start_time"],
+            application_end_time=row["application_end_time"],
+            spark_jobid=row["spark_jobid"],
+            spark_taskid=row["spark_taskid"],
+            application_id=row["application_id"],
+            dataproc_jobid=row["dataproc_jobid"],
+            spark_event_metrics=json.loads(row["spark_event_metrics"]),
+            cluster_config_details=json.loads(row["cluster_config_details"]),
+        )
+
+    @property
+    def job_family(self) -> str:
+        for candidate in (self.spark_jobid, self.spark_taskid, self.application_id):
+            normalized = _JOB_SUFFIX_PATTERN.sub("", candidate) if candidate else ""
+            if normalized:
+                return normalized
+        return ""
+
+    @property
+    def run_identifier(self) -> str:
+        for candidate in (self.spark_jobid, self.application_id, self.spark_taskid):
+            if candidate:
+                return candidate
+        return ""
+
+    @property
+    def primary_job_id(self) -> str:
+        return self.job_family or self.run_identifier
+
+    @property
+    def duration_seconds(self) -> float | None:
+        start = datetime.fromisoformat(self.application_start_time)
+        end = datetime.fromisoformat(self.application_end_time)
+        return max((end - start).total_seconds(), 0.0)
+
+    @property
+    def cost_summary(self) -> dict[str, Any]:
+        app = dict(self.spark_event_metrics.get("app") or {})
+        return {
+            "app_vcore_seconds": app.get("app_vcore_seconds"),
+            "app_memory_gb_seconds": app.get("app_memory_gb_seconds"),
+            "executor_peak": app.get("executor_peak"),
+        }
+
+
+def _rows(count: int, stages: int) -> list[dict[str, Any]]:
+    now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    metrics = json.dumps(
+        {
+            "app": {"app_vcore_seconds": 10.0, "app_memory_gb_seconds": 20.0, "executor_peak": 4},
+            "jobs": [{"job_id": job, "max_over_median_ratio": 1.2} for job in range(5)],
+            "stages": [{"stage_id": stage, "max_task_duration_ms": 10} for stage in range(stages)],
+        }
+    )
+    cluster = json.dumps({"config": {"workerConfig": {"numInstances": 8}}})
+    return [
+        {
+            "run_date": "2024-05-01",
+            "application_start_time": (now + timedelta(seconds=index)).isoformat(),
+            "application_end_time": (now + timedelta(seconds=index + 90)).isoformat(),
+            "status": "SUCCEEDED",
+            "dataproc_jobid": f"cluster-{index % 20}",
+            "dataproc_cluster_uuid": f"uuid-{index % 20}",
+            "spark_taskid": f"task_{index % 200}_{index:08x}",
+            "spark_jobid": f"job_{index % 200}_{index:08x}",
+            "cluster_config_details": cluster,
+            "log_location": None,
+            "application_id": f"application_{index}",
+            "spark_event_metrics": metrics,
+        }
+        for index in range(count)
+    ]
+
+
+def _touch(record: Any, accesses: int) -> None:
+    # Mirrors the memory builder: sort key, fact, local sample and baseline lookups.
+    for _ in range(accesses):
+        record.job_family
+        record.primary_job_id
+        record.run_identifier
+        record.duration_seconds
+        record.cost_summary
+
+
+def _measure(label: str, factory, rows: list[dict[str, Any]], accesses: int) -> None:
+    count = len(rows)
+
+    started = time.perf_counter()
+    records = [factory(row) for row in rows]
+    built = time.perf_counter()
+    for record in records:
+        _touch(record, 1)
+    first_access = time.perf_counter()
+    for record in records:
+        _touch(record, accesses)
+    finished = time.perf_counter()
+
+    tracemalloc.start()
+    unread = [factory(row) for row in rows]
+    unread_bytes, _ = tracemalloc.get_traced_memory()
+    for record in unread:
+        _touch(record, 1)
+    read_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{label:>9}: build={1e6 * (built - started) / count:.2f}us "
+        f"first_access={1e6 * (first_access - built) / count:.2f}us "
+        f"repeat_access={1e6 * (finished - first_access) / (count * accesses):.2f}us "
+        f"resident_unread={unread_bytes / count:.0f}B "
+        f"resident_read={read_bytes / count:.0f}B (per record)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20_000)
+    parser.add_argument("--stages", type=int, default=200)
+    parser.add_argument("--accesses", type=int, default=6)
+    args = parser.parse_args()
+
+    rows = _rows(args.records, args.stages)
+    _measure("legacy", LegacySparkRunState.from_row, rows, args.accesses)
+    _measure("compiled", SparkRunState.from_row, rows, args.accesses)
+
+
+if __name__ == "__main__":
+    main()
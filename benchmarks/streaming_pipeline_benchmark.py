@@ -0,0 +1,109 @@
+"""Peak traced memory of one monitoring cycle, materialised versus streaming.
+
+Runs ``ingest_dataproc_signals``, ``build_performance_memory`` and
+``generate_dataproc_report`` over synthetic run states with BigQuery stubbed
+out: the run state query yields generated rows lazily and the load job only
+receives the spooled NDJSON file. Streaming peak memory should stay flat as
+``--runs`` grows. Run with::
+
+    python benchmarks/streaming_pipeline_benchmark.py --runs 5000 20000 --chunk-rows 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Iterator
+
+from dataproc_monitoring_agent.repositories import bigquery_repository
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+from dataproc_monitoring_agent.tools import dataproc_pipeline
+
+WINDOW_END = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+
+class _ToolContext:
+    def __init__(self) -> None:
+        self.state: dict[str, Any] = {}
+
+
+def _run_states(count: int, stages: int) -> Iterator[SparkRunState]:
+    start = WINDOW_END - timedelta(hours=23)
+    for index in range(count):
+        began = start + timedelta(seconds=index * 80_000 / count)
+        yield SparkRunState.from_payload(
+            {
+                "application_start_time": began.isoformat(),
+                "application_end_time": (began + timedelta(seconds=300 + index % 600)).isoformat(),
+                "status": "SUCCEEDED",
+                "dataproc_jobid": f"cluster-{index % 20}",
+                "dataproc_cluster_uuid": f"uuid-{index % 20}",
+                "spark_jobid": f"family_{index % 300}_{index:08x}",
+                "application_id": f"application_{index}",
+                "cluster_config_details": {"config": {"workerConfig": {"numInstances": 8}}},
+                "spark_event_metrics": {
+                    "app": {"app_vcore_seconds": 100.0 + index % 37, "executor_peak": 4},
+                    "jobs": [{"job_id": 0, "max_over_median_ratio": 1.0 + index % 5}],
+                    "stages": [
+                        {"stage_id": stage, "max_task_duration_ms": 10} for stage in range(stages)
+                    ],
+                },
+            }
+        )
+
+
+def _cycle(runs: int, stages: int, *, streaming: bool, chunk_rows: int) -> tuple[float, int, int]:
+    os.environ["DATAPROC_STREAMING"] = "true" if streaming else "false"
+    os.environ["DATAPROC_STREAM_CHUNK_ROWS"] = str(chunk_rows)
+    dataproc_pipeline.fetch_run_state_records = lambda config, **kwargs: list(
+        _run_states(runs, stages)
+    )[::-1]
+    dataproc_pipeline.iter_run_state_records = lambda config, **kwargs: _run_states(runs, stages)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    context = _ToolContext()
+    dataproc_pipeline.ingest_dataproc_signals(tool_context=context)
+    result = dataproc_pipeline.build_performance_memory(tool_context=context)
+    dataproc_pipeline.generate_dataproc_report(tool_context=context)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result["persisted_rows"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, nargs="+", default=[5_000, 20_000])
+    parser.add_argument("--stages", type=int, default=40)
+    parser.add_argument("--chunk-rows", type=int, default=2_000)
+    args = parser.parse_args()
+
+    os.environ.update(
+        DATAPROC_PROJECT_ID="benchmark",
+        DATAPROC_REGION="us-central1",
+        DATAPROC_STATE_DIR=tempfile.mkdtemp(prefix="dataproc-stream-bench-"),
+    )
+    dataproc_pipeline.utc_now = lambda: WINDOW_END
+    dataproc_pipeline.ensure_performance_table = lambda config: None
+    dataproc_pipeline.load_baselines = lambda config, **kwargs: {}
+    bigquery_repository.bigquery.Client = lambda project: None
+    bigquery_repository._load_json_file = lambda client, config, spool, **kwargs: None
+
+    for runs in args.runs:
+        for streaming in (False, True):
+            elapsed, peak, rows = _cycle(
+                runs, args.stages, streaming=streaming, chunk_rows=args.chunk_rows
+            )
+            label = "streaming" if streaming else "materialised"
+            print(
+                f"{runs:>7} runs {label:>12}: {elapsed:.2f}s peak={peak / 2**20:.1f}MiB rows={rows}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,9 @@ def build_dataproc_monitoring_agent(model: str | None = None) -> Agent:
         instruction=(
             "Use the `ingest_dataproc_signals` tool to pull recent Spark application metrics "
             "from the cag_run_state table. Confirm the run and cluster counts and surface "
-            "noteworthy metrics."),
+            "noteworthy metrics. When several time horizons are requested (e.g. 1h, 24h, 7d), "
+            "pass them together as `horizons` so a single scan serves every view. In streaming "
+            "mode the runs are only read by the memory builder, which reports the counts."),
         tools=[FunctionTool(dataproc_pipeline.ingest_dataproc_signals)],
     )
 
@@ -22,11 +22,24 @@ def detect_job_runtime_anomaly(
     fact: DataprocFact,
     baseline: BaselineStats | None,
 ) -> Anomaly | None:
-    """Spot jobs exceeding their historical runtime baselines."""
+    """Spot jobs exceeding their historical runtime baselines.
+
+    When both the run and the baseline have a data volume, the verdict is
+    taken on seconds per GiB processed: a run that is slower only because it
+    read more data is reported as ``info``, and one that got slower per GiB
+    is a regression even if its raw runtime looks normal.
+    """
 
     if not fact.duration_seconds or fact.duration_seconds <= 0:
         return None
-    if not baseline or not baseline.p50_duration:
+    if not baseline:
+        return None
+    rate_ratio = _rate_ratio(
+        fact.duration_seconds, fact.processed_gb, baseline.p50_seconds_per_gb
+    )
+    if rate_ratio is not None:
+        return _detect_runtime_rate_anomaly(fact, baseline, rate_ratio)
+    if not baseline.p50_duration:
         return None
 
     ratio = fact.duration_seconds / baseline.p50_duration
@@ -63,6 +76,57 @@ def detect_job_runtime_anomaly(
     )
 
 
+def _detect_runtime_rate_anomaly(
+    fact: DataprocFact,
+    baseline: BaselineStats,
+    rate_ratio: float,
+) -> Anomaly | None:
+    processed_gb = fact.processed_gb
+    seconds_per_gb = fact.duration_seconds / processed_gb
+    raw_ratio = fact.duration_seconds / baseline.p50_duration if baseline.p50_duration else None
+    evidence = {
+        "job_id": fact.job_id,
+        "duration_seconds": fact.duration_seconds,
+        "baseline_p50_seconds": baseline.p50_duration,
+        "baseline_p95_seconds": baseline.p95_duration,
+        "baseline_run_count": baseline.run_count,
+        "processed_gb": processed_gb,
+        "seconds_per_gb": seconds_per_gb,
+        "baseline_p50_seconds_per_gb": baseline.p50_seconds_per_gb,
+        "rate_ratio": rate_ratio,
+    }
+
+    if rate_ratio >= 1.5:
+        return Anomaly(
+            kind="job_runtime_regression",
+            severity="critical" if rate_ratio >= 2.0 else "warning",
+            message=(
+                f"Runtime {fact.duration_seconds:.1f}s for {processed_gb:.1f} GiB is "
+                f"{seconds_per_gb:.1f}s/GiB vs baseline median "
+                f"{baseline.p50_seconds_per_gb:.1f}s/GiB ({rate_ratio:.1f}x slower per GiB)."
+            ),
+            evidence=evidence,
+            action=(
+                "Throughput dropped independently of the data volume; examine the heaviest "
+                "Spark stages for skew, spills or plan changes and consider optimising joins "
+                "or repartitioning."
+            ),
+        )
+
+    if raw_ratio is not None and raw_ratio >= 1.5:
+        return Anomaly(
+            kind="job_runtime_volume_growth",
+            severity="info",
+            message=(
+                f"Runtime {fact.duration_seconds:.1f}s vs baseline median "
+                f"{baseline.p50_duration:.1f}s ({raw_ratio:.1f}x) is explained by data volume: "
+                f"{seconds_per_gb:.1f}s/GiB vs baseline {baseline.p50_seconds_per_gb:.1f}s/GiB."
+            ),
+            evidence=evidence,
+        )
+    return None
+
+
 def detect_task_straggler(
     fact: DataprocFact,
     spark_metrics: dict[str, Any] | None,
@@ -156,21 +220,41 @@ def detect_cost_regression(
     baseline: BaselineStats | None,
     cost_summary: dict[str, Any] | None,
 ) -> Anomaly | None:
-    """Detect rising compute cost versus historical norms."""
+    """Detect rising compute cost versus historical norms.
+
+    A metric is compared per GiB processed when the run and the baseline
+    both have a data volume, and as a raw total otherwise.
+    """
 
     if not baseline or not cost_summary:
         return None
 
     current_vcores = _safe_float(cost_summary.get("app_vcore_seconds"))
     current_memory = _safe_float(cost_summary.get("app_memory_gb_seconds"))
+    processed_gb = fact.processed_gb
 
     findings: list[tuple[str, float, float]] = []
 
-    if current_vcores is not None and baseline.avg_app_vcore_seconds:
-        findings.append(("vcore_seconds", current_vcores, baseline.avg_app_vcore_seconds))
-
-    if current_memory is not None and baseline.avg_app_memory_gb_seconds:
-        findings.append(("memory_gb_seconds", current_memory, baseline.avg_app_memory_gb_seconds))
+    for metric_name, current_value, average, rate_average in (
+        (
+            "vcore_seconds",
+            current_vcores,
+            baseline.avg_app_vcore_seconds,
+            baseline.avg_vcore_seconds_per_gb,
+        ),
+        (
+            "memory_gb_seconds",
+            current_memory,
+            baseline.avg_app_memory_gb_seconds,
+            baseline.avg_memory_gb_seconds_per_gb,
+        ),
+    ):
+        if current_value is None:
+            continue
+        if processed_gb and rate_average is not None and rate_average > 0:
+            findings.append((f"{metric_name}_per_gb", current_value / processed_gb, rate_average))
+        elif average:
+            findings.append((metric_name, current_value, average))
 
     dominant: tuple[str, float, float] | None = None
     ratio_dominant: float = 0.0
@@ -200,17 +284,25 @@ def detect_cost_regression(
     action = (
         f"Review executor sizing and input volume; {metric_label} rose {ratio_dominant:.2f}x over baseline."
     )
+    evidence = {
+        "metric": metric_name,
+        "current": current_value,
+        "baseline_average": baseline_value,
+        "ratio": ratio_dominant,
+    }
+    if metric_name.endswith("_per_gb"):
+        action = (
+            f"Review executor sizing, spills and shuffle efficiency; {metric_label} rose "
+            f"{ratio_dominant:.2f}x over baseline independently of the data volume."
+        )
+        evidence["processed_gb"] = processed_gb
+        evidence["current_total"] = current_value * processed_gb
 
     return Anomaly(
         kind="cost_regression", 
         severity=severity,
         message=message,
-        evidence={
-            "metric": metric_name,
-            "current": current_value,
-            "baseline_average": baseline_value,
-            "ratio": ratio_dominant,
-        },
+        evidence=evidence,
         action=action,
     )
 
@@ -305,6 +397,25 @@ def synthesize_anomaly_flags(
     if cluster_hint:
         findings.append(cluster_hint)
 
+    return build_anomaly_payload(
+        findings,
+        baseline=baseline,
+        cost_summary=cost_summary,
+        job_family=job_family,
+        run_identifier=run_identifier,
+    )
+
+
+def build_anomaly_payload(
+    findings: list[Anomaly],
+    *,
+    baseline: BaselineStats | None,
+    cost_summary: dict[str, Any] | None,
+    job_family: str | None,
+    run_identifier: str | None,
+) -> dict:
+    """JSON-ready ``anomaly_flags`` for the findings of a single run."""
+
     cost_payload = {
         key: value
         for key, value in (cost_summary or {}).items()
@@ -321,6 +432,9 @@ def synthesize_anomaly_flags(
             "avg_app_memory_gb_seconds": baseline.avg_app_memory_gb_seconds,
             "avg_max_over_median_ratio": baseline.avg_max_over_median_ratio,
             "p95_task_duration_ms": baseline.p95_task_duration_ms,
+            "p50_seconds_per_gb": baseline.p50_seconds_per_gb,
+            "avg_vcore_seconds_per_gb": baseline.avg_vcore_seconds_per_gb,
+            "avg_memory_gb_seconds_per_gb": baseline.avg_memory_gb_seconds_per_gb,
             "run_count": baseline.run_count,
         }
 
@@ -353,6 +467,18 @@ def _safe_float(value: Any) -> float | None:
         return None
 
 
+def _rate_ratio(
+    value: float | None,
+    processed_gb: float | None,
+    baseline_rate: float | None,
+) -> float | None:
+    """``value`` per GiB over ``baseline_rate``; None when either side is missing."""
+
+    if value is None or not processed_gb or baseline_rate is None or not baseline_rate > 0:
+        return None
+    return value / processed_gb / baseline_rate
+
+
 def _extract_stage_lookup(spark_metrics: dict[str, Any] | None) -> list[dict[str, Any]]:
     if not spark_metrics or not isinstance(spark_metrics, dict):
         return []
@@ -0,0 +1,232 @@
+"""Local cache of per-family trailing baselines.
+
+Entries are kept in one JSON file per performance table and trailing window
+under ``<state_dir>/baseline_cache``, keyed by job family. An entry is served
+until it is older than ``baseline_cache_ttl_minutes`` or facts for its family
+are persisted, which invalidates it. Invalidated families are reloaded on a
+background thread so the next cycle finds them warm.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+from pathlib import Path
+import threading
+from typing import Any, Callable, Iterable
+
+from ..config.settings import MonitoringConfig
+from ..repositories.state_files import replace_atomically
+from .performance_memory import BaselineStats, load_baselines
+
+
+# Guards the read-modify-write of cache files between a cycle and the refresh
+# threads started by earlier cycles in the same process.
+_FILE_LOCK = threading.Lock()
+
+
+@dataclass(slots=True)
+class BaselineCacheStats:
+    hits: int = 0
+    misses: int = 0
+    queries: int = 0
+    refreshing: int = 0
+
+    def to_payload(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class BaselineCache:
+    """Per-family baselines of one table and trailing window, cached on disk.
+
+    :meth:`load_baselines` is a drop-in for the uncached loader restricted to
+    ``job_families``: cached families are served from disk and the rest are
+    loaded with one family-filtered query and stored. Families without
+    history are cached as well, so they are not queried again either.
+
+    ``invalidate`` tombstones families at ``as_of``; a load that started
+    before the tombstone cannot overwrite it, so a slow refresh never
+    resurrects a baseline that missed the newest facts.
+    """
+
+    def __init__(
+        self,
+        config: MonitoringConfig,
+        path: Path,
+        *,
+        ttl: timedelta,
+        load: Callable[..., dict[str, BaselineStats]] = load_baselines,
+    ) -> None:
+        self._config = config
+        self._path = path
+        self._ttl = ttl
+        self._load = load
+        self.stats = BaselineCacheStats()
+
+    def load_baselines(
+        self,
+        config: MonitoringConfig,
+        *,
+        as_of: datetime,
+        trailing_window: timedelta,
+        job_families: Iterable[str] | None = None,
+    ) -> dict[str, BaselineStats]:
+        if job_families is None:
+            # Unfiltered loads cannot be attributed to families; bypass the cache.
+            self.stats.queries += 1
+            return self._load(config, as_of=as_of, trailing_window=trailing_window)
+
+        families = {family for family in job_families if family}
+        with _FILE_LOCK:
+            entries = self._read()
+        baselines: dict[str, BaselineStats] = {}
+        missing: set[str] = set()
+        for family in families:
+            entry = entries.get(family)
+            if entry is None or not self._fresh(entry, as_of):
+                missing.add(family)
+            elif entry["baseline"] is not None:
+                baselines[family] = BaselineStats.from_payload(entry["baseline"])
+        self.stats.hits += len(families) - len(missing)
+        self.stats.misses += len(missing)
+        if not missing:
+            return baselines
+
+        loaded = self._load(
+            config,
+            as_of=as_of,
+            trailing_window=trailing_window,
+            job_families=missing,
+        )
+        self.stats.queries += 1
+        self._store(missing, loaded, as_of=as_of)
+        baselines.update(
+            (family, baseline) for family, baseline in loaded.items() if family in missing
+        )
+        return baselines
+
+    def invalidate(self, job_families: Iterable[str], *, as_of: datetime) -> None:
+        """Drop the cached baselines of families whose facts just landed."""
+
+        tombstone = {"baseline": None, "loaded_at": None, "invalidated_at": as_of.isoformat()}
+        with _FILE_LOCK:
+            entries = self._read()
+            for family in job_families:
+                if family:
+                    entries[family] = dict(tombstone)
+            self._write(entries, as_of=as_of)
+
+    def refresh(self, job_families: Iterable[str], *, as_of: datetime) -> threading.Thread | None:
+        """Reload ``job_families`` on a background thread and store the result.
+
+        The thread is not a daemon, so a short-lived process finishes the
+        refresh before it exits instead of dropping it.
+        """
+
+        families = {family for family in job_families if family}
+        if not families:
+            return None
+        self.stats.refreshing += len(families)
+        thread = threading.Thread(
+            target=self._refresh,
+            args=(families, as_of),
+            name="baseline-cache-refresh",
+        )
+        thread.start()
+        return thread
+
+    def _refresh(self, families: set[str], as_of: datetime) -> None:
+        try:
+            loaded = self._load(
+                self._config,
+                as_of=as_of,
+                trailing_window=self._config.baseline_window,
+                job_families=families,
+            )
+            self._store(families, loaded, as_of=as_of)
+        except (RuntimeError, OSError) as exc:
+            logging.warning("Background baseline refresh failed: %s", exc)
+
+    def _store(
+        self,
+        families: set[str],
+        loaded: dict[str, BaselineStats],
+        *,
+        as_of: datetime,
+    ) -> None:
+        loaded_at = as_of.isoformat()
+        with _FILE_LOCK:
+            entries = self._read()
+            for family in families:
+                invalidated_at = (entries.get(family) or {}).get("invalidated_at")
+                if invalidated_at and datetime.fromisoformat(invalidated_at) > as_of:
+                    continue
+                baseline = loaded.get(family)
+                entries[family] = {
+                    "baseline": asdict(baseline) if baseline is not None else None,
+                    "loaded_at": loaded_at,
+                    "invalidated_at": None,
+                }
+            self._write(entries, as_of=as_of)
+
+    def _fresh(self, entry: dict[str, Any], as_of: datetime) -> bool:
+        if not entry.get("loaded_at"):
+            return False
+        age = as_of - datetime.fromisoformat(entry["loaded_at"])
+        return timedelta(0) <= age <= self._ttl
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            payload = json.loads(self._path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return payload if isinstance(payload, dict) else {}
+
+    def _write(self, entries: dict[str, dict[str, Any]], *, as_of: datetime) -> None:
+        # Entries (and tombstones) past the TTL would only ever miss.
+        cutoff = as_of - self._ttl
+        kept = {
+            family: entry
+            for family, entry in entries.items()
+            if (stamp := entry.get("loaded_at") or entry.get("invalidated_at"))
+            and datetime.fromisoformat(stamp) >= cutoff
+        }
+        payload = json.dumps(kept)
+        replace_atomically(
+            self._path,
+            lambda temp_path: temp_path.write_text(payload, encoding="utf-8"),
+        )
+
+
+def open_baseline_cache(
+    config: MonitoringConfig,
+    *,
+    load: Callable[..., dict[str, BaselineStats]] = load_baselines,
+) -> BaselineCache | None:
+    """Return the configured baseline cache, or None when disabled.
+
+    The cache file is keyed on everything that shapes the cached baselines:
+    the source table (the rollup table when ``baseline_rollups`` is on), the
+    trailing window and the segment dimensions.
+    """
+
+    if not config.baseline_cache:
+        return None
+    source = (
+        f"rollups:{config.fully_qualified_baseline_rollup_table}"
+        if config.baseline_rollups
+        else f"facts:{config.fully_qualified_table}"
+    )
+    dimensions = ",".join("+".join(group) for group in config.baseline_dimension_sets)
+    key = hashlib.sha1(
+        f"{source}|{int(config.baseline_window.total_seconds())}|{dimensions}".encode("utf-8")
+    ).hexdigest()[:16]
+    return BaselineCache(
+        config,
+        config.state_path / "baseline_cache" / f"{key}.json",
+        ttl=config.baseline_cache_ttl,
+        load=load,
+    )
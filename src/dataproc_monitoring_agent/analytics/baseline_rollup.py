@@ -0,0 +1,440 @@
+"""Per-family daily rollups of mergeable baseline sketches.
+
+Each row of the rollup table summarises one job family's facts ingested on
+one day: run count, sums and counts for the averaged measures, and serialised
+:class:`QuantileSketch` payloads for the quantiled ones. Baselines merge the
+rows of the trailing window, so their cost follows the number of days rather
+than the number of runs.
+
+Each row also lists digests of the runs it counts in ``run_keys``. A run
+built again by an overlapping window or a retried cycle is recognised and
+not counted twice, whichever day of the window first counted it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+import hashlib
+import json
+from typing import Any, Iterable, Mapping
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from ..config.settings import MonitoringConfig
+from ..repositories.bigquery_repository import BASELINE_ROLLUP_SCHEMA, merge_rows
+from ..repositories.processed_run_repository import processed_run_retention
+from .local_baseline import LocalBaselineAccumulator, per_gb_rates
+from .performance_memory import BaselineStats
+
+
+_SKETCH_COLUMNS = (
+    "duration_sketch",
+    "app_vcore_seconds_sketch",
+    "app_memory_gb_seconds_sketch",
+    "p95_task_duration_ms_sketch",
+    "seconds_per_gb_sketch",
+)
+
+# Columns an accumulator is rebuilt from; ``run_keys`` grows with the runs of
+# the day, so only the dedup lookup reads it.
+_ACCUMULATOR_COLUMNS = ", ".join(
+    column.name
+    for column in BASELINE_ROLLUP_SCHEMA
+    if column.name not in ("run_keys", "updated_at")
+)
+
+
+# Keys of the samples built by the pipeline, packed into tuples while held.
+_SAMPLE_KEYS = (
+    "duration",
+    "vcores",
+    "memory",
+    "ratio",
+    "p95_task_duration_ms",
+    "job_type",
+    "seconds_per_gb",
+    "vcore_seconds_per_gb",
+    "memory_gb_seconds_per_gb",
+)
+
+
+def rollup_run_key(run_identifier: str | None, job_start_time: Any) -> str | None:
+    """Digest identifying one run in a rollup row's ``run_keys``."""
+
+    if not run_identifier:
+        return None
+    start = job_start_time
+    if isinstance(start, str):
+        try:
+            start = datetime.fromisoformat(start)
+        except ValueError:
+            start = None
+    if isinstance(start, datetime):
+        if not start.tzinfo:
+            start = start.replace(tzinfo=timezone.utc)
+        start = int(start.timestamp())
+    key = f"{run_identifier}@{'' if start is None else start}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass(slots=True)
+class _FamilySamples:
+    cluster_name: str
+    keyed: dict[str, tuple] = field(default_factory=dict)
+    unkeyed: list[tuple] = field(default_factory=list)
+
+
+class BaselineRollupBuilder:
+    """Per-family samples of the facts persisted on one ingest date.
+
+    Only facts with a duration are added, mirroring the ``duration_seconds IS
+    NOT NULL`` filter of the raw baseline query. Samples are held, packed,
+    until :meth:`accumulators` is told which runs the stored rollups already
+    count; a run added twice to the builder is kept once.
+    """
+
+    def __init__(self, rollup_date: str) -> None:
+        self.rollup_date = rollup_date
+        self._families: dict[str, _FamilySamples] = {}
+
+    def __len__(self) -> int:
+        return len(self._families)
+
+    def add(
+        self,
+        job_family: str,
+        cluster_name: str,
+        sample: dict[str, Any],
+        *,
+        run_key: str | None = None,
+    ) -> None:
+        if not job_family or sample.get("duration") is None:
+            return
+        entry = self._families.get(job_family)
+        if entry is None:
+            entry = self._families[job_family] = _FamilySamples(cluster_name)
+        entry.cluster_name = cluster_name
+        packed = tuple(sample.get(key) for key in _SAMPLE_KEYS)
+        if run_key is None:
+            entry.unkeyed.append(packed)
+        else:
+            entry.keyed.setdefault(run_key, packed)
+
+    def families(self) -> set[str]:
+        return set(self._families)
+
+    def accumulators(
+        self,
+        counted: Mapping[str, set[str]] | None = None,
+    ) -> Iterable[tuple[str, LocalBaselineAccumulator, str, list[str]]]:
+        """Accumulate each family's runs that ``counted`` does not list yet.
+
+        Yields the family, its accumulator, cluster name and the run keys the
+        accumulator counts; families with nothing new are left out.
+        """
+
+        for job_family, entry in self._families.items():
+            seen = (counted or {}).get(job_family, ())
+            run_keys = [key for key in entry.keyed if key not in seen]
+            if not run_keys and not entry.unkeyed:
+                continue
+            accumulator = LocalBaselineAccumulator(job_family)
+            for packed in [entry.keyed[key] for key in run_keys] + entry.unkeyed:
+                accumulator.add(dict(zip(_SAMPLE_KEYS, packed)))
+            yield job_family, accumulator, entry.cluster_name, run_keys
+
+
+def merge_baseline_rollups(
+    config: MonitoringConfig,
+    rollups: BaselineRollupBuilder,
+    *,
+    as_of: datetime,
+) -> int:
+    """Fold this cycle's rollups into the stored rows of the same day.
+
+    Runs already counted by a stored row of the period in which runs can be
+    re-ingested are skipped, so rebuilding a run never counts it twice.
+    Returns the number of family rows upserted.
+
+    The stored rows are read, merged and written back without a lock, so
+    cycles writing rollups of the same table must not run concurrently; the
+    later writer would drop the other's runs from the day's row.
+    """
+
+    if not len(rollups) or config.dry_run:
+        return 0
+
+    window_start = date.fromisoformat(rollups.rollup_date) - processed_run_retention(config)
+    families = sorted(rollups.families())
+    counted: dict[str, set[str]] = {}
+    stored_keys: dict[str, list[str]] = {}
+    for row in _query_rollups(
+        config,
+        """
+        SELECT job_id, rollup_date, run_keys
+        FROM `{table}`
+        WHERE rollup_date > @window_start
+          AND rollup_date <= @rollup_date
+          AND job_id IN UNNEST(@job_families)
+        """,
+        [
+            bigquery.ScalarQueryParameter("window_start", "DATE", window_start.isoformat()),
+            bigquery.ScalarQueryParameter("rollup_date", "DATE", rollups.rollup_date),
+            bigquery.ArrayQueryParameter("job_families", "STRING", families),
+        ],
+    ):
+        run_keys = list(row.get("run_keys") or ())
+        counted.setdefault(row["job_id"], set()).update(run_keys)
+        if _date_text(row["rollup_date"]) == rollups.rollup_date:
+            stored_keys[row["job_id"]] = run_keys
+
+    # Only the day's own rows are merged, so only they are read in full.
+    stored: dict[str, dict[str, Any]] = {}
+    if stored_keys:
+        for row in _query_rollups(
+            config,
+            f"""
+            SELECT {_ACCUMULATOR_COLUMNS}
+            FROM `{{table}}`
+            WHERE rollup_date = @rollup_date
+              AND job_id IN UNNEST(@job_families)
+            """,
+            [
+                bigquery.ScalarQueryParameter("rollup_date", "DATE", rollups.rollup_date),
+                bigquery.ArrayQueryParameter(
+                    "job_families", "STRING", sorted(stored_keys)
+                ),
+            ],
+        ):
+            stored[row["job_id"]] = row
+
+    rows = []
+    for job_family, accumulator, cluster_name, run_keys in rollups.accumulators(counted):
+        if job_family in stored:
+            accumulator = _accumulator_from_row(stored[job_family]).merge(accumulator)
+            run_keys = stored_keys.get(job_family, []) + run_keys
+        rows.append(
+            _row(
+                job_family,
+                rollups.rollup_date,
+                accumulator,
+                cluster_name,
+                as_of=as_of,
+                run_keys=run_keys,
+            )
+        )
+    merge_rows(
+        config,
+        table_id=config.fully_qualified_baseline_rollup_table,
+        rows=rows,
+        schema=BASELINE_ROLLUP_SCHEMA,
+        key_columns=("job_id", "rollup_date"),
+        partition_column="rollup_date",
+    )
+    return len(rows)
+
+
+def load_rollup_baselines(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+    trailing_window: timedelta,
+    job_families: Iterable[str] | None = None,
+) -> dict[str, BaselineStats]:
+    """Baselines merged from the daily rollups of the trailing window.
+
+    Days are whole: the window covers the ``trailing_window.days`` days up to
+    and including ``as_of``'s, so at most that many rows are merged per
+    family and the partial oldest day is left out.
+    """
+
+    params = [
+        bigquery.ScalarQueryParameter(
+            "window_start", "DATE", (as_of - trailing_window).date().isoformat()
+        ),
+        bigquery.ScalarQueryParameter("as_of", "DATE", as_of.date().isoformat()),
+    ]
+    family_filter = ""
+    if job_families is not None:
+        families = sorted({family for family in job_families if family})
+        if not families:
+            return {}
+        family_filter = "AND job_id IN UNNEST(@job_families)"
+        params.append(bigquery.ArrayQueryParameter("job_families", "STRING", families))
+
+    merged: dict[str, tuple[LocalBaselineAccumulator, str]] = {}
+    for row in _query_rollups(
+        config,
+        f"""
+        SELECT {_ACCUMULATOR_COLUMNS}
+        FROM `{{table}}`
+        WHERE rollup_date > @window_start
+          AND rollup_date <= @as_of
+          {family_filter}
+        ORDER BY job_id, rollup_date
+        """,
+        params,
+    ):
+        accumulator = _accumulator_from_row(row)
+        # Rows arrive oldest first, so the latest day names the cluster.
+        entry = merged.get(row["job_id"])
+        if entry is not None:
+            accumulator = entry[0].merge(accumulator)
+        merged[row["job_id"]] = (accumulator, row.get("cluster_name") or "unknown")
+
+    return {
+        job_family: accumulator.to_baseline(cluster_name)
+        for job_family, (accumulator, cluster_name) in merged.items()
+    }
+
+
+def backfill_baseline_rollups(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+    trailing_window: timedelta | None = None,
+) -> int:
+    """Rebuild the rollups of the trailing window from ``daily_facts``.
+
+    Seeds the rollup table before ``baseline_rollups`` is switched on for an
+    existing deployment. Stored rows of the covered days are replaced, so the
+    backfill can be re-run. Returns the number of family rows written.
+    """
+
+    trailing_window = trailing_window or config.baseline_window
+    client = bigquery.Client(project=config.project_id)
+    query = f"""
+        SELECT
+          job_id,
+          ingest_date,
+          run_identifier,
+          job_start_time,
+          job_type,
+          cluster_name,
+          duration_seconds,
+          app_vcore_seconds,
+          app_memory_gb_seconds,
+          max_over_median_ratio,
+          p95_task_duration_ms,
+          NULLIF(COALESCE(input_bytes, 0) + COALESCE(shuffle_read_bytes, 0), 0) / {1 << 30} AS processed_gb
+        FROM `{config.fully_qualified_table}`
+        WHERE ingest_date >= @window_start
+          AND ingest_date <= DATE(@as_of)
+          AND ingest_timestamp <= @as_of
+          AND duration_seconds IS NOT NULL
+        ORDER BY ingest_timestamp
+    """
+    # Whole days only, so every backfilled row is complete.
+    params = [
+        bigquery.ScalarQueryParameter(
+            "window_start", "DATE", (as_of - trailing_window).date().isoformat()
+        ),
+        bigquery.ScalarQueryParameter("as_of", "TIMESTAMP", as_of.isoformat()),
+    ]
+    job_config = bigquery.QueryJobConfig(query_parameters=params)
+    try:
+        result = client.query(query, job_config=job_config).result()
+    except exceptions.GoogleAPICallError as exc:
+        raise RuntimeError(f"Failed reading facts for the baseline rollup backfill: {exc}") from exc
+
+    builders: dict[str, BaselineRollupBuilder] = {}
+    # Rows arrive oldest first; a run ingested again on a later day is
+    # counted on the first one only, as merge_baseline_rollups would.
+    counted: dict[str, set[str]] = {}
+    for row in result:
+        run_key = rollup_run_key(row.run_identifier, row.job_start_time)
+        if run_key is not None:
+            seen = counted.setdefault(row.job_id, set())
+            if run_key in seen:
+                continue
+            seen.add(run_key)
+        rollup_date = _date_text(row.ingest_date)
+        builder = builders.get(rollup_date)
+        if builder is None:
+            builder = builders[rollup_date] = BaselineRollupBuilder(rollup_date)
+        sample = {
+            "duration": row.duration_seconds,
+            "vcores": row.app_vcore_seconds,
+            "memory": row.app_memory_gb_seconds,
+            "ratio": row.max_over_median_ratio,
+            "p95_task_duration_ms": row.p95_task_duration_ms,
+            "job_type": row.job_type,
+        }
+        sample.update(per_gb_rates(sample, row.processed_gb))
+        builder.add(row.job_id, row.cluster_name or "unknown", sample, run_key=run_key)
+
+    rows = [
+        _row(
+            job_family,
+            builder.rollup_date,
+            accumulator,
+            cluster_name,
+            as_of=as_of,
+            run_keys=run_keys,
+        )
+        for builder in builders.values()
+        for job_family, accumulator, cluster_name, run_keys in builder.accumulators()
+    ]
+    merge_rows(
+        config,
+        table_id=config.fully_qualified_baseline_rollup_table,
+        rows=rows,
+        schema=BASELINE_ROLLUP_SCHEMA,
+        key_columns=("job_id", "rollup_date"),
+        partition_column="rollup_date",
+    )
+    return len(rows)
+
+
+def _query_rollups(
+    config: MonitoringConfig,
+    query: str,
+    params: list,
+) -> Iterable[dict[str, Any]]:
+    client = bigquery.Client(project=config.project_id)
+    job_config = bigquery.QueryJobConfig(query_parameters=params)
+    try:
+        result = client.query(
+            query.format(table=config.fully_qualified_baseline_rollup_table),
+            job_config=job_config,
+        ).result()
+    except exceptions.GoogleAPICallError as exc:
+        raise RuntimeError(f"Failed reading baseline rollups: {exc}") from exc
+    return [dict(row.items()) for row in result]
+
+
+def _row(
+    job_family: str,
+    rollup_date: str,
+    accumulator: LocalBaselineAccumulator,
+    cluster_name: str,
+    *,
+    as_of: datetime,
+    run_keys: Iterable[str] = (),
+) -> dict[str, Any]:
+    row: dict[str, Any] = {
+        "job_id": job_family,
+        "rollup_date": rollup_date,
+        "cluster_name": cluster_name,
+        "updated_at": as_of.isoformat(),
+        "run_keys": list(run_keys),
+    }
+    for key, value in accumulator.to_payload().items():
+        if key in _SKETCH_COLUMNS:
+            value = json.dumps(value, separators=(",", ":"))
+        row[key] = value
+    return row
+
+
+def _accumulator_from_row(row: dict[str, Any]) -> LocalBaselineAccumulator:
+    payload = dict(row)
+    for column in _SKETCH_COLUMNS:
+        if payload.get(column):
+            payload[column] = json.loads(payload[column])
+    return LocalBaselineAccumulator.from_payload(row["job_id"], payload)
+
+
+def _date_text(value: Any) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
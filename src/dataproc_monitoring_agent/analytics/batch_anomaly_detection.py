@@ -0,0 +1,240 @@
+"""Vectorised evaluation of the anomaly detectors over a batch of runs.
+
+The threshold rules of ``detect_job_runtime_anomaly``,
+``detect_task_straggler``, ``detect_cost_regression`` and
+``detect_cluster_rightsizing`` are evaluated as NumPy masks over column arrays
+of the batch (durations, cost seconds, data volumes, straggler ratios,
+executor peaks and worker counts joined to their baselines). Only rows whose
+masks fire go through the scalar detector, which builds the message and
+evidence. Payloads are therefore identical to :func:`synthesize_anomaly_flags`,
+and the common case of a healthy run costs no detector call at all. Without
+NumPy, which is declared in ``requirements.txt``, the scalar path is used for
+every row and a warning is logged once.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+import math
+from typing import Any, Iterable, Sequence
+
+from .anomaly_detection import (
+    Anomaly,
+    build_anomaly_payload,
+    detect_cluster_rightsizing,
+    detect_cost_regression,
+    detect_job_runtime_anomaly,
+    detect_task_straggler,
+    synthesize_anomaly_flags,
+)
+from .performance_memory import BaselineStats
+from ..repositories.bigquery_repository import DataprocFact
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+_warned_missing_numpy = False
+
+
+@dataclass(slots=True)
+class AnomalyInput:
+    """Arguments of :func:`synthesize_anomaly_flags` for one run."""
+
+    fact: DataprocFact
+    baseline: BaselineStats | None
+    spark_metrics: dict[str, Any] | None = None
+    cost_summary: dict[str, Any] | None = None
+    cluster_profile: dict[str, Any] | None = None
+    job_family: str | None = None
+    run_identifier: str | None = None
+
+
+def synthesize_anomaly_flags_batch(inputs: Sequence[AnomalyInput]) -> list[dict]:
+    """``synthesize_anomaly_flags`` for every input, evaluated column-wise."""
+
+    if np is None and inputs:
+        _warn_missing_numpy()
+    if np is None or not inputs:
+        return [
+            synthesize_anomaly_flags(
+                item.fact,
+                baseline=item.baseline,
+                spark_metrics=item.spark_metrics,
+                cost_summary=item.cost_summary,
+                cluster_profile=item.cluster_profile,
+                job_family=item.job_family,
+                run_identifier=item.run_identifier,
+            )
+            for item in inputs
+        ]
+
+    runtime_hits, straggler_hits, cost_hits, rightsizing_hits = (
+        mask.tolist() for mask in _screen(inputs)
+    )
+
+    payloads: list[dict] = []
+    for index, item in enumerate(inputs):
+        findings: list[Anomaly] = []
+        if runtime_hits[index]:
+            _append(findings, detect_job_runtime_anomaly(item.fact, item.baseline))
+        if straggler_hits[index]:
+            _append(findings, detect_task_straggler(item.fact, item.spark_metrics))
+        if cost_hits[index]:
+            _append(
+                findings,
+                detect_cost_regression(item.fact, item.baseline, item.cost_summary),
+            )
+        if rightsizing_hits[index]:
+            _append(
+                findings,
+                detect_cluster_rightsizing(item.fact, item.cluster_profile, item.cost_summary),
+            )
+        payloads.append(
+            build_anomaly_payload(
+                findings,
+                baseline=item.baseline,
+                cost_summary=item.cost_summary,
+                job_family=item.job_family,
+                run_identifier=item.run_identifier,
+            )
+        )
+    return payloads
+
+
+def _screen(inputs: Sequence[AnomalyInput]) -> tuple[Any, Any, Any, Any]:
+    """Boolean masks of rows on which each detector reports a finding."""
+
+    count = len(inputs)
+
+    def flags(values: Iterable[Any]) -> Any:
+        return np.fromiter((bool(value) for value in values), dtype=bool, count=count)
+
+    baselines = [item.baseline for item in inputs]
+    costs = [item.cost_summary or {} for item in inputs]
+
+    durations = [item.fact.duration_seconds for item in inputs]
+    p50_durations = [baseline.p50_duration if baseline else None for baseline in baselines]
+    duration = _column(durations)
+    p50_duration = _column(p50_durations)
+    has_runtime_inputs = ~np.equal(durations, None) & ~np.equal(p50_durations, None)
+    processed_gb = _column([item.fact.processed_gb for item in inputs])
+    p50_seconds_per_gb = _column(
+        [baseline.p50_seconds_per_gb if baseline else None for baseline in baselines]
+    )
+    vcores = _column([cost.get("app_vcore_seconds") for cost in costs])
+    memory = _column([cost.get("app_memory_gb_seconds") for cost in costs])
+    avg_vcores = _column(
+        [baseline.avg_app_vcore_seconds if baseline else None for baseline in baselines]
+    )
+    avg_memory = _column(
+        [baseline.avg_app_memory_gb_seconds if baseline else None for baseline in baselines]
+    )
+    avg_vcores_per_gb = _column(
+        [baseline.avg_vcore_seconds_per_gb if baseline else None for baseline in baselines]
+    )
+    avg_memory_per_gb = _column(
+        [baseline.avg_memory_gb_seconds_per_gb if baseline else None for baseline in baselines]
+    )
+    executor_peak = _column([cost.get("executor_peak") for cost in costs])
+    total_workers = _column(
+        [(item.cluster_profile or {}).get("total_workers") for item in inputs]
+    )
+    straggler_ratio = _column([_max_straggler_ratio(item.spark_metrics) for item in inputs])
+    has_cost = flags(item.cost_summary for item in inputs)
+    has_baseline_and_cost = has_cost & flags(baselines)
+    has_profile_and_cost = has_cost & flags(item.cluster_profile for item in inputs)
+
+    # NaN marks a missing value; every comparison against it is False, which
+    # matches the scalar detectors' early returns. The runtime rule is negated
+    # like the scalar ``ratio < 1.5`` check so a NaN ratio still fires. Where
+    # a run and its baseline both have a data volume the per-GiB rules apply
+    # instead, as in the scalar detectors.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_runtime = (
+            has_runtime_inputs
+            & ~(duration <= 0)
+            & (p50_duration != 0)
+            & ~(duration / p50_duration < 1.5)
+        )
+        has_runtime_rate = (duration > 0) & (processed_gb > 0) & (p50_seconds_per_gb > 0)
+        runtime = np.where(
+            has_runtime_rate,
+            (duration / processed_gb / p50_seconds_per_gb >= 1.5)
+            | (duration / p50_duration >= 1.5),
+            raw_runtime,
+        )
+        straggler = straggler_ratio > 3.0
+        cost = has_baseline_and_cost & (
+            np.where(
+                (vcores == vcores) & (processed_gb > 0) & (avg_vcores_per_gb > 0),
+                vcores / processed_gb / avg_vcores_per_gb > 1.3,
+                (avg_vcores > 0) & (vcores / avg_vcores > 1.3),
+            )
+            | np.where(
+                (memory == memory) & (processed_gb > 0) & (avg_memory_per_gb > 0),
+                memory / processed_gb / avg_memory_per_gb > 1.3,
+                (avg_memory > 0) & (memory / avg_memory > 1.3),
+            )
+        )
+        utilization = executor_peak / total_workers
+        rightsizing = (
+            has_profile_and_cost
+            & (total_workers > 0)
+            & ((utilization < 0.45) | (utilization >= 0.95))
+        )
+    return runtime, straggler, cost, rightsizing
+
+
+def _max_straggler_ratio(spark_metrics: dict[str, Any] | None) -> float | None:
+    if not spark_metrics:
+        return None
+    jobs = spark_metrics.get("jobs")
+    if not isinstance(jobs, list):
+        return None
+    best: float | None = None
+    for job in jobs:
+        if not isinstance(job, dict):
+            continue
+        try:
+            ratio = float(job.get("max_over_median_ratio"))
+        except (TypeError, ValueError):
+            continue
+        if math.isnan(ratio):
+            # The scalar detector reports a NaN ratio as a finding.
+            return math.inf
+        if best is None or ratio > best:
+            best = ratio
+    return best
+
+
+def _column(values: list[Any]) -> Any:
+    """float64 array of ``values`` with None and unparsable entries as NaN."""
+
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_as_float(value) for value in values], dtype=np.float64)
+
+
+def _as_float(value: Any) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _append(findings: list[Anomaly], anomaly: Anomaly | None) -> None:
+    if anomaly:
+        findings.append(anomaly)
+
+
+def _warn_missing_numpy() -> None:
+    global _warned_missing_numpy
+    if not _warned_missing_numpy:
+        _warned_missing_numpy = True
+        logging.warning("numpy is not installed; anomaly detectors run per row")
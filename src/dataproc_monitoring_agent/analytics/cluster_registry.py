@@ -0,0 +1,125 @@
+"""Shared registry of Dataproc cluster configurations referenced by runs."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import json
+from typing import Any
+
+from ..repositories.run_state_repository import SparkRunState
+
+
+@dataclass(slots=True)
+class ClusterConfigEntry:
+    """One distinct cluster configuration and its derived profile."""
+
+    config_key: str
+    dataproc_cluster_uuid: str | None
+    cluster_config_details: dict[str, Any]
+    cluster_profile: dict[str, Any]
+    run_count: int = 0
+
+
+class ClusterConfigRegistry:
+    """Dedupe ``cluster_config_details`` across runs sharing a cluster.
+
+    Configs are keyed by ``dataproc_cluster_uuid`` together with a content
+    hash of the snapshot, so runs on an autoscaling cluster that report
+    different worker counts keep their own config while identical snapshots
+    share one entry. A run whose raw JSON text has been seen before on the
+    same cluster is matched without decoding its own copy. Every run
+    registered against an entry is re-pointed at the shared config dict and
+    reuses the memoised profile.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, ClusterConfigEntry] = {}
+        self._raw_keys: dict[tuple[str | None, str], str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> list[ClusterConfigEntry]:
+        return list(self._entries.values())
+
+    def register(self, run_state: SparkRunState) -> ClusterConfigEntry:
+        uuid = run_state.dataproc_cluster_uuid
+        raw = run_state.cluster_config_json
+        raw_key = (uuid, _raw_digest(raw)) if isinstance(raw, str) else None
+
+        entry = None
+        if raw_key is not None and raw_key in self._raw_keys:
+            entry = self._entries[self._raw_keys[raw_key]]
+        if entry is None:
+            details = run_state.cluster_config_details
+            content_key = _content_key(details)
+            config_key = f"{uuid}/{content_key}" if uuid else content_key
+            entry = self._entries.get(config_key) or self._add(config_key, uuid, details)
+            if raw_key is not None:
+                self._raw_keys[raw_key] = config_key
+
+        run_state.share_cluster_config(entry.cluster_config_details)
+        entry.run_count += 1
+        return entry
+
+    def _add(
+        self,
+        config_key: str,
+        uuid: str | None,
+        details: dict[str, Any],
+    ) -> ClusterConfigEntry:
+        entry = ClusterConfigEntry(
+            config_key=config_key,
+            dataproc_cluster_uuid=uuid,
+            cluster_config_details=details,
+            cluster_profile=summarize_cluster_profile(details),
+        )
+        self._entries[config_key] = entry
+        return entry
+
+
+def summarize_cluster_profile(details: dict[str, Any] | None) -> dict[str, Any]:
+    """Condense worker counts, machine types and autoscaling into a profile."""
+
+    if not isinstance(details, dict):
+        return {}
+
+    config = details.get("config") or {}
+    worker_cfg = config.get("workerConfig") or {}
+    secondary_cfg = config.get("secondaryWorkerConfig") or {}
+
+    primary_workers = _safe_int(worker_cfg.get("numInstances"))
+    secondary_workers = _safe_int(secondary_cfg.get("numInstances"))
+    total_workers = (primary_workers or 0) + (secondary_workers or 0)
+
+    profile = {
+        "primary_workers": primary_workers,
+        "secondary_workers": secondary_workers,
+        "total_workers": total_workers,
+        "primary_machine_type": worker_cfg.get("machineTypeUri"),
+        "secondary_machine_type": secondary_cfg.get("machineTypeUri"),
+        "autoscaling_enabled": bool(config.get("autoscalingConfig")),
+    }
+
+    return {key: value for key, value in profile.items() if value not in (None, "", [])}
+
+
+def _content_key(details: dict[str, Any]) -> str:
+    digest = hashlib.sha1(
+        json.dumps(details, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"sha1:{digest[:20]}"
+
+
+def _raw_digest(raw: str) -> str:
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _safe_int(value: Any) -> int | None:
+    try:
+        if value is None:
+            return None
+        return int(value)
+    except (TypeError, ValueError):
+        return None
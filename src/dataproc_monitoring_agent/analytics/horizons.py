@@ -0,0 +1,68 @@
+"""Time horizons derived from a single ingestion window."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import re
+from typing import Iterable
+
+from ..repositories.run_state_repository import SparkRunState
+
+
+_HORIZON_PATTERN = re.compile(r"^\s*(\d+)\s*([hdw]?)\s*$", re.IGNORECASE)
+_UNIT_HOURS = {"": 1, "h": 1, "d": 24, "w": 168}
+
+
+def parse_horizons(values: Iterable[str | int]) -> tuple[int, ...]:
+    """Parse horizons such as ``"1h"``, ``"24h"``, ``"7d"`` or ``6`` into hours.
+
+    Bare numbers are hours. The result is sorted and de-duplicated.
+    """
+
+    hours: set[int] = set()
+    for value in values:
+        match = _HORIZON_PATTERN.match(str(value))
+        if not match or int(match.group(1)) <= 0:
+            raise ValueError(f"Invalid horizon '{value}'; expected e.g. 1h, 24h or 7d")
+        hours.add(int(match.group(1)) * _UNIT_HOURS[match.group(2).lower()])
+    return tuple(sorted(hours))
+
+
+def horizon_label(hours: int) -> str:
+    if hours % 24 == 0:
+        return f"{hours // 24}d"
+    return f"{hours}h"
+
+
+def within_horizon(run_state: SparkRunState, *, window_end: datetime, hours: int) -> bool:
+    """Apply the run state window predicate to a horizon ending at ``window_end``.
+
+    Runs without a start time fall back to ``run_date``, like the query does.
+    """
+
+    horizon_start = window_end - timedelta(hours=hours)
+    if run_state.start_epoch is not None:
+        return horizon_start.timestamp() <= run_state.start_epoch <= window_end.timestamp()
+    run_date = (run_state.run_date or "")[:10]
+    return bool(run_date) and (
+        horizon_start.date().isoformat() <= run_date <= window_end.date().isoformat()
+    )
+
+
+def slice_by_horizon(
+    run_states: Iterable[SparkRunState],
+    *,
+    window_end: datetime,
+    horizons: Iterable[int],
+) -> dict[str, list[int]]:
+    """Positions of ``run_states`` falling inside each horizon, keyed by label."""
+
+    run_states = list(run_states)
+    return {
+        horizon_label(hours): [
+            position
+            for position, run_state in enumerate(run_states)
+            if within_horizon(run_state, window_end=window_end, hours=hours)
+        ]
+        for hours in horizons
+    }
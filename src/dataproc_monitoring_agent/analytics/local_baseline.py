@@ -0,0 +1,206 @@
+"""Incremental baselines for job families first seen inside the current batch."""
+
+from __future__ import annotations
+
+from typing import Any, Iterator
+
+from .performance_memory import BaselineStats
+from .quantile_sketch import DEFAULT_K, QuantileSketch
+
+
+class _RunningMean:
+    __slots__ = ("total", "count")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: "_RunningMean") -> None:
+        self.total += other.total
+        self.count += other.count
+
+    @property
+    def mean(self) -> float | None:
+        if not self.count:
+            return None
+        return self.total / self.count
+
+
+class LocalBaselineAccumulator:
+    """Baseline of one job family maintained run by run.
+
+    Quantiles come from :class:`QuantileSketch` and averages from running sums,
+    so adding a sample and reading the baseline both take time independent of
+    the number of runs seen so far. Quantiles are exact for the first ``k`` runs
+    of a family and within ``RANK_ERROR_BOUND`` afterwards.
+    """
+
+    __slots__ = (
+        "job_family",
+        "job_type",
+        "run_count",
+        "_durations",
+        "_vcores",
+        "_memory",
+        "_p95_task_durations",
+        "_seconds_per_gb",
+        "_duration_mean",
+        "_vcore_mean",
+        "_memory_mean",
+        "_ratio_mean",
+        "_vcore_per_gb_mean",
+        "_memory_per_gb_mean",
+    )
+
+    def __init__(self, job_family: str, *, k: int = DEFAULT_K) -> None:
+        self.job_family = job_family
+        self.job_type = "SPARK"
+        self.run_count = 0
+        self._durations = QuantileSketch(k)
+        self._vcores = QuantileSketch(k)
+        self._memory = QuantileSketch(k)
+        self._p95_task_durations = QuantileSketch(k)
+        self._seconds_per_gb = QuantileSketch(k)
+        self._duration_mean = _RunningMean()
+        self._vcore_mean = _RunningMean()
+        self._memory_mean = _RunningMean()
+        self._ratio_mean = _RunningMean()
+        self._vcore_per_gb_mean = _RunningMean()
+        self._memory_per_gb_mean = _RunningMean()
+
+    def add(self, sample: dict[str, Any]) -> None:
+        self.run_count += 1
+        if sample.get("job_type"):
+            self.job_type = sample["job_type"]
+        for key, sketch, mean in (
+            ("duration", self._durations, self._duration_mean),
+            ("vcores", self._vcores, self._vcore_mean),
+            ("memory", self._memory, self._memory_mean),
+            ("ratio", None, self._ratio_mean),
+            ("p95_task_duration_ms", self._p95_task_durations, None),
+            ("seconds_per_gb", self._seconds_per_gb, None),
+            ("vcore_seconds_per_gb", None, self._vcore_per_gb_mean),
+            ("memory_gb_seconds_per_gb", None, self._memory_per_gb_mean),
+        ):
+            value = sample.get(key)
+            if value is None:
+                continue
+            if sketch is not None:
+                sketch.add(value)
+            if mean is not None:
+                mean.add(value)
+
+    def merge(self, other: "LocalBaselineAccumulator") -> "LocalBaselineAccumulator":
+        """Fold the runs of ``other`` (same family) into this accumulator."""
+
+        self.run_count += other.run_count
+        self.job_type = other.job_type or self.job_type
+        for (sketch, mean), (other_sketch, other_mean) in zip(self._measures(), other._measures()):
+            if sketch is not None:
+                sketch.merge(other_sketch)
+            if mean is not None:
+                mean.merge(other_mean)
+        return self
+
+    def to_payload(self) -> dict[str, Any]:
+        """Flat sums, counts and serialised sketches, one key per rollup column."""
+
+        payload: dict[str, Any] = {"job_type": self.job_type, "run_count": self.run_count}
+        for name, (sketch, mean) in zip(_MEASURE_NAMES, self._measures()):
+            if mean is not None:
+                payload[f"{name}_sum"] = mean.total
+                payload[f"{name}_count"] = mean.count
+            if sketch is not None:
+                payload[f"{name}_sketch"] = sketch.to_dict()
+        return payload
+
+    @classmethod
+    def from_payload(cls, job_family: str, payload: dict[str, Any]) -> "LocalBaselineAccumulator":
+        accumulator = cls(job_family)
+        accumulator.job_type = payload.get("job_type") or accumulator.job_type
+        accumulator.run_count = int(payload.get("run_count") or 0)
+        for name, (sketch, mean) in zip(_MEASURE_NAMES, accumulator._measures()):
+            if mean is not None:
+                mean.total = float(payload.get(f"{name}_sum") or 0.0)
+                mean.count = int(payload.get(f"{name}_count") or 0)
+        accumulator._durations = _sketch(payload, "duration", accumulator._durations)
+        accumulator._vcores = _sketch(payload, "app_vcore_seconds", accumulator._vcores)
+        accumulator._memory = _sketch(payload, "app_memory_gb_seconds", accumulator._memory)
+        accumulator._p95_task_durations = _sketch(
+            payload, "p95_task_duration_ms", accumulator._p95_task_durations
+        )
+        accumulator._seconds_per_gb = _sketch(
+            payload, "seconds_per_gb", accumulator._seconds_per_gb
+        )
+        return accumulator
+
+    def _measures(self) -> Iterator[tuple[QuantileSketch | None, _RunningMean | None]]:
+        yield self._durations, self._duration_mean
+        yield self._vcores, self._vcore_mean
+        yield self._memory, self._memory_mean
+        yield None, self._ratio_mean
+        yield self._p95_task_durations, None
+        yield self._seconds_per_gb, None
+        yield None, self._vcore_per_gb_mean
+        yield None, self._memory_per_gb_mean
+
+    def to_baseline(self, cluster_name: str) -> BaselineStats:
+        return BaselineStats(
+            job_id=self.job_family,
+            job_type=self.job_type,
+            cluster_name=cluster_name,
+            p50_duration=self._durations.quantile(0.5),
+            p95_duration=self._durations.quantile(0.95),
+            avg_duration=self._duration_mean.mean,
+            p50_app_vcore_seconds=self._vcores.quantile(0.5),
+            p95_app_vcore_seconds=self._vcores.quantile(0.95),
+            avg_app_vcore_seconds=self._vcore_mean.mean,
+            p50_app_memory_gb_seconds=self._memory.quantile(0.5),
+            p95_app_memory_gb_seconds=self._memory.quantile(0.95),
+            avg_app_memory_gb_seconds=self._memory_mean.mean,
+            avg_max_over_median_ratio=self._ratio_mean.mean,
+            p95_task_duration_ms=self._p95_task_durations.quantile(0.95),
+            run_count=self.run_count,
+            p50_seconds_per_gb=self._seconds_per_gb.quantile(0.5),
+            p95_seconds_per_gb=self._seconds_per_gb.quantile(0.95),
+            avg_vcore_seconds_per_gb=self._vcore_per_gb_mean.mean,
+            avg_memory_gb_seconds_per_gb=self._memory_per_gb_mean.mean,
+        )
+
+
+def per_gb_rates(sample: dict[str, Any], processed_gb: float | None) -> dict[str, float]:
+    """Duration, vcore- and memory-seconds of ``sample`` per GiB processed."""
+
+    if not processed_gb:
+        return {}
+    rates: dict[str, float] = {}
+    for key, rate in (
+        ("duration", "seconds_per_gb"),
+        ("vcores", "vcore_seconds_per_gb"),
+        ("memory", "memory_gb_seconds_per_gb"),
+    ):
+        if sample.get(key) is not None:
+            rates[rate] = sample[key] / processed_gb
+    return rates
+
+
+# Column prefixes of the measures yielded by ``LocalBaselineAccumulator._measures``.
+_MEASURE_NAMES = (
+    "duration",
+    "app_vcore_seconds",
+    "app_memory_gb_seconds",
+    "max_over_median_ratio",
+    "p95_task_duration_ms",
+    "seconds_per_gb",
+    "vcore_seconds_per_gb",
+    "memory_gb_seconds_per_gb",
+)
+
+
+def _sketch(payload: dict[str, Any], name: str, default: QuantileSketch) -> QuantileSketch:
+    serialised = payload.get(f"{name}_sketch")
+    return QuantileSketch.from_dict(serialised) if serialised else default
@@ -2,9 +2,9 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Dict, Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Collection, Dict, Iterable, Mapping, Sequence
 
 from google.api_core import exceptions
 from google.cloud import bigquery
@@ -29,69 +29,325 @@ class BaselineStats:
     avg_max_over_median_ratio: float | None
     p95_task_duration_ms: float | None
     run_count: int
+    # Throughput-normalised rates per GiB of input and shuffle reads; None
+    # until the family has runs with a reported data volume.
+    p50_seconds_per_gb: float | None = None
+    p95_seconds_per_gb: float | None = None
+    avg_vcore_seconds_per_gb: float | None = None
+    avg_memory_gb_seconds_per_gb: float | None = None
+    # Baselines of the same family restricted to one cluster shape, keyed by
+    # ``segment_key`` (e.g. ``"cluster=etl-a|autoscaling=true"``).
+    segments: dict[str, "BaselineStats"] = field(default_factory=dict)
 
+    def for_segment(self, values: Mapping[str, str | None]) -> "BaselineStats":
+        """Most specific segment baseline matching ``values``, else this one.
 
-def load_baselines(
-    config: MonitoringConfig,
+        Segments with fewer than ``MIN_SEGMENT_RUNS`` runs are skipped; among
+        the rest, more dimensions win and ties go to the larger sample.
+        """
+
+        best = self
+        best_rank = (0, 0)
+        for key, segment in self.segments.items():
+            if segment.run_count < MIN_SEGMENT_RUNS:
+                continue
+            pairs = [part.split("=", 1) for part in key.split("|")]
+            if any(values.get(name) != value for name, value in pairs):
+                continue
+            rank = (len(pairs), segment.run_count)
+            if rank > best_rank:
+                best, best_rank = segment, rank
+        return best
+
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, Any]) -> "BaselineStats":
+        """Inverse of ``dataclasses.asdict``, including nested segments."""
+
+        fields = dict(payload)
+        fields["segments"] = {
+            key: cls.from_payload(segment)
+            for key, segment in (payload.get("segments") or {}).items()
+        }
+        return cls(**fields)
+
+
+# Grouping dimensions a baseline can be segmented by, as SQL over daily_facts.
+# ``segment_values`` derives the same values for a run being scored.
+BASELINE_DIMENSIONS: dict[str, str] = {
+    "cluster": "cluster_name",
+    "machine_type": "primary_machine_type",
+    "autoscaling": "IF(autoscaling_enabled, 'true', 'false')",
+}
+
+MIN_SEGMENT_RUNS = 5
+
+# Typed fact columns added after the fact table's first schema, by SQL type.
+# ``plan_baseline_query`` reads them as NULL from a table that predates them.
+_UPGRADED_COLUMNS: dict[str, str] = {
+    "input_bytes": "FLOAT64",
+    "shuffle_read_bytes": "FLOAT64",
+    "app_vcore_seconds": "FLOAT64",
+    "app_memory_gb_seconds": "FLOAT64",
+    "max_over_median_ratio": "FLOAT64",
+    "p95_task_duration_ms": "FLOAT64",
+    "primary_machine_type": "STRING",
+    "autoscaling_enabled": "BOOL",
+}
+
+_QUANTILE_BUCKETS = 20
+
+# Matches ``DataprocFact.processed_gb``.
+_BYTES_PER_GB = 1 << 30
+
+
+@dataclass(frozen=True, slots=True)
+class _MetricPlan:
+    """One metric of the baseline: its quantile offsets and average."""
+
+    column: str
+    quantiles: tuple[tuple[str, int], ...]
+    average: str | None
+
+
+_METRIC_PLANS = (
+    _MetricPlan("duration_seconds", (("p50_duration", 10), ("p95_duration", 18)), "avg_duration"),
+    _MetricPlan(
+        "app_vcore_seconds",
+        (("p50_app_vcore_seconds", 10), ("p95_app_vcore_seconds", 18)),
+        "avg_app_vcore_seconds",
+    ),
+    _MetricPlan(
+        "app_memory_gb_seconds",
+        (("p50_app_memory_gb_seconds", 10), ("p95_app_memory_gb_seconds", 18)),
+        "avg_app_memory_gb_seconds",
+    ),
+    _MetricPlan("max_over_median_ratio", (), "avg_max_over_median_ratio"),
+    _MetricPlan("p95_task_duration_ms", (("p95_task_duration_ms", 18),), None),
+    _MetricPlan(
+        "seconds_per_gb", (("p50_seconds_per_gb", 10), ("p95_seconds_per_gb", 18)), None
+    ),
+    _MetricPlan("vcore_seconds_per_gb", (), "avg_vcore_seconds_per_gb"),
+    _MetricPlan("memory_gb_seconds_per_gb", (), "avg_memory_gb_seconds_per_gb"),
+)
+
+
+def segment_values(
+    cluster_name: str | None,
+    cluster_profile: Mapping[str, Any] | None,
+) -> dict[str, str | None]:
+    """Dimension values of a run, as ``BASELINE_DIMENSIONS`` reads them from facts."""
+
+    profile = cluster_profile or {}
+    return {
+        "cluster": cluster_name,
+        "machine_type": profile.get("primary_machine_type"),
+        "autoscaling": "true" if profile.get("autoscaling_enabled") else "false",
+    }
+
+
+def segment_key(values: Mapping[str, str | None]) -> str | None:
+    """Key of a segment in ``BASELINE_DIMENSIONS`` order; None if a value is missing."""
+
+    if any(value is None for value in values.values()):
+        return None
+    return "|".join(
+        f"{name}={values[name]}" for name in BASELINE_DIMENSIONS if name in values
+    )
+
+
+def plan_baseline_query(
+    table: str,
     *,
-    as_of: datetime,
-    trailing_window: timedelta,
-) -> dict[str, BaselineStats]:
-    """Load trailing baselines per job from BigQuery."""
+    dimension_sets: Sequence[Sequence[str]] = (),
+    filter_families: bool = False,
+    columns: Collection[str] | None = None,
+) -> str:
+    """SQL computing baselines per family and per family x dimension set.
 
-    client = bigquery.Client(project=config.project_id)
-    query = f"""
+    Each metric's quantile array is computed once per group and offset into
+    for its percentiles. With ``dimension_sets`` the groups are
+    ``GROUPING SETS`` of the family alone and the family with each set, so
+    every segment comes out of a single scan; ``grouped_<dimension>`` is 1
+    where a dimension was rolled up.
+
+    ``columns`` names the columns the table has; typed columns it lacks are
+    read as NULL rather than failing the query.
+    """
+
+    dimensions = _dimensions_of(dimension_sets)
+    source = f"`{table}`"
+    missing = [
+        f"CAST(NULL AS {sql_type}) AS {column}"
+        for column, sql_type in _UPGRADED_COLUMNS.items()
+        if columns is not None and column not in columns
+    ]
+    if missing:
+        source = f"(SELECT *, {', '.join(missing)} FROM `{table}`)"
+
+    dimension_columns = "".join(
+        f"\n            {BASELINE_DIMENSIONS[name]} AS dim_{name}," for name in dimensions
+    )
+    family_filter = "\n            AND job_id IN UNNEST(@job_families)" if filter_families else ""
+    aggregates = []
+    for plan in _METRIC_PLANS:
+        if plan.quantiles:
+            aggregates.append(
+                f"APPROX_QUANTILES({plan.column}, {_QUANTILE_BUCKETS}) AS {plan.column}_quantiles"
+            )
+        if plan.average:
+            aggregates.append(f"AVG({plan.column}) AS {plan.average}")
+    outputs = []
+    for plan in _METRIC_PLANS:
+        outputs.extend(
+            f"{plan.column}_quantiles[OFFSET({offset})] AS {name}"
+            for name, offset in plan.quantiles
+        )
+        if plan.average:
+            outputs.append(plan.average)
+
+    if dimensions:
+        group_by = "GROUPING SETS ({})".format(
+            ", ".join(
+                ["(logical_job_id)"]
+                + [
+                    "(logical_job_id, {})".format(
+                        ", ".join(f"dim_{name}" for name in dimensions if name in group)
+                    )
+                    for group in dimension_sets
+                ]
+            )
+        )
+        cluster_name = "IF(GROUPING(dim_cluster) = 0, dim_cluster, ANY_VALUE(cluster_name))" if (
+            "cluster" in dimensions
+        ) else "ANY_VALUE(cluster_name)"
+        grouping = "".join(
+            f"\n            dim_{name},\n            GROUPING(dim_{name}) AS grouped_{name},"
+            for name in dimensions
+        )
+    else:
+        group_by = "logical_job_id"
+        cluster_name = "ANY_VALUE(cluster_name)"
+        grouping = ""
+
+    aggregate_separator = ",\n            "
+    output_separator = ",\n          "
+    return f"""
         WITH raw_history AS (
           SELECT
             job_id,
             job_type,
-            cluster_name,
+            cluster_name,{dimension_columns}
             duration_seconds,
-            SAFE_CAST(JSON_VALUE(job_metrics, '$.app.app_vcore_seconds') AS FLOAT64) AS app_vcore_seconds,
-            SAFE_CAST(JSON_VALUE(job_metrics, '$.app.app_memory_gb_seconds') AS FLOAT64) AS app_memory_gb_seconds,
-            SAFE_CAST(JSON_VALUE(job_metrics, '$.jobs[0].max_over_median_ratio') AS FLOAT64) AS max_over_median_ratio,
-            SAFE_CAST(JSON_VALUE(job_metrics, '$.jobs[0].p95_task_duration_ms') AS FLOAT64) AS p95_task_duration_ms
-          FROM `{config.fully_qualified_table}`
-          WHERE ingest_timestamp BETWEEN @window_start AND @as_of
-            AND duration_seconds IS NOT NULL
+            app_vcore_seconds,
+            app_memory_gb_seconds,
+            max_over_median_ratio,
+            p95_task_duration_ms,
+            NULLIF(COALESCE(input_bytes, 0) + COALESCE(shuffle_read_bytes, 0), 0) / {_BYTES_PER_GB} AS processed_gb
+          FROM {source}
+          WHERE ingest_date BETWEEN DATE(@window_start) AND DATE(@as_of)
+            AND ingest_timestamp BETWEEN @window_start AND @as_of
+            AND duration_seconds IS NOT NULL{family_filter}
         )
         , history AS (
           SELECT
-            job_id,
+            *,
             CASE
-              WHEN REGEXP_REPLACE(job_id, r'_[0-9a-f]{6,}$', '') != ''
-                THEN REGEXP_REPLACE(job_id, r'_[0-9a-f]{6,}$', '')
+              WHEN REGEXP_REPLACE(job_id, r'_[0-9a-f]{{6,}}$', '') != ''
+                THEN REGEXP_REPLACE(job_id, r'_[0-9a-f]{{6,}}$', '')
               ELSE job_id
             END AS logical_job_id,
-            job_type,
-            cluster_name,
-            duration_seconds,
-            app_vcore_seconds,
-            app_memory_gb_seconds,
-            max_over_median_ratio,
-            p95_task_duration_ms
+            SAFE_DIVIDE(duration_seconds, processed_gb) AS seconds_per_gb,
+            SAFE_DIVIDE(app_vcore_seconds, processed_gb) AS vcore_seconds_per_gb,
+            SAFE_DIVIDE(app_memory_gb_seconds, processed_gb) AS memory_gb_seconds_per_gb
           FROM raw_history
         )
+        , grouped AS (
+          SELECT
+            logical_job_id AS job_id,{grouping}
+            ANY_VALUE(job_type) AS job_type,
+            {cluster_name} AS cluster_name,
+            {aggregate_separator.join(aggregates)},
+            COUNT(*) AS run_count
+          FROM history
+          GROUP BY {group_by}
+        )
         SELECT
-          logical_job_id AS job_id,
-          ANY_VALUE(job_type) AS job_type,
-          ANY_VALUE(cluster_name) AS cluster_name,
-          APPROX_QUANTILES(duration_seconds, 20)[OFFSET(10)] AS p50_duration,
-          APPROX_QUANTILES(duration_seconds, 20)[OFFSET(18)] AS p95_duration,
-          AVG(duration_seconds) AS avg_duration,
-          APPROX_QUANTILES(app_vcore_seconds, 20)[OFFSET(10)] AS p50_app_vcore_seconds,
-          APPROX_QUANTILES(app_vcore_seconds, 20)[OFFSET(18)] AS p95_app_vcore_seconds,
-          AVG(app_vcore_seconds) AS avg_app_vcore_seconds,
-          APPROX_QUANTILES(app_memory_gb_seconds, 20)[OFFSET(10)] AS p50_app_memory_gb_seconds,
-          APPROX_QUANTILES(app_memory_gb_seconds, 20)[OFFSET(18)] AS p95_app_memory_gb_seconds,
-          AVG(app_memory_gb_seconds) AS avg_app_memory_gb_seconds,
-          AVG(max_over_median_ratio) AS avg_max_over_median_ratio,
-          APPROX_QUANTILES(p95_task_duration_ms, 20)[OFFSET(18)] AS p95_task_duration_ms,
-          COUNT(*) AS run_count
-        FROM history
-        GROUP BY logical_job_id
+          * EXCEPT ({", ".join(plan.column + "_quantiles" for plan in _METRIC_PLANS if plan.quantiles)}),
+          {output_separator.join(outputs)}
+        FROM grouped
     """
 
+
+def _dimensions_of(dimension_sets: Sequence[Sequence[str]]) -> list[str]:
+    unknown = {name for group in dimension_sets for name in group} - set(BASELINE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown baseline dimensions: {', '.join(sorted(unknown))}")
+    return [
+        name for name in BASELINE_DIMENSIONS if any(name in group for group in dimension_sets)
+    ]
+
+
+def load_baselines(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+    trailing_window: timedelta,
+    job_families: Iterable[str] | None = None,
+) -> dict[str, BaselineStats]:
+    """Load trailing baselines per job from BigQuery.
+
+    ``job_families`` restricts the query to the given logical jobs. Facts are
+    persisted with the suffix-free job family as ``job_id``, so the filter is
+    applied to the stored column and only those clusters are scanned.
+
+    ``baseline_dimensions`` adds per-segment baselines (see
+    ``plan_baseline_query``) to each family's ``segments``.
+
+    Metrics are read from the typed fact columns only, never from the JSON
+    payloads; facts written before those columns existed are migrated with
+    ``bigquery_repository.backfill_fact_metric_columns``. A dry run leaves a
+    table lacking those columns as it is, so its columns are looked up and
+    the missing ones read as NULL.
+
+    With ``baseline_rollups`` enabled the baselines are merged from the daily
+    sketch rollups instead of re-aggregating the facts.
+    """
+
+    if config.baseline_rollups:
+        # Imported here because the rollup module builds on
+        # LocalBaselineAccumulator, which imports this module.
+        from .baseline_rollup import load_rollup_baselines
+
+        return load_rollup_baselines(
+            config,
+            as_of=as_of,
+            trailing_window=trailing_window,
+            job_families=job_families,
+        )
+
+    families: list[str] | None = None
+    if job_families is not None:
+        families = sorted({family for family in job_families if family})
+        if not families:
+            return {}
+
+    dimension_sets = config.baseline_dimension_sets
+    dimensions = _dimensions_of(dimension_sets)
+    client = bigquery.Client(project=config.project_id)
+    columns = None
+    if config.dry_run:
+        try:
+            table = client.get_table(config.fully_qualified_table)
+        except exceptions.GoogleAPICallError as exc:
+            raise RuntimeError(f"Failed loading baselines: {exc}") from exc
+        columns = {field.name for field in table.schema}
+    query = plan_baseline_query(
+        config.fully_qualified_table,
+        dimension_sets=dimension_sets,
+        filter_families=families is not None,
+        columns=columns,
+    )
+
     params = [
         bigquery.ScalarQueryParameter(
             "window_start",
@@ -100,6 +356,8 @@ def load_baselines(
         ),
         bigquery.ScalarQueryParameter("as_of", "TIMESTAMP", as_of.isoformat()),
     ]
+    if families is not None:
+        params.append(bigquery.ArrayQueryParameter("job_families", "STRING", families))
 
     job_config = bigquery.QueryJobConfig(query_parameters=params)
 
@@ -109,8 +367,9 @@ def load_baselines(
         raise RuntimeError(f"Failed loading baselines: {exc}") from exc
 
     baselines: dict[str, BaselineStats] = {}
+    segments: dict[str, dict[str, BaselineStats]] = {}
     for row in result:
-        baselines[row.job_id] = BaselineStats(
+        stats = BaselineStats(
             job_id=row.job_id,
             job_type=row.job_type,
             cluster_name=row.cluster_name,
@@ -126,25 +385,123 @@ def load_baselines(
             avg_max_over_median_ratio=row.avg_max_over_median_ratio,
             p95_task_duration_ms=row.p95_task_duration_ms,
             run_count=row.run_count,
+            p50_seconds_per_gb=row.p50_seconds_per_gb,
+            p95_seconds_per_gb=row.p95_seconds_per_gb,
+            avg_vcore_seconds_per_gb=row.avg_vcore_seconds_per_gb,
+            avg_memory_gb_seconds_per_gb=row.avg_memory_gb_seconds_per_gb,
         )
+        values = {
+            name: row[f"dim_{name}"] for name in dimensions if not row[f"grouped_{name}"]
+        }
+        if not values:
+            baselines[row.job_id] = stats
+            continue
+        key = segment_key(values)
+        if key is not None:
+            segments.setdefault(row.job_id, {})[key] = stats
+    for job_id, family_segments in segments.items():
+        if job_id in baselines:
+            baselines[job_id].segments = family_segments
     return baselines
 
 
+class BaselineLoader:
+    """Per-family baselines loaded on demand and cached for one cycle.
+
+    Families passed to :meth:`prefetch` that have not been seen yet are
+    loaded with a single family-filtered query; a lookup of any other unseen
+    family loads it on its own. Families without history are remembered so
+    they are never queried twice. Entries may be overwritten, e.g. by local
+    baselines grown during fact building.
+    """
+
+    def __init__(
+        self,
+        config: MonitoringConfig,
+        *,
+        as_of: datetime,
+        trailing_window: timedelta,
+        load: Callable[..., dict[str, BaselineStats]] = load_baselines,
+    ) -> None:
+        self._config = config
+        self._as_of = as_of
+        self._trailing_window = trailing_window
+        self._load = load
+        self._baselines: dict[str, BaselineStats | None] = {}
+        self.query_count = 0
+
+    def prefetch(self, job_families: Iterable[str]) -> None:
+        """Load every family in ``job_families`` not yet looked up, in one query."""
+
+        missing = {
+            family
+            for family in job_families
+            if family and family not in self._baselines
+        }
+        if not missing:
+            return
+        loaded = self._load(
+            self._config,
+            as_of=self._as_of,
+            trailing_window=self._trailing_window,
+            job_families=missing,
+        )
+        self.query_count += 1
+        for family in missing:
+            self._baselines[family] = loaded.get(family)
+
+    def get(self, job_family: str, default: BaselineStats | None = None) -> BaselineStats | None:
+        if job_family not in self._baselines:
+            self.prefetch((job_family,))
+        baseline = self._baselines.get(job_family)
+        return default if baseline is None else baseline
+
+    def __getitem__(self, job_family: str) -> BaselineStats:
+        baseline = self.get(job_family)
+        if baseline is None:
+            raise KeyError(job_family)
+        return baseline
+
+    def __setitem__(self, job_family: str, baseline: BaselineStats) -> None:
+        self._baselines[job_family] = baseline
+
+    def __contains__(self, job_family: object) -> bool:
+        return isinstance(job_family, str) and self.get(job_family) is not None
+
+    @property
+    def loaded_families(self) -> int:
+        """Number of families looked up so far, with or without history."""
+
+        return len(self._baselines)
+
+
 def fetch_recent_jobs(
     config: MonitoringConfig,
     *,
     limit: int = 50,
+    as_of: datetime | None = None,
+    lookback: timedelta | None = None,
 ) -> Iterable[dict]:
-    """Return the most recent runs persisted in the performance table."""
+    """Return the most recent runs persisted in the performance table.
+
+    Only partitions ingested within ``lookback`` (the baseline window by
+    default) of ``as_of`` are read.
+    """
 
+    as_of = as_of or datetime.now(tz=timezone.utc)
+    since = (as_of - (lookback or config.baseline_window)).date()
     client = bigquery.Client(project=config.project_id)
     query = f"""
         SELECT *
         FROM `{config.fully_qualified_table}`
+        WHERE ingest_date >= @since
         ORDER BY ingest_timestamp DESC
         LIMIT @limit
     """
-    params = [bigquery.ScalarQueryParameter("limit", "INT64", limit)]
+    params = [
+        bigquery.ScalarQueryParameter("since", "DATE", since.isoformat()),
+        bigquery.ScalarQueryParameter("limit", "INT64", limit),
+    ]
 
     job_config = bigquery.QueryJobConfig(query_parameters=params)
     try:
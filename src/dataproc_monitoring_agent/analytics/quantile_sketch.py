@@ -0,0 +1,161 @@
+"""Mergeable streaming quantile sketch used for run baselines.
+
+``QuantileSketch`` is a KLL sketch. Values are kept verbatim
+until the level-0 buffer reaches ``k``, so families with at most ``k`` runs get
+exact quantiles. Past that point full levels are sorted and every other item is
+promoted with double weight. This keeps O(k) values and amortised O(1)
+updates. The odd/even choice comes from a fixed-seed generator, so results
+are reproducible across runs.
+
+Error bound: for ``k = 200`` (the default), the rank of a returned quantile
+is within 1.65% of the value count of the requested rank, with 99%
+confidence (``RANK_ERROR_BOUND``). The error does not depend on the value
+distribution. ``tests/test_quantile_sketch.py`` checks the bound against exact
+quantiles on skewed, sorted and merged streams.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import random
+from typing import Any, Iterable
+
+
+DEFAULT_K = 200
+RANK_ERROR_BOUND = 0.0165
+
+_CAPACITY_DECAY = 2.0 / 3.0
+_MIN_LEVEL_CAPACITY = 8
+_COIN_SEED = 0x5EED
+
+
+class QuantileSketch:
+    """Streaming, mergeable approximation of a value distribution."""
+
+    __slots__ = ("k", "count", "_levels", "_coin")
+
+    def __init__(self, k: int = DEFAULT_K) -> None:
+        if k < _MIN_LEVEL_CAPACITY:
+            raise ValueError(f"Sketch size k must be at least {_MIN_LEVEL_CAPACITY}")
+        self.k = k
+        self.count = 0
+        # Level 0 stays sorted while the sketch is exact so quantiles can be
+        # read without sorting.
+        self._levels: list[list[float]] = [[]]
+        self._coin = random.Random(_COIN_SEED)
+
+    @property
+    def is_exact(self) -> bool:
+        return len(self._levels) == 1
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if self.is_exact:
+            bisect.insort(self._levels[0], value)
+        else:
+            self._levels[0].append(value)
+        if len(self._levels[0]) > self._capacity(0):
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold ``other`` into this sketch and return it."""
+
+        if other.count == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self.count += other.count
+        if self.is_exact:
+            self._levels[0].sort()
+        self._compress()
+        return self
+
+    def quantile(self, percentile: float) -> float | None:
+        """Linearly interpolated quantile, matching the exact baseline maths.
+
+        While the sketch is exact this equals interpolating between the two
+        order statistics around ``(count - 1) * percentile``.
+        """
+
+        if self.count == 0:
+            return None
+        if self.is_exact:
+            return _interpolate(self._levels[0], percentile)
+
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self._levels)
+            for value in items
+        )
+        position = (self.count - 1) * percentile
+        lower = _value_at_rank(weighted, math.floor(position))
+        upper = _value_at_rank(weighted, math.ceil(position))
+        return lower + (upper - lower) * (position - math.floor(position))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "k": self.k,
+            "count": self.count,
+            "levels": [list(items) for items in self._levels],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(int(payload.get("k", DEFAULT_K)))
+        sketch.count = int(payload.get("count", 0))
+        sketch._levels = [
+            [float(value) for value in items] for items in payload.get("levels") or [[]]
+        ]
+        if sketch.is_exact:
+            sketch._levels[0].sort()
+        return sketch
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(_MIN_LEVEL_CAPACITY, math.ceil(self.k * _CAPACITY_DECAY**depth))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            items.sort()
+            # An odd item stays behind so the total weight is preserved.
+            kept = [items.pop()] if len(items) % 2 else []
+            offset = self._coin.getrandbits(1)
+            self._levels[level + 1].extend(items[offset::2])
+            self._levels[level] = kept
+            # Adding a level lowers the capacity of every level below it.
+            level = 0
+
+
+def _interpolate(sorted_values: list[float], percentile: float) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * percentile
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    weight = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * weight
+
+
+def _value_at_rank(weighted: list[tuple[float, int]], rank: int) -> float:
+    cumulative = 0
+    for value, weight in weighted:
+        cumulative += weight
+        if cumulative > rank:
+            return value
+    return weighted[-1][0]
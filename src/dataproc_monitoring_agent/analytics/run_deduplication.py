@@ -0,0 +1,203 @@
+"""Collapse retried or re-snapshotted Spark runs before fact building."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+import heapq
+from itertools import count
+from typing import Any, Callable, Iterable, Iterator
+
+from ..repositories.run_state_repository import TERMINAL_STATUSES, SparkRunState
+
+
+DEDUP_POLICIES = ("latest", "complete", "off")
+
+
+@dataclass(slots=True)
+class DeduplicationResult:
+    run_states: list[SparkRunState]
+    collapsed_rows: int
+    duplicated_runs: int
+
+
+@dataclass(slots=True)
+class DeduplicationCounts:
+    """Running totals of a streamed deduplication."""
+
+    collapsed_rows: int = 0
+    duplicated_runs: int = 0
+
+
+def run_identity_key(run_state: SparkRunState) -> tuple[str, ...] | None:
+    """Identity of a Spark run across Composer retries and snapshots.
+
+    A Composer retry submits a new YARN application under the same Spark job
+    and task ids, so those identify the run when present; the application id
+    is the fallback for rows that carry neither.
+    """
+
+    if run_state.spark_jobid or run_state.spark_taskid:
+        return ("spark", run_state.spark_jobid or "", run_state.spark_taskid or "")
+    if run_state.application_id:
+        return ("application", run_state.application_id)
+    return None
+
+
+def deduplicate_run_states(
+    run_states: Iterable[SparkRunState],
+    *,
+    policy: str = "latest",
+) -> DeduplicationResult:
+    """Keep one row per run identity according to ``policy``.
+
+    ``latest`` keeps the most recently completed snapshot, ``complete`` keeps
+    the snapshot with the most populated telemetry (ties go to the latest) and
+    ``off`` disables deduplication. Rows without any identifier are kept as-is.
+    Survivors retain the relative order of their first occurrence.
+    """
+
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(
+            f"Unknown dedup policy '{policy}'; expected one of {', '.join(DEDUP_POLICIES)}"
+        )
+
+    run_states = list(run_states)
+    if policy == "off":
+        return DeduplicationResult(run_states=run_states, collapsed_rows=0, duplicated_runs=0)
+
+    rank = _completeness_rank if policy == "complete" else _recency_rank
+    survivors: list[SparkRunState] = []
+    slot_by_key: dict[tuple[str, ...], int] = {}
+    duplicated: set[tuple[str, ...]] = set()
+
+    for run_state in run_states:
+        key = run_identity_key(run_state)
+        if key is None:
+            survivors.append(run_state)
+            continue
+        slot = slot_by_key.get(key)
+        if slot is None:
+            slot_by_key[key] = len(survivors)
+            survivors.append(run_state)
+            continue
+        duplicated.add(key)
+        if rank(run_state) > rank(survivors[slot]):
+            survivors[slot] = run_state
+
+    return DeduplicationResult(
+        run_states=survivors,
+        collapsed_rows=len(run_states) - len(survivors),
+        duplicated_runs=len(duplicated),
+    )
+
+
+def iter_deduplicated_run_states(
+    run_states: Iterable[SparkRunState],
+    *,
+    policy: str = "latest",
+    sort_key: Callable[[SparkRunState], tuple[Any, ...]],
+    counts: DeduplicationCounts,
+    max_open_runs: int = 10_000,
+) -> Iterator[SparkRunState]:
+    """Streaming :func:`deduplicate_run_states` for input ordered by ``sort_key``.
+
+    The input only has to be ordered by the leading ``sort_key`` component.
+    Survivors are held per run identity, replaced by better snapshots as they
+    arrive, and yielded in full ``sort_key`` order once more than
+    ``max_open_runs`` are held and their leading component is behind the
+    input's. Retries and snapshots taken before the start time was recorded
+    sort after the run's first snapshot, so while they arrive within
+    ``max_open_runs`` runs of it the result matches the batch function. A
+    later duplicate of a run already yielded is dropped and counted instead.
+    Released identities are remembered for ``max_open_runs * 16`` runs.
+    """
+
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(
+            f"Unknown dedup policy '{policy}'; expected one of {', '.join(DEDUP_POLICIES)}"
+        )
+
+    rank = _completeness_rank if policy == "complete" else _recency_rank
+    max_open_runs = max(max_open_runs, 1)
+    # Identity -> (sequence of the held survivor's heap entry, survivor,
+    # whether the identity has been seen more than once).
+    held: dict[Any, tuple[int, SparkRunState, bool]] = {}
+    released: OrderedDict[Any, bool] = OrderedDict()
+    heap: list[tuple[tuple[Any, ...], int, Any]] = []
+    sequence = count()
+
+    def release(leading: Any | None) -> Iterator[SparkRunState]:
+        while heap and (leading is None or len(held) > max_open_runs):
+            entry_key, seq, identity = heap[0]
+            current = held.get(identity)
+            if current is not None and current[0] != seq:
+                heapq.heappop(heap)  # superseded by a better snapshot
+                continue
+            if leading is not None and not entry_key[0] < leading:
+                return
+            heapq.heappop(heap)
+            _, survivor, duplicated = held.pop(identity)
+            released[identity] = duplicated
+            if len(released) > max_open_runs * 16:
+                released.popitem(last=False)
+            yield survivor
+
+    for run_state in run_states:
+        entry_key = sort_key(run_state)
+        seq = next(sequence)
+        identity = run_identity_key(run_state) if policy != "off" else None
+        if identity is None:
+            identity = ("row", seq)
+        elif identity in released:
+            counts.collapsed_rows += 1
+            if not released[identity]:
+                released[identity] = True
+                counts.duplicated_runs += 1
+            continue
+        elif identity in held:
+            held_seq, survivor, duplicated = held[identity]
+            counts.collapsed_rows += 1
+            if not duplicated:
+                counts.duplicated_runs += 1
+            if rank(run_state) > rank(survivor):
+                held[identity] = (seq, run_state, True)
+                heapq.heappush(heap, (entry_key, seq, identity))
+            else:
+                held[identity] = (held_seq, survivor, True)
+            continue
+        held[identity] = (seq, run_state, False)
+        heapq.heappush(heap, (entry_key, seq, identity))
+        yield from release(entry_key[0])
+    yield from release(None)
+
+
+def _recency_rank(run_state: SparkRunState) -> tuple[float, str]:
+    moment = run_state.end_epoch
+    if moment is None:
+        moment = run_state.start_epoch
+    return (moment if moment is not None else float("-inf"), run_state.run_date or "")
+
+
+def _completeness_rank(run_state: SparkRunState) -> tuple[int, int, int, tuple[float, str]]:
+    metrics = run_state.spark_event_metrics
+    telemetry = sum(
+        1
+        for section in ("app", "jobs", "stages")
+        if metrics.get(section)
+    ) + int(bool(run_state.cluster_config_details))
+    populated = sum(
+        1
+        for value in (
+            run_state.run_date,
+            run_state.application_start_time,
+            run_state.application_end_time,
+            run_state.status,
+            run_state.dataproc_jobid,
+            run_state.dataproc_cluster_uuid,
+            run_state.log_location,
+        )
+        if value
+    )
+    terminal = int((run_state.status or "").upper() in TERMINAL_STATUSES)
+    return (terminal, telemetry, populated, _recency_rank(run_state))
@@ -5,6 +5,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass, asdict
 from datetime import timedelta
+from pathlib import Path
 from typing import Optional
 
 
@@ -19,7 +20,63 @@ class MonitoringConfig:
       * DATAPROC_BASELINE_DAYS: Trailing window for baseline statistics.
       * DATAPROC_BQ_DATASET: BigQuery dataset used for the performance memory.
       * DATAPROC_BQ_TABLE: BigQuery table for daily facts.
+      * DATAPROC_BQ_CLUSTER_CONFIG_TABLE: BigQuery table holding the distinct
+        cluster configs referenced by facts in "reference" mode.
+      * DATAPROC_BQ_BASELINE_ROLLUP_TABLE: BigQuery table holding the per-family,
+        per-day baseline sketches when DATAPROC_BASELINE_ROLLUPS is enabled.
+      * DATAPROC_CLUSTER_CONFIG_MODE: "embed" (default) copies the cluster config
+        into every fact; "reference" stores it once per cluster.
       * DATAPROC_BQ_LOCATION: Optional BigQuery dataset location.
+      * DATAPROC_RUN_STATE_READ_MODE: "rest" (default) or "storage" to stream the
+        run state through the BigQuery Storage Read API as Arrow batches.
+      * DATAPROC_RUN_STATE_READ_STREAMS: Maximum parallel Storage Read streams.
+      * DATAPROC_RUN_STATE_SHARD_HOURS: Split longer fetch windows into time
+        shards of this many hours queried concurrently (0 disables sharding).
+      * DATAPROC_RUN_STATE_FETCH_WORKERS: Maximum concurrent shard queries.
+      * DATAPROC_RUN_STATE_CACHE: When "true", run state query results are cached
+        locally until the source table is modified.
+      * DATAPROC_RUN_STATE_CACHE_MAX_MB: Size cap of the run state result cache.
+      * DATAPROC_INCREMENTAL: When "true", only fetch runs that completed after
+        the persisted high-watermark of the previous cycle.
+      * DATAPROC_INCREMENTAL_OVERLAP_MINUTES: Re-read window behind the
+        watermark to catch late Composer writes.
+      * DATAPROC_STATE_DIR: Local directory for agent state (watermarks, caches).
+      * DATAPROC_DEDUP_POLICY: How duplicate rows of the same Spark run are
+        collapsed before fact building: "latest" (default), "complete" or "off".
+      * DATAPROC_SKIP_PROCESSED_RUNS: When "true", runs already recorded in the
+        local processed-run index are not rebuilt or re-appended to daily_facts.
+      * DATAPROC_FACT_BUILD_WORKERS: Processes used to build facts, sharded by job
+        family (0 or 1 builds in-process).
+      * DATAPROC_FACT_BUILD_PARALLEL_MIN_RUNS: Smallest batch worth starting the
+        process pool for; smaller batches are built in-process.
+      * DATAPROC_STREAMING: When "true", build_performance_memory streams the run
+        state window from BigQuery through fact building into the load in
+        chunks instead of materialising it.
+      * DATAPROC_STREAM_CHUNK_ROWS: Run states fetched and built per chunk in
+        streaming mode.
+      * DATAPROC_FACT_LOAD_CHUNK_ROWS: Fact rows per load job; facts are spooled
+        into chunks of this size as they are built.
+      * DATAPROC_FACT_LOAD_WORKERS: Fact load jobs kept in flight at once.
+      * DATAPROC_FACT_LOAD_RETRIES: Times a failed fact load chunk is retried
+        before the cycle fails.
+      * DATAPROC_FACT_WRITE_MODE: "append" (default) appends facts to the table;
+        "merge" stages them and upserts on job id, run identifier and start
+        time, so re-ingested runs replace their earlier rows.
+      * DATAPROC_BASELINE_CACHE: When "true", per-family baselines are cached
+        locally and refreshed in the background after new facts land.
+      * DATAPROC_BASELINE_CACHE_TTL_MINUTES: Age after which a cached baseline
+        is reloaded even if no new facts arrived for its family.
+      * DATAPROC_BASELINE_ROLLUPS: When "true", the memory builder maintains
+        daily mergeable baseline sketches per family and baselines are merged
+        from them instead of re-aggregating daily_facts.
+      * DATAPROC_BASELINE_DIMENSIONS: Comma-separated grouping dimensions
+        ("cluster", "machine_type", "autoscaling", combined with "+") for which
+        per-segment baselines are computed alongside the family baseline.
+      * DATAPROC_PROVISION_TABLES: When "true", missing agent tables are created
+        partitioned by date and clustered by job, and existing ones are checked
+        for that layout.
+      * DATAPROC_PROJECT_SPARK_METRICS: When "true", only the JSON paths read by
+        the detectors and fact builder are extracted from the run state table.
       * DATAPROC_EVENTLOG_BUCKET: GCS bucket where Spark event logs are stored.
       * DATAPROC_EVENTLOG_PREFIX: Optional prefix within the bucket.
       * DATAPROC_MAX_EVENTLOG_BYTES: Guard-rail for Spark event log downloads.
@@ -32,9 +89,37 @@ class MonitoringConfig:
     baseline_days: int = 7
     bq_dataset: str = "dataproc_monitoring"
     bq_table: str = "daily_facts"
+    bq_cluster_config_table: str = "cluster_configs"
+    bq_baseline_rollup_table: str = "baseline_rollups"
+    cluster_config_mode: str = "embed"
     run_state_dataset: Optional[str] = None
     run_state_table: str = "cag_run_state"
     bq_location: Optional[str] = None
+    run_state_read_mode: str = "rest"
+    run_state_read_streams: int = 4
+    run_state_shard_hours: int = 0
+    run_state_fetch_workers: int = 4
+    run_state_cache: bool = False
+    run_state_cache_max_mb: int = 256
+    incremental: bool = False
+    incremental_overlap_minutes: int = 15
+    state_dir: str = "~/.cache/dataproc_monitoring_agent"
+    project_spark_metrics: bool = False
+    dedup_policy: str = "latest"
+    skip_processed_runs: bool = False
+    fact_build_workers: int = 0
+    fact_build_parallel_min_runs: int = 5000
+    streaming: bool = False
+    stream_chunk_rows: int = 2000
+    fact_load_chunk_rows: int = 50000
+    fact_load_workers: int = 4
+    fact_load_retries: int = 2
+    fact_write_mode: str = "append"
+    baseline_cache: bool = False
+    baseline_cache_ttl_minutes: int = 360
+    baseline_rollups: bool = False
+    baseline_dimensions: tuple[str, ...] = ()
+    provision_tables: bool = False
     eventlog_bucket: Optional[str] = None
     eventlog_prefix: str = ""
     max_eventlog_bytes: int = 50_000_000
@@ -50,12 +135,42 @@ class MonitoringConfig:
         """Timedelta representation for the baseline trailing window."""
         return timedelta(days=self.baseline_days)
 
+    @property
+    def incremental_overlap(self) -> timedelta:
+        """Timedelta re-read behind the incremental high-watermark."""
+        return timedelta(minutes=self.incremental_overlap_minutes)
+
+    @property
+    def baseline_cache_ttl(self) -> timedelta:
+        """Timedelta after which cached baselines are reloaded."""
+        return timedelta(minutes=self.baseline_cache_ttl_minutes)
+
+    @property
+    def baseline_dimension_sets(self) -> tuple[tuple[str, ...], ...]:
+        """Configured baseline segments, each a tuple of dimension names."""
+        return tuple(tuple(entry.split("+")) for entry in self.baseline_dimensions)
+
+    @property
+    def state_path(self) -> Path:
+        """Expanded local directory holding persisted agent state."""
+        return Path(self.state_dir).expanduser()
+
     @property
     def fully_qualified_table(self) -> str:
         """BigQuery table identifier of the performance memory."""
         return f"{self.project_id}.{self.bq_dataset}.{self.bq_table}"
 
     @property
+    def fully_qualified_cluster_config_table(self) -> str:
+        """BigQuery table storing distinct cluster configurations."""
+        return f"{self.project_id}.{self.bq_dataset}.{self.bq_cluster_config_table}"
+
+    @property
+    def fully_qualified_baseline_rollup_table(self) -> str:
+        """BigQuery table storing per-family daily baseline sketches."""
+        return f"{self.project_id}.{self.bq_dataset}.{self.bq_baseline_rollup_table}"
+
+    @property
     def run_state_dataset_name(self) -> str:
         """Dataset that stores Spark run state records."""
 
@@ -86,9 +201,59 @@ class MonitoringConfig:
         baseline_days = int(os.getenv("DATAPROC_BASELINE_DAYS", "7"))
         bq_dataset = os.getenv("DATAPROC_BQ_DATASET", "dataproc_monitoring")
         bq_table = os.getenv("DATAPROC_BQ_TABLE", "daily_facts")
+        bq_cluster_config_table = os.getenv(
+            "DATAPROC_BQ_CLUSTER_CONFIG_TABLE", "cluster_configs"
+        )
+        bq_baseline_rollup_table = os.getenv(
+            "DATAPROC_BQ_BASELINE_ROLLUP_TABLE", "baseline_rollups"
+        )
+        cluster_config_mode = os.getenv("DATAPROC_CLUSTER_CONFIG_MODE", "embed").lower()
         run_state_dataset = os.getenv("DATAPROC_RUN_STATE_DATASET") or None
         run_state_table = os.getenv("DATAPROC_RUN_STATE_TABLE", "cag_run_state")
         bq_location = os.getenv("DATAPROC_BQ_LOCATION") or None
+        run_state_read_mode = os.getenv("DATAPROC_RUN_STATE_READ_MODE", "rest").lower()
+        run_state_read_streams = int(os.getenv("DATAPROC_RUN_STATE_READ_STREAMS", "4"))
+        run_state_shard_hours = int(os.getenv("DATAPROC_RUN_STATE_SHARD_HOURS", "0"))
+        run_state_fetch_workers = int(os.getenv("DATAPROC_RUN_STATE_FETCH_WORKERS", "4"))
+        run_state_cache = os.getenv(
+            "DATAPROC_RUN_STATE_CACHE", "false"
+        ).lower() in {"1", "true", "yes"}
+        run_state_cache_max_mb = int(os.getenv("DATAPROC_RUN_STATE_CACHE_MAX_MB", "256"))
+        incremental = os.getenv("DATAPROC_INCREMENTAL", "false").lower() in {"1", "true", "yes"}
+        incremental_overlap_minutes = int(
+            os.getenv("DATAPROC_INCREMENTAL_OVERLAP_MINUTES", "15")
+        )
+        state_dir = os.getenv("DATAPROC_STATE_DIR", "~/.cache/dataproc_monitoring_agent")
+        dedup_policy = os.getenv("DATAPROC_DEDUP_POLICY", "latest").lower()
+        skip_processed_runs = os.getenv(
+            "DATAPROC_SKIP_PROCESSED_RUNS", "false"
+        ).lower() in {"1", "true", "yes"}
+        fact_build_workers = int(os.getenv("DATAPROC_FACT_BUILD_WORKERS", "0"))
+        fact_build_parallel_min_runs = int(
+            os.getenv("DATAPROC_FACT_BUILD_PARALLEL_MIN_RUNS", "5000")
+        )
+        streaming = os.getenv("DATAPROC_STREAMING", "false").lower() in {"1", "true", "yes"}
+        stream_chunk_rows = int(os.getenv("DATAPROC_STREAM_CHUNK_ROWS", "2000"))
+        fact_load_chunk_rows = int(os.getenv("DATAPROC_FACT_LOAD_CHUNK_ROWS", "50000"))
+        fact_load_workers = int(os.getenv("DATAPROC_FACT_LOAD_WORKERS", "4"))
+        fact_load_retries = int(os.getenv("DATAPROC_FACT_LOAD_RETRIES", "2"))
+        fact_write_mode = os.getenv("DATAPROC_FACT_WRITE_MODE", "append").lower()
+        baseline_cache = os.getenv(
+            "DATAPROC_BASELINE_CACHE", "false"
+        ).lower() in {"1", "true", "yes"}
+        baseline_cache_ttl_minutes = int(
+            os.getenv("DATAPROC_BASELINE_CACHE_TTL_MINUTES", "360")
+        )
+        baseline_rollups = os.getenv(
+            "DATAPROC_BASELINE_ROLLUPS", "false"
+        ).lower() in {"1", "true", "yes"}
+        baseline_dimensions = _parse_dimensions(os.getenv("DATAPROC_BASELINE_DIMENSIONS", ""))
+        provision_tables = os.getenv(
+            "DATAPROC_PROVISION_TABLES", "false"
+        ).lower() in {"1", "true", "yes"}
+        project_spark_metrics = os.getenv(
+            "DATAPROC_PROJECT_SPARK_METRICS", "false"
+        ).lower() in {"1", "true", "yes"}
         eventlog_bucket = os.getenv("DATAPROC_EVENTLOG_BUCKET") or None
         eventlog_prefix = os.getenv("DATAPROC_EVENTLOG_PREFIX", "")
         max_eventlog_bytes = int(os.getenv("DATAPROC_MAX_EVENTLOG_BYTES", "50000000"))
@@ -101,9 +266,37 @@ class MonitoringConfig:
             baseline_days=baseline_days,
             bq_dataset=bq_dataset,
             bq_table=bq_table,
+            bq_cluster_config_table=bq_cluster_config_table,
+            bq_baseline_rollup_table=bq_baseline_rollup_table,
+            cluster_config_mode=cluster_config_mode,
             run_state_dataset=run_state_dataset,
             run_state_table=run_state_table,
             bq_location=bq_location,
+            run_state_read_mode=run_state_read_mode,
+            run_state_read_streams=run_state_read_streams,
+            run_state_shard_hours=run_state_shard_hours,
+            run_state_fetch_workers=run_state_fetch_workers,
+            run_state_cache=run_state_cache,
+            run_state_cache_max_mb=run_state_cache_max_mb,
+            incremental=incremental,
+            incremental_overlap_minutes=incremental_overlap_minutes,
+            state_dir=state_dir,
+            project_spark_metrics=project_spark_metrics,
+            dedup_policy=dedup_policy,
+            skip_processed_runs=skip_processed_runs,
+            fact_build_workers=fact_build_workers,
+            fact_build_parallel_min_runs=fact_build_parallel_min_runs,
+            streaming=streaming,
+            stream_chunk_rows=stream_chunk_rows,
+            fact_load_chunk_rows=fact_load_chunk_rows,
+            fact_load_workers=fact_load_workers,
+            fact_load_retries=fact_load_retries,
+            fact_write_mode=fact_write_mode,
+            baseline_cache=baseline_cache,
+            baseline_cache_ttl_minutes=baseline_cache_ttl_minutes,
+            baseline_rollups=baseline_rollups,
+            baseline_dimensions=baseline_dimensions,
+            provision_tables=provision_tables,
             eventlog_bucket=eventlog_bucket,
             eventlog_prefix=eventlog_prefix,
             max_eventlog_bytes=max_eventlog_bytes,
@@ -127,9 +320,53 @@ class MonitoringConfig:
             baseline_days=int(overrides.get("baseline_days", 7)),
             bq_dataset=str(overrides.get("bq_dataset", "dataproc_monitoring")),
             bq_table=str(overrides.get("bq_table", "daily_facts")),
+            bq_cluster_config_table=str(
+                overrides.get("bq_cluster_config_table", "cluster_configs")
+            ),
+            bq_baseline_rollup_table=str(
+                overrides.get("bq_baseline_rollup_table", "baseline_rollups")
+            ),
+            cluster_config_mode=str(overrides.get("cluster_config_mode", "embed")).lower(),
             run_state_dataset=overrides.get("run_state_dataset") or None,
             run_state_table=str(overrides.get("run_state_table", "cag_run_state")),
             bq_location=overrides.get("bq_location") or None,
+            run_state_read_mode=str(overrides.get("run_state_read_mode", "rest")).lower(),
+            run_state_read_streams=int(overrides.get("run_state_read_streams", 4)),
+            run_state_shard_hours=int(overrides.get("run_state_shard_hours", 0)),
+            run_state_fetch_workers=int(overrides.get("run_state_fetch_workers", 4)),
+            run_state_cache=str(overrides.get("run_state_cache", "false")).lower()
+            in {"1", "true", "yes"},
+            run_state_cache_max_mb=int(overrides.get("run_state_cache_max_mb", 256)),
+            incremental=str(overrides.get("incremental", "false")).lower()
+            in {"1", "true", "yes"},
+            incremental_overlap_minutes=int(overrides.get("incremental_overlap_minutes", 15)),
+            state_dir=str(
+                overrides.get("state_dir", "~/.cache/dataproc_monitoring_agent")
+            ),
+            project_spark_metrics=str(overrides.get("project_spark_metrics", "false")).lower()
+            in {"1", "true", "yes"},
+            dedup_policy=str(overrides.get("dedup_policy", "latest")).lower(),
+            skip_processed_runs=str(overrides.get("skip_processed_runs", "false")).lower()
+            in {"1", "true", "yes"},
+            fact_build_workers=int(overrides.get("fact_build_workers", 0)),
+            fact_build_parallel_min_runs=int(
+                overrides.get("fact_build_parallel_min_runs", 5000)
+            ),
+            streaming=str(overrides.get("streaming", "false")).lower()
+            in {"1", "true", "yes"},
+            stream_chunk_rows=int(overrides.get("stream_chunk_rows", 2000)),
+            fact_load_chunk_rows=int(overrides.get("fact_load_chunk_rows", 50000)),
+            fact_load_workers=int(overrides.get("fact_load_workers", 4)),
+            fact_load_retries=int(overrides.get("fact_load_retries", 2)),
+            fact_write_mode=str(overrides.get("fact_write_mode", "append")).lower(),
+            baseline_cache=str(overrides.get("baseline_cache", "false")).lower()
+            in {"1", "true", "yes"},
+            baseline_cache_ttl_minutes=int(overrides.get("baseline_cache_ttl_minutes", 360)),
+            baseline_rollups=str(overrides.get("baseline_rollups", "false")).lower()
+            in {"1", "true", "yes"},
+            baseline_dimensions=_parse_dimensions(overrides.get("baseline_dimensions", ())),
+            provision_tables=str(overrides.get("provision_tables", "false")).lower()
+            in {"1", "true", "yes"},
             eventlog_bucket=overrides.get("eventlog_bucket") or None,
             eventlog_prefix=str(overrides.get("eventlog_prefix", "")),
             max_eventlog_bytes=int(overrides.get("max_eventlog_bytes", 50_000_000)),
@@ -138,6 +375,15 @@ class MonitoringConfig:
         )
 
 
+def _parse_dimensions(value: object) -> tuple[str, ...]:
+    entries = value.split(",") if isinstance(value, str) else list(value or ())
+    return tuple(
+        "+".join(part.strip().lower() for part in str(entry).split("+"))
+        for entry in entries
+        if str(entry).strip()
+    )
+
+
 def load_config(overrides: Optional[dict[str, object]] = None) -> MonitoringConfig:
     """Factory helper to stitch together configuration from env + overrides."""
 
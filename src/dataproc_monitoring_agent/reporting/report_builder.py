@@ -3,119 +3,224 @@
 from __future__ import annotations
 
 from collections import Counter
-from typing import Iterable
+from typing import Any, Iterable
 
 from ..repositories.bigquery_repository import DataprocFact
 
 
-def build_status_report(facts: Iterable[DataprocFact]) -> str:
-    facts = list(facts)
-    if not facts:
-        return "No Dataproc activity detected within the configured window."
+_SEVERITY_RANK = {"critical": 0, "warning": 1, "info": 2, "default": 3}
+_HIGHLIGHT_COUNT = 5
+_FACT_VIEW_FIELDS = (
+    "job_id",
+    "job_type",
+    "job_state",
+    "cluster_name",
+    "duration_seconds",
+    "anomaly_flags",
+)
 
-    status_counts = Counter(fact.job_state for fact in facts)
-    anomalies = [
-        fact for fact in facts if fact.anomaly_flags.get("has_issues")
-    ]
 
-    lines: list[str] = []
-    lines.append("Dataproc monitoring summary")
-    lines.append("==========================")
-    lines.append(
-        "Jobs ingested: {count} (states: {states})".format(
-            count=len(facts),
-            states=", ".join(f"{state}={count}" for state, count in status_counts.items()),
-        )
-    )
+class FactSummary:
+    """Running summary of the facts a status report is rendered from.
 
-    if anomalies:
-        severity_rank = {"critical": 0, "warning": 1, "info": 2, "default": 3}
-        grouped: dict[str, dict[str, object]] = {}
-        for fact in anomalies:
-            findings = fact.anomaly_flags.get("findings", [])
-            if not findings:
-                continue
-            job_family = fact.anomaly_flags.get("job_family") or fact.job_id
-            for finding in findings:
-                severity = finding.get("severity", "default")
-                rank = severity_rank.get(severity, severity_rank["default"])
-                current = grouped.get(job_family)
-                if current is None or rank < current["rank"]:
-                    grouped[job_family] = {
-                        "rank": rank,
-                        "severity": severity,
-                        "finding": finding,
-                        "fact": fact,
-                    }
+    Only the state counts, the most severe finding per job family, the
+    deduplicated recommendations and the first few facts are kept, so facts
+    can be folded in one at a time without holding the whole cycle. Retained
+    facts are reduced to the fields the report reads.
+    """
 
-        lines.append("")
-        lines.append(f"⚠️  {len(grouped)} regression(s) detected across logical jobs:")
-        for job_family, payload in sorted(grouped.items(), key=lambda item: item[1]["rank"]):
-            fact = payload["fact"]
-            finding = payload["finding"]
-            run_identifier = fact.anomaly_flags.get("run_identifier") or fact.job_id
-            baseline = fact.anomaly_flags.get("baseline_reference") or {}
-            baseline_snippet = ""
-            if baseline.get("p50_duration") and baseline.get("run_count"):
-                baseline_snippet = (
-                    " (baseline median {median:.1f}s over {count} runs)"
-                ).format(
-                    median=baseline["p50_duration"],
-                    count=baseline["run_count"],
-                )
-            lines.append(
-                f"- {job_family} (latest run {run_identifier}) on cluster {fact.cluster_name}: {finding['message']}{baseline_snippet}"
+    __slots__ = ("count", "anomaly_count", "status_counts", "_grouped", "_recommendations", "_highlights")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.anomaly_count = 0
+        self.status_counts: Counter[str] = Counter()
+        self._grouped: dict[str, dict[str, Any]] = {}
+        self._recommendations: dict[str, tuple[str, str]] = {}
+        self._highlights: list[dict[str, Any]] = []
+
+    def add(self, fact: DataprocFact) -> None:
+        self.count += 1
+        self.status_counts[fact.job_state] += 1
+        view: dict[str, Any] | None = None
+        if len(self._highlights) < _HIGHLIGHT_COUNT:
+            view = _fact_view(fact)
+            self._highlights.append(view)
+        if not fact.anomaly_flags.get("has_issues"):
+            return
+
+        self.anomaly_count += 1
+        for finding in fact.anomaly_flags.get("findings", []):
+            job_family = fact.anomaly_flags.get("job_family") or fact.job_id
+            severity = finding.get("severity", "default")
+            rank = _SEVERITY_RANK.get(severity, _SEVERITY_RANK["default"])
+            current = self._grouped.get(job_family)
+            if current is None or rank < current["rank"]:
+                self._grouped[job_family] = {
+                    "rank": rank,
+                    "severity": severity,
+                    "finding": finding,
+                    "fact": view or _fact_view(fact),
+                }
+        family = fact.anomaly_flags.get("job_family") or fact.job_id
+        for recommendation in fact.anomaly_flags.get("recommendations", []):
+            self._recommendations.setdefault(
+                f"{family}::{recommendation}", (family, recommendation)
             )
-    else:
-        lines.append("")
-        lines.append("No runtime regressions detected against current baselines.")
 
-    if anomalies:
-        lines.append("")
-        lines.append("Suggested actions:")
-        raw_actions: list[tuple[str, str]] = []
-        for job_family, payload in sorted(grouped.items(), key=lambda item: item[1]["rank"]):
-            fact = payload["fact"]
-            finding = payload["finding"]
-            action_text = finding.get("action")
-            if not action_text and fact.anomaly_flags.get("recommendations"):
-                action_text = fact.anomaly_flags["recommendations"][0]
-            if action_text:
-                raw_actions.append((job_family, action_text))
-        for fact in anomalies:
-            family = fact.anomaly_flags.get("job_family") or fact.job_id
-            for recommendation in fact.anomaly_flags.get("recommendations", []):
-                raw_actions.append((family, recommendation))
-
-        if raw_actions:
-            seen: set[str] = set()
-            for family, action in raw_actions:
-                key = f"{family}::{action}"
-                if key in seen:
-                    continue
-                seen.add(key)
-                lines.append(f"- {family}: {action}")
+    def update(self, facts: Iterable[DataprocFact]) -> "FactSummary":
+        for fact in facts:
+            self.add(fact)
+        return self
+
+    def to_payload(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "anomaly_count": self.anomaly_count,
+            "status_counts": dict(self.status_counts),
+            "grouped": self._grouped,
+            "recommendations": [list(item) for item in self._recommendations.values()],
+            "highlights": self._highlights,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "FactSummary":
+        summary = cls()
+        summary.count = int(payload.get("count", 0))
+        summary.anomaly_count = int(payload.get("anomaly_count", 0))
+        summary.status_counts = Counter(payload.get("status_counts") or {})
+        summary._grouped = dict(payload.get("grouped") or {})
+        summary._recommendations = {
+            f"{family}::{action}": (family, action)
+            for family, action in payload.get("recommendations") or []
+        }
+        summary._highlights = list(payload.get("highlights") or [])
+        return summary
+
+    def render(self, *, title: str | None = None) -> str:
+        if not self.count:
+            return "No Dataproc activity detected within the configured window."
+
+        lines: list[str] = []
+        if title:
+            lines.append(title)
+            lines.append("=" * len(title))
         else:
-            lines.append("- Monitor upcoming runs; no actionable regressions flagged.")
-
-    lines.append("")
-    lines.append("Recent job highlights:")
-    for fact in facts[:5]:
-        duration = "n/a"
-        if fact.duration_seconds:
-            duration = f"{fact.duration_seconds:.1f}s"
-        run_identifier = fact.anomaly_flags.get("run_identifier") or fact.job_id
+            lines.append("Dataproc monitoring summary")
+            lines.append("==========================")
         lines.append(
-            f"- {run_identifier} ({fact.job_type}) state={fact.job_state} duration={duration}"
+            "Jobs ingested: {count} (states: {states})".format(
+                count=self.count,
+                states=", ".join(f"{state}={count}" for state, count in self.status_counts.items()),
+            )
         )
-        cost_summary = fact.anomaly_flags.get("cost_summary", {})
-        vcores = cost_summary.get("app_vcore_seconds")
-        memory = cost_summary.get("app_memory_gb_seconds")
-        if any(value is not None for value in (vcores, memory)):
-            vcores_str = f"{float(vcores):.1f}" if isinstance(vcores, (int, float)) else vcores
-            memory_str = f"{float(memory):.1f}" if isinstance(memory, (int, float)) else memory
+
+        grouped = sorted(self._grouped.items(), key=lambda item: item[1]["rank"])
+        if self.anomaly_count:
+            lines.append("")
+            lines.append(f"⚠️  {len(grouped)} regression(s) detected across logical jobs:")
+            for job_family, payload in grouped:
+                fact = payload["fact"]
+                finding = payload["finding"]
+                anomaly_flags = fact["anomaly_flags"]
+                run_identifier = anomaly_flags.get("run_identifier") or fact["job_id"]
+                baseline = anomaly_flags.get("baseline_reference") or {}
+                baseline_snippet = ""
+                if baseline.get("p50_duration") and baseline.get("run_count"):
+                    baseline_snippet = (
+                        " (baseline median {median:.1f}s over {count} runs)"
+                    ).format(
+                        median=baseline["p50_duration"],
+                        count=baseline["run_count"],
+                    )
+                lines.append(
+                    f"- {job_family} (latest run {run_identifier}) on cluster {fact['cluster_name']}: {finding['message']}{baseline_snippet}"
+                )
+        else:
+            lines.append("")
+            lines.append("No runtime regressions detected against current baselines.")
+
+        if self.anomaly_count:
+            lines.append("")
+            lines.append("Suggested actions:")
+            raw_actions: list[tuple[str, str]] = []
+            for job_family, payload in grouped:
+                fact = payload["fact"]
+                finding = payload["finding"]
+                action_text = finding.get("action")
+                if not action_text and fact["anomaly_flags"].get("recommendations"):
+                    action_text = fact["anomaly_flags"]["recommendations"][0]
+                if action_text:
+                    raw_actions.append((job_family, action_text))
+            raw_actions.extend(self._recommendations.values())
+
+            if raw_actions:
+                seen: set[str] = set()
+                for family, action in raw_actions:
+                    key = f"{family}::{action}"
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    lines.append(f"- {family}: {action}")
+            else:
+                lines.append("- Monitor upcoming runs; no actionable regressions flagged.")
+
+        lines.append("")
+        lines.append("Recent job highlights:")
+        for fact in self._highlights:
+            anomaly_flags = fact["anomaly_flags"]
+            duration = "n/a"
+            if fact["duration_seconds"]:
+                duration = f"{fact['duration_seconds']:.1f}s"
+            run_identifier = anomaly_flags.get("run_identifier") or fact["job_id"]
             lines.append(
-                f"  resource usage: vcore_seconds={vcores_str} memory_gb_seconds={memory_str}"
+                f"- {run_identifier} ({fact['job_type']}) state={fact['job_state']} duration={duration}"
             )
+            cost_summary = anomaly_flags.get("cost_summary", {})
+            vcores = cost_summary.get("app_vcore_seconds")
+            memory = cost_summary.get("app_memory_gb_seconds")
+            if any(value is not None for value in (vcores, memory)):
+                vcores_str = f"{float(vcores):.1f}" if isinstance(vcores, (int, float)) else vcores
+                memory_str = f"{float(memory):.1f}" if isinstance(memory, (int, float)) else memory
+                lines.append(
+                    f"  resource usage: vcore_seconds={vcores_str} memory_gb_seconds={memory_str}"
+                )
+
+        return "\n".join(lines)
+
+
+def _fact_view(fact: DataprocFact) -> dict[str, Any]:
+    return {name: getattr(fact, name) for name in _FACT_VIEW_FIELDS}
+
+
+def build_status_report(facts: Iterable[DataprocFact], *, title: str | None = None) -> str:
+    return FactSummary().update(facts).render(title=title)
+
+
+def build_horizon_report(sections: Iterable[tuple[str, Iterable[DataprocFact]]]) -> str:
+    """Render an overview line per horizon followed by each horizon's report."""
 
+    return render_horizon_report(
+        [(label, FactSummary().update(facts)) for label, facts in sections]
+    )
+
+
+def render_horizon_report(sections: Iterable[tuple[str, FactSummary]]) -> str:
+    """:func:`build_horizon_report` over already accumulated summaries."""
+
+    sections = list(sections)
+    lines: list[str] = []
+    lines.append("Dataproc monitoring summary by horizon")
+    lines.append("======================================")
+    for label, summary in sections:
+        lines.append(
+            f"- last {label}: {summary.count} job(s), {summary.anomaly_count} with anomalies"
+        )
+
+    for label, summary in sections:
+        lines.append("")
+        if summary.count:
+            lines.append(summary.render(title=f"Last {label}"))
+        else:
+            lines.append(f"Last {label}: no Dataproc activity detected.")
     return "\n".join(lines)
@@ -1,169 +1,1030 @@
-"""BigQuery persistence layer for the Dataproc monitoring agent."""
-
-from __future__ import annotations
-
-from dataclasses import dataclass, asdict
-import json
-from datetime import datetime, timezone
-from typing import Iterable
-
-from google.api_core import exceptions
-from google.api_core.exceptions import NotFound, Forbidden
-from google.cloud import bigquery
-from google.cloud.bigquery import LoadJobConfig
-
-from ..config.settings import MonitoringConfig
-
-
-@dataclass(slots=True)
-class DataprocFact:
-    ingest_date: str
-    ingest_timestamp: str
-    project_id: str
-    region: str
-    cluster_name: str
-    job_id: str
-    job_type: str
-    job_state: str
-    job_start_time: str | None
-    job_end_time: str | None
-    duration_seconds: float | None
-    yarn_application_ids: list[str]
-    cluster_metrics: dict
-    job_metrics: dict
-    driver_log_excerpt: str | None
-    yarn_log_excerpt: str | None
-    spark_event_snippet: str | None
-    anomaly_flags: dict
-
-    def __post_init__(self) -> None:
-        if isinstance(self.cluster_metrics, str) and self.cluster_metrics:
-            try:
-                self.cluster_metrics = json.loads(self.cluster_metrics)
-            except json.JSONDecodeError:
-                self.cluster_metrics = {}
-        elif self.cluster_metrics is None:
-            self.cluster_metrics = {}
-
-        if isinstance(self.job_metrics, str) and self.job_metrics:
-            try:
-                self.job_metrics = json.loads(self.job_metrics)
-            except json.JSONDecodeError:
-                self.job_metrics = {}
-        elif self.job_metrics is None:
-            self.job_metrics = {}
-
-        if isinstance(self.anomaly_flags, str) and self.anomaly_flags:
-            try:
-                self.anomaly_flags = json.loads(self.anomaly_flags)
-            except json.JSONDecodeError:
-                self.anomaly_flags = {}
-        elif self.anomaly_flags is None:
-            self.anomaly_flags = {}
-
-    def to_json(self) -> dict:
-        payload = asdict(self)
-        payload["cluster_metrics"] = json.dumps(payload["cluster_metrics"]) if payload["cluster_metrics"] else None
-        payload["job_metrics"] = json.dumps(payload["job_metrics"]) if payload["job_metrics"] else None
-        payload["anomaly_flags"] = json.dumps(payload["anomaly_flags"]) if payload["anomaly_flags"] else None
-        return payload
-
-
-_TABLE_SCHEMA = [
-    bigquery.SchemaField("ingest_date", "DATE"),
-    bigquery.SchemaField("ingest_timestamp", "TIMESTAMP"),
-    bigquery.SchemaField("project_id", "STRING"),
-    bigquery.SchemaField("region", "STRING"),
-    bigquery.SchemaField("cluster_name", "STRING"),
-    bigquery.SchemaField("job_id", "STRING"),
-    bigquery.SchemaField("job_type", "STRING"),
-    bigquery.SchemaField("job_state", "STRING"),
-    bigquery.SchemaField("job_start_time", "TIMESTAMP"),
-    bigquery.SchemaField("job_end_time", "TIMESTAMP"),
-    bigquery.SchemaField("duration_seconds", "FLOAT"),
-    bigquery.SchemaField("yarn_application_ids", "STRING", mode="REPEATED"),
-    bigquery.SchemaField("cluster_metrics", "JSON"),
-    bigquery.SchemaField("job_metrics", "JSON"),
-    bigquery.SchemaField("driver_log_excerpt", "STRING"),
-    bigquery.SchemaField("yarn_log_excerpt", "STRING"),
-    bigquery.SchemaField("spark_event_snippet", "STRING"),
-    bigquery.SchemaField("anomaly_flags", "JSON"),
-]
-
-
-def ensure_performance_table(config: MonitoringConfig) -> None:
-    """Verify the performance dataset/table exist; raise if they do not."""
-
-    client = bigquery.Client(project=config.project_id)
-
-    dataset_ref = bigquery.DatasetReference(config.project_id, config.bq_dataset)
-    try:
-        client.get_dataset(dataset_ref)
-    except NotFound as exc:
-        raise RuntimeError(
-            f"BigQuery dataset '{config.bq_dataset}' not found in project {config.project_id}. "
-            "Create it manually before running the monitoring pipeline."
-        ) from exc
-    except Forbidden as exc:
-        raise RuntimeError(
-            "Insufficient permissions to read BigQuery dataset metadata. "
-            "Grant bigquery.datasets.get on the dataset or run with DATAPROC_DRY_RUN=true."
-        ) from exc
-
-    table_ref = dataset_ref.table(config.bq_table)
-    try:
-        client.get_table(table_ref)
-    except NotFound as exc:
-        raise RuntimeError(
-            f"BigQuery table '{config.bq_dataset}.{config.bq_table}' is missing. "
-            "Create it with the documented schema before running the monitoring pipeline."
-        ) from exc
-    except Forbidden as exc:
-        raise RuntimeError(
-            "Insufficient permissions to access the BigQuery table. "
-            "Grant bigquery.tables.get on the table or run with DATAPROC_DRY_RUN=true."
-        ) from exc
-
-
-_LOAD_JOB_TIMEOUT = 300.0
-
-
-def insert_daily_facts(
-    config: MonitoringConfig,
-    *,
-    records: Iterable[DataprocFact],
-) -> None:
-    """Load daily fact rows into BigQuery."""
-
-    payload = [record.to_json() for record in records]
-    if not payload:
-        return
-
-    if config.dry_run:
-        return
-
-    client = bigquery.Client(project=config.project_id)
-    table_id = config.fully_qualified_table
-
-    job_config = LoadJobConfig()
-    job_config.write_disposition = "WRITE_APPEND"
-
-    try:
-        load_job = client.load_table_from_json(
-            payload,
-            table_id,
-            job_config=job_config,
-            location=config.bq_location,
-        )
-        load_job.result(timeout=_LOAD_JOB_TIMEOUT)
-    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
-        raise RuntimeError(
-            "Failed to load rows into {table}: {error}".format(
-                table=table_id,
-                error=exc,
-            )
-        ) from exc
-
-
-def utc_now() -> datetime:
-    return datetime.now(tz=timezone.utc)
+"""BigQuery persistence layer for the Dataproc monitoring agent."""
+
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field, fields
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+import tempfile
+import time
+from typing import IO, Any, Iterable, Iterator, Mapping, Sequence
+import uuid
+
+from google.api_core import exceptions
+from google.api_core.exceptions import NotFound, Forbidden
+from google.cloud import bigquery
+from google.cloud.bigquery import LoadJobConfig
+
+from ..config.settings import MonitoringConfig
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+class MetadataOverlay(Mapping[str, Any]):
+    """Read-only view of a metrics payload with extra ``metadata`` keys.
+
+    The payload is shared with the run state rather than copied; the overlay
+    keys are only merged in when the fact is serialised. Keys already present
+    in the payload's ``metadata`` section win over the overlay, as with
+    ``dict.setdefault``.
+    """
+
+    __slots__ = ("base", "metadata")
+
+    def __init__(self, base: Mapping[str, Any] | None, metadata: Mapping[str, Any]) -> None:
+        self.base = base if isinstance(base, Mapping) else {}
+        self.metadata = dict(metadata)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "metadata":
+            return self._merged_metadata()
+        return self.base[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.base
+        if "metadata" not in self.base:
+            yield "metadata"
+
+    def __len__(self) -> int:
+        return len(self.base) + ("metadata" not in self.base)
+
+    def to_dict(self) -> dict:
+        """Shallow merge: only the top level and ``metadata`` are new objects."""
+
+        merged = dict(self.base)
+        merged["metadata"] = self._merged_metadata()
+        return merged
+
+    def _merged_metadata(self) -> dict:
+        existing = self.base.get("metadata")
+        if not isinstance(existing, Mapping):
+            return dict(self.metadata)
+        merged = dict(existing)
+        for key, value in self.metadata.items():
+            merged.setdefault(key, value)
+        return merged
+
+
+@dataclass(slots=True)
+class DataprocFact:
+    ingest_date: str
+    ingest_timestamp: str
+    project_id: str
+    region: str
+    cluster_name: str
+    job_id: str
+    job_type: str
+    job_state: str
+    job_start_time: str | None
+    job_end_time: str | None
+    duration_seconds: float | None
+    yarn_application_ids: list[str]
+    cluster_metrics: dict
+    job_metrics: Mapping[str, Any]
+    driver_log_excerpt: str | None
+    yarn_log_excerpt: str | None
+    spark_event_snippet: str | None
+    anomaly_flags: dict
+    input_bytes: float | None = None
+    shuffle_read_bytes: float | None = None
+    # Typed copies of the metrics baselines aggregate, so their queries do not
+    # have to read the JSON columns.
+    app_vcore_seconds: float | None = None
+    app_memory_gb_seconds: float | None = None
+    max_over_median_ratio: float | None = None
+    p95_task_duration_ms: float | None = None
+    primary_machine_type: str | None = None
+    autoscaling_enabled: bool | None = None
+    # With job_id and job_start_time, the key facts are merged on.
+    run_identifier: str | None = None
+    # Encoded JSON columns and the payload objects they were encoded from.
+    _json_columns: tuple | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.cluster_metrics, str) and self.cluster_metrics:
+            try:
+                self.cluster_metrics = json.loads(self.cluster_metrics)
+            except json.JSONDecodeError:
+                self.cluster_metrics = {}
+        elif self.cluster_metrics is None:
+            self.cluster_metrics = {}
+
+        if isinstance(self.job_metrics, str) and self.job_metrics:
+            try:
+                self.job_metrics = json.loads(self.job_metrics)
+            except json.JSONDecodeError:
+                self.job_metrics = {}
+        elif self.job_metrics is None:
+            self.job_metrics = {}
+
+        if isinstance(self.anomaly_flags, str) and self.anomaly_flags:
+            try:
+                self.anomaly_flags = json.loads(self.anomaly_flags)
+            except json.JSONDecodeError:
+                self.anomaly_flags = {}
+        elif self.anomaly_flags is None:
+            self.anomaly_flags = {}
+
+    def to_json(self) -> dict:
+        # JSON columns are encoded straight from the attributes; ``asdict``
+        # would deep-copy every nested payload only to serialise it.
+        payload = {name: getattr(self, name) for name in _FACT_COLUMNS}
+        payload["yarn_application_ids"] = list(self.yarn_application_ids)
+        cluster_metrics, job_metrics, anomaly_flags = self._encoded_json_columns()
+        payload["cluster_metrics"] = cluster_metrics
+        payload["job_metrics"] = job_metrics
+        payload["anomaly_flags"] = anomaly_flags
+        return payload
+
+    def _encoded_json_columns(self) -> tuple[str | None, str | None, str | None]:
+        """Encode the JSON columns once per set of payload objects.
+
+        Reassigning a payload (as anomaly synthesis does) re-encodes it; the
+        payloads are not expected to change in place once serialised.
+        """
+
+        sources = (self.cluster_metrics, self.job_metrics, self.anomaly_flags)
+        cached = self._json_columns
+        if cached is None or any(old is not new for old, new in zip(cached[0], sources)):
+            cached = self._json_columns = (
+                sources,
+                tuple(_dump_json_column(value) for value in sources),
+            )
+        return cached[1]
+
+    @property
+    def processed_gb(self) -> float | None:
+        """GiB read from inputs and shuffles; None when neither was reported."""
+
+        if self.input_bytes is None and self.shuffle_read_bytes is None:
+            return None
+        total = (self.input_bytes or 0.0) + (self.shuffle_read_bytes or 0.0)
+        return total / _BYTES_PER_GB if total > 0 else None
+
+
+_FACT_COLUMNS = tuple(field.name for field in fields(DataprocFact) if field.init)
+_BYTES_PER_GB = float(1 << 30)
+
+
+def _dump_json_column(value: Any) -> str | None:
+    if not value:
+        return None
+    if isinstance(value, MetadataOverlay):
+        value = value.to_dict()
+    return _encode_json(value).decode("utf-8")
+
+
+def _encode_json(value: Any) -> bytes:
+    """UTF-8 JSON, through orjson when it is installed."""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson rejects, such as integers past 64 bits.
+            pass
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+@dataclass(slots=True)
+class ClusterConfigRecord:
+    """Distinct cluster configuration referenced by facts via ``config_key``."""
+
+    config_key: str
+    dataproc_cluster_uuid: str | None
+    ingest_date: str
+    ingest_timestamp: str
+    cluster_config_details: dict
+    cluster_profile: dict
+
+    def to_json(self) -> dict:
+        return {
+            "config_key": self.config_key,
+            "dataproc_cluster_uuid": self.dataproc_cluster_uuid,
+            "ingest_date": self.ingest_date,
+            "ingest_timestamp": self.ingest_timestamp,
+            "cluster_config_details": json.dumps(self.cluster_config_details)
+            if self.cluster_config_details
+            else None,
+            "cluster_profile": json.dumps(self.cluster_profile) if self.cluster_profile else None,
+        }
+
+
+_TABLE_SCHEMA = [
+    bigquery.SchemaField("ingest_date", "DATE"),
+    bigquery.SchemaField("ingest_timestamp", "TIMESTAMP"),
+    bigquery.SchemaField("project_id", "STRING"),
+    bigquery.SchemaField("region", "STRING"),
+    bigquery.SchemaField("cluster_name", "STRING"),
+    bigquery.SchemaField("job_id", "STRING"),
+    bigquery.SchemaField("job_type", "STRING"),
+    bigquery.SchemaField("job_state", "STRING"),
+    bigquery.SchemaField("job_start_time", "TIMESTAMP"),
+    bigquery.SchemaField("job_end_time", "TIMESTAMP"),
+    bigquery.SchemaField("duration_seconds", "FLOAT"),
+    bigquery.SchemaField("yarn_application_ids", "STRING", mode="REPEATED"),
+    bigquery.SchemaField("cluster_metrics", "JSON"),
+    bigquery.SchemaField("job_metrics", "JSON"),
+    bigquery.SchemaField("driver_log_excerpt", "STRING"),
+    bigquery.SchemaField("yarn_log_excerpt", "STRING"),
+    bigquery.SchemaField("spark_event_snippet", "STRING"),
+    bigquery.SchemaField("anomaly_flags", "JSON"),
+    bigquery.SchemaField("input_bytes", "FLOAT"),
+    bigquery.SchemaField("shuffle_read_bytes", "FLOAT"),
+    bigquery.SchemaField("app_vcore_seconds", "FLOAT"),
+    bigquery.SchemaField("app_memory_gb_seconds", "FLOAT"),
+    bigquery.SchemaField("max_over_median_ratio", "FLOAT"),
+    bigquery.SchemaField("p95_task_duration_ms", "FLOAT"),
+    bigquery.SchemaField("primary_machine_type", "STRING"),
+    bigquery.SchemaField("autoscaling_enabled", "BOOLEAN"),
+    bigquery.SchemaField("run_identifier", "STRING"),
+]
+
+_FACT_KEY_COLUMNS = ("job_id", "run_identifier", "job_start_time")
+
+# JSON paths the typed metric columns were extracted from before they existed;
+# ``backfill_fact_metric_columns`` copies them into rows written earlier.
+_TYPED_COLUMN_SOURCES = {
+    "app_vcore_seconds": "SAFE_CAST(JSON_VALUE(job_metrics, '$.app.app_vcore_seconds') AS FLOAT64)",
+    "app_memory_gb_seconds": (
+        "SAFE_CAST(JSON_VALUE(job_metrics, '$.app.app_memory_gb_seconds') AS FLOAT64)"
+    ),
+    "max_over_median_ratio": (
+        "SAFE_CAST(JSON_VALUE(job_metrics, '$.jobs[0].max_over_median_ratio') AS FLOAT64)"
+    ),
+    "p95_task_duration_ms": (
+        "SAFE_CAST(JSON_VALUE(job_metrics, '$.jobs[0].p95_task_duration_ms') AS FLOAT64)"
+    ),
+    "primary_machine_type": "JSON_VALUE(cluster_metrics, '$.cluster_profile.primary_machine_type')",
+    "autoscaling_enabled": (
+        "SAFE_CAST(JSON_VALUE(cluster_metrics, '$.cluster_profile.autoscaling_enabled') AS BOOL)"
+    ),
+    "run_identifier": "JSON_VALUE(job_metrics, '$.metadata.run_identifier')",
+}
+
+_CLUSTER_CONFIG_SCHEMA = [
+    bigquery.SchemaField("config_key", "STRING"),
+    bigquery.SchemaField("dataproc_cluster_uuid", "STRING"),
+    bigquery.SchemaField("ingest_date", "DATE"),
+    bigquery.SchemaField("ingest_timestamp", "TIMESTAMP"),
+    bigquery.SchemaField("cluster_config_details", "JSON"),
+    bigquery.SchemaField("cluster_profile", "JSON"),
+]
+
+BASELINE_ROLLUP_SCHEMA = [
+    bigquery.SchemaField("job_id", "STRING"),
+    bigquery.SchemaField("rollup_date", "DATE"),
+    bigquery.SchemaField("job_type", "STRING"),
+    bigquery.SchemaField("cluster_name", "STRING"),
+    bigquery.SchemaField("run_count", "INTEGER"),
+    bigquery.SchemaField("duration_sum", "FLOAT"),
+    bigquery.SchemaField("duration_count", "INTEGER"),
+    bigquery.SchemaField("app_vcore_seconds_sum", "FLOAT"),
+    bigquery.SchemaField("app_vcore_seconds_count", "INTEGER"),
+    bigquery.SchemaField("app_memory_gb_seconds_sum", "FLOAT"),
+    bigquery.SchemaField("app_memory_gb_seconds_count", "INTEGER"),
+    bigquery.SchemaField("max_over_median_ratio_sum", "FLOAT"),
+    bigquery.SchemaField("max_over_median_ratio_count", "INTEGER"),
+    bigquery.SchemaField("vcore_seconds_per_gb_sum", "FLOAT"),
+    bigquery.SchemaField("vcore_seconds_per_gb_count", "INTEGER"),
+    bigquery.SchemaField("memory_gb_seconds_per_gb_sum", "FLOAT"),
+    bigquery.SchemaField("memory_gb_seconds_per_gb_count", "INTEGER"),
+    bigquery.SchemaField("duration_sketch", "STRING"),
+    bigquery.SchemaField("app_vcore_seconds_sketch", "STRING"),
+    bigquery.SchemaField("app_memory_gb_seconds_sketch", "STRING"),
+    bigquery.SchemaField("p95_task_duration_ms_sketch", "STRING"),
+    bigquery.SchemaField("seconds_per_gb_sketch", "STRING"),
+    bigquery.SchemaField("updated_at", "TIMESTAMP"),
+    bigquery.SchemaField("run_keys", "STRING", mode="REPEATED"),
+]
+
+
+@dataclass(frozen=True, slots=True)
+class _TableLayout:
+    """Schema, daily partitioning column and clustering of an agent table."""
+
+    schema: tuple[bigquery.SchemaField, ...]
+    partition_column: str
+    clustering: tuple[str, ...]
+
+
+_FACT_LAYOUT = _TableLayout(tuple(_TABLE_SCHEMA), "ingest_date", ("job_id", "cluster_name"))
+_CLUSTER_CONFIG_LAYOUT = _TableLayout(tuple(_CLUSTER_CONFIG_SCHEMA), "ingest_date", ("config_key",))
+_BASELINE_ROLLUP_LAYOUT = _TableLayout(tuple(BASELINE_ROLLUP_SCHEMA), "rollup_date", ("job_id",))
+
+
+def ensure_performance_table(config: MonitoringConfig) -> None:
+    """Verify the performance dataset/table exist; raise if they do not.
+
+    With ``provision_tables`` missing tables are created partitioned and
+    clustered instead, and existing ones are checked for that layout.
+    """
+
+    client = bigquery.Client(project=config.project_id)
+
+    dataset_ref = bigquery.DatasetReference(config.project_id, config.bq_dataset)
+    try:
+        client.get_dataset(dataset_ref)
+    except NotFound as exc:
+        raise RuntimeError(
+            f"BigQuery dataset '{config.bq_dataset}' not found in project {config.project_id}. "
+            "Create it manually before running the monitoring pipeline."
+        ) from exc
+    except Forbidden as exc:
+        raise RuntimeError(
+            "Insufficient permissions to read BigQuery dataset metadata. "
+            "Grant bigquery.datasets.get on the dataset or run with DATAPROC_DRY_RUN=true."
+        ) from exc
+
+    tables = [(config.bq_table, _FACT_LAYOUT)]
+    if config.cluster_config_mode == "reference":
+        tables.append((config.bq_cluster_config_table, _CLUSTER_CONFIG_LAYOUT))
+    if config.baseline_rollups:
+        tables.append((config.bq_baseline_rollup_table, _BASELINE_ROLLUP_LAYOUT))
+
+    for table_name, layout in tables:
+        table_ref = dataset_ref.table(table_name)
+        try:
+            table = client.get_table(table_ref)
+        except NotFound as exc:
+            if not config.provision_tables or config.dry_run:
+                raise RuntimeError(
+                    f"BigQuery table '{config.bq_dataset}.{table_name}' is missing. "
+                    "Create it with the documented schema before running the monitoring pipeline."
+                ) from exc
+            table = _create_table(client, table_ref, layout)
+        except Forbidden as exc:
+            raise RuntimeError(
+                "Insufficient permissions to access the BigQuery table. "
+                "Grant bigquery.tables.get on the table or run with DATAPROC_DRY_RUN=true."
+            ) from exc
+        if config.provision_tables:
+            _verify_table_layout(client, table, layout, dry_run=config.dry_run)
+        if table_name == config.bq_table:
+            _upgrade_fact_table(client, table, dry_run=config.dry_run)
+
+
+def _create_table(
+    client: bigquery.Client,
+    table_ref: bigquery.TableReference,
+    layout: _TableLayout,
+) -> bigquery.Table:
+    table = bigquery.Table(table_ref, schema=list(layout.schema))
+    table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.DAY,
+        field=layout.partition_column,
+    )
+    table.clustering_fields = list(layout.clustering)
+    try:
+        return client.create_table(table, exists_ok=True)
+    except Forbidden as exc:
+        raise RuntimeError(
+            f"Insufficient permissions to create BigQuery table '{table_ref.table_id}'. "
+            "Grant bigquery.tables.create on the dataset or create the table manually."
+        ) from exc
+
+
+def _verify_table_layout(
+    client: bigquery.Client,
+    table: bigquery.Table,
+    layout: _TableLayout,
+    *,
+    dry_run: bool,
+) -> None:
+    """Raise if ``table`` is not partitioned as laid out; add missing clustering."""
+
+    partitioning = table.time_partitioning
+    if partitioning is None or partitioning.field != layout.partition_column:
+        raise RuntimeError(
+            f"BigQuery table '{table.table_id}' is not partitioned on {layout.partition_column}, "
+            "so every query scans its full history. Rebuild it with "
+            f"`CREATE TABLE <new_table> PARTITION BY {layout.partition_column} "
+            f"CLUSTER BY {', '.join(layout.clustering)} AS SELECT * FROM <table>` and swap "
+            "the tables, or unset DATAPROC_PROVISION_TABLES."
+        )
+    if list(table.clustering_fields or ()) == list(layout.clustering):
+        return
+    if dry_run:
+        logging.warning(
+            "Table %s is not clustered on %s; run once without DATAPROC_DRY_RUN to cluster it.",
+            table.table_id,
+            ", ".join(layout.clustering),
+        )
+        return
+    # Only data written from now on is clustered; existing storage is left as is.
+    table.clustering_fields = list(layout.clustering)
+    try:
+        client.update_table(table, ["clustering_fields"])
+    except Forbidden as exc:
+        raise RuntimeError(
+            f"Insufficient permissions to cluster BigQuery table '{table.table_id}'. "
+            "Grant bigquery.tables.update on the table or unset DATAPROC_PROVISION_TABLES."
+        ) from exc
+
+
+def _upgrade_fact_table(client: bigquery.Client, table: bigquery.Table, *, dry_run: bool) -> None:
+    """Add fact columns introduced after the table was created."""
+
+    existing = {field.name for field in table.schema}
+    missing = [field.name for field in _TABLE_SCHEMA if field.name not in existing]
+    if not missing:
+        return
+    if dry_run:
+        logging.warning(
+            "Table %s lacks columns %s; run once without DATAPROC_DRY_RUN to add them.",
+            table.table_id,
+            ", ".join(missing),
+        )
+        return
+    try:
+        _add_missing_columns(client, table, _TABLE_SCHEMA)
+    except Forbidden as exc:
+        raise RuntimeError(
+            f"BigQuery table '{table.table_id}' lacks columns {', '.join(missing)}. "
+            "Grant bigquery.tables.update on the table or add them as NULLABLE columns manually."
+        ) from exc
+
+
+_LOAD_JOB_TIMEOUT = 300.0
+_LOAD_RETRY_BACKOFF_SECONDS = 2.0
+_LOAD_JOB_POLL_SECONDS = 5.0
+
+
+@dataclass(slots=True)
+class LoadChunkStats:
+    index: int
+    rows: int
+    bytes: int
+    seconds: float = 0.0
+    attempts: int = 0
+
+
+@dataclass(slots=True)
+class MergeStats:
+    """Row counts of one staging-table MERGE."""
+
+    staged_rows: int
+    inserted_rows: int = 0
+    updated_rows: int = 0
+
+    def to_payload(self) -> dict[str, int]:
+        return {
+            "staged_rows": self.staged_rows,
+            "inserted_rows": self.inserted_rows,
+            "replaced_rows": self.updated_rows,
+            # Staged rows sharing a key; only the latest of them was applied.
+            "collapsed_rows": self.staged_rows - self.inserted_rows - self.updated_rows,
+        }
+
+
+@dataclass(slots=True)
+class FactLoadReport:
+    """Per-chunk outcome of one :func:`insert_daily_facts` call."""
+
+    chunks: list[LoadChunkStats] = field(default_factory=list)
+    upsert: MergeStats | None = None
+
+    def to_payload(self) -> dict[str, Any]:
+        payload = {
+            "chunks": len(self.chunks),
+            "rows": sum(chunk.rows for chunk in self.chunks),
+            "bytes": sum(chunk.bytes for chunk in self.chunks),
+            "retries": sum(max(chunk.attempts - 1, 0) for chunk in self.chunks),
+            "slowest_chunk_seconds": round(
+                max((chunk.seconds for chunk in self.chunks), default=0.0), 3
+            ),
+            "chunk_stats": [
+                {
+                    "index": chunk.index,
+                    "rows": chunk.rows,
+                    "bytes": chunk.bytes,
+                    "seconds": round(chunk.seconds, 3),
+                    "attempts": chunk.attempts,
+                }
+                for chunk in self.chunks
+            ],
+        }
+        if self.upsert is not None:
+            payload["upsert"] = self.upsert.to_payload()
+        return payload
+
+
+def insert_daily_facts(
+    config: MonitoringConfig,
+    *,
+    records: Iterable[DataprocFact],
+    report: FactLoadReport | None = None,
+) -> int:
+    """Load daily fact rows into BigQuery and return how many were loaded.
+
+    ``records`` is consumed lazily: rows are serialised into newline-delimited
+    JSON spool files of ``fact_load_chunk_rows`` rows as they arrive, and each
+    full file is handed to its own load job while the next one is written. At
+    most ``fact_load_workers`` chunks are spooled or loading at once, so a
+    generator of facts is never materialised and temporary disk stays
+    bounded. A failed chunk is retried on its own; chunks loaded before a
+    chunk finally fails stay loaded. Rows, bytes, latency and attempts of
+    every chunk are appended to ``report`` when one is given.
+
+    With ``fact_write_mode == "merge"`` the chunks are loaded into a staging
+    table instead and merged into the facts table on job id, run identifier
+    and start time, so a run written again by an overlapping window or a
+    retried cycle replaces its earlier row rather than duplicating it. Nothing
+    reaches the facts table until every chunk has loaded, and the MERGE's row
+    counts are recorded as ``report.upsert``.
+    """
+
+    if config.dry_run:
+        return sum(1 for _ in records)
+
+    report = report if report is not None else FactLoadReport()
+    table_id = config.fully_qualified_table
+    # One client serves every chunk's load job; it is thread-safe for job
+    # submission.
+    client = bigquery.Client(project=config.project_id)
+    if config.fact_write_mode != "merge":
+        return _load_fact_chunks(client, config, records, report, table_id=table_id)
+
+    staging_id = _create_staging_table(client, table_id, _TABLE_SCHEMA)
+    earliest_dates: list[str] = []
+
+    def tracked() -> Iterator[DataprocFact]:
+        earliest = None
+        for record in records:
+            start = (record.job_start_time or record.ingest_date)[:10]
+            earliest = start if earliest is None else min(earliest, start)
+            yield record
+        if earliest is not None:
+            earliest_dates.append(earliest)
+
+    try:
+        row_count = _load_fact_chunks(client, config, tracked(), report, table_id=staging_id)
+        if row_count:
+            # A run is ingested no earlier than the day it started; a day of
+            # slack covers start times recorded with a UTC offset.
+            earliest = date.fromisoformat(earliest_dates[0]) - timedelta(days=1)
+            report.upsert = _merge_staging(
+                client,
+                config,
+                table_id=table_id,
+                staging_id=staging_id,
+                schema=_TABLE_SCHEMA,
+                key_columns=_FACT_KEY_COLUMNS,
+                staged_rows=row_count,
+                target_filter="target.ingest_date >= @earliest_ingest_date",
+                params=[
+                    bigquery.ScalarQueryParameter(
+                        "earliest_ingest_date", "DATE", earliest.isoformat()
+                    )
+                ],
+                latest_by="ingest_timestamp",
+            )
+    finally:
+        _drop_staging_table(client, staging_id)
+    return row_count
+
+
+def _load_fact_chunks(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    records: Iterable[DataprocFact],
+    report: FactLoadReport,
+    *,
+    table_id: str,
+) -> int:
+    chunk_rows = max(config.fact_load_chunk_rows, 1)
+    workers = max(config.fact_load_workers, 1)
+    job_prefix = f"dataproc_facts_{uuid.uuid4().hex[:12]}"
+    row_count = 0
+    in_flight: set[Future[LoadChunkStats]] = set()
+    # Spools of submitted chunks; _load_chunk closes them, unless cancelled.
+    spools: dict[Future[LoadChunkStats], IO[bytes]] = {}
+    spool: IO[bytes] | None = None
+    spooled_rows = 0
+
+    def submit() -> None:
+        nonlocal in_flight, spool
+        assert spool is not None
+        stats = LoadChunkStats(index=len(report.chunks), rows=spooled_rows, bytes=spool.tell())
+        report.chunks.append(stats)
+        future = pool.submit(_load_chunk, client, config, spool, stats, job_prefix, table_id)
+        in_flight.add(future)
+        spools[future] = spool
+        spool = None
+        if len(in_flight) >= workers:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                spools.pop(future, None)
+                future.result()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fact-load") as pool:
+        try:
+            for record in records:
+                if spool is None:
+                    spool = tempfile.TemporaryFile()
+                    spooled_rows = 0
+                spool.write(_encode_json(record.to_json()))
+                spool.write(b"\n")
+                spooled_rows += 1
+                row_count += 1
+                if spooled_rows >= chunk_rows:
+                    submit()
+            if spool is not None:
+                submit()
+            for future in as_completed(in_flight):
+                spools.pop(future, None)
+                future.result()
+        except BaseException:
+            for future in in_flight:
+                if future.cancel():
+                    spools[future].close()
+            if spool is not None:
+                spool.close()
+            raise
+    return row_count
+
+
+def _load_chunk(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    spool: IO[bytes],
+    stats: LoadChunkStats,
+    job_prefix: str,
+    table_id: str,
+) -> LoadChunkStats:
+    started = time.perf_counter()
+    try:
+        while True:
+            stats.attempts += 1
+            spool.seek(0)
+            try:
+                _load_json_file(
+                    client,
+                    config,
+                    spool,
+                    table_id=table_id,
+                    job_id=f"{job_prefix}_{stats.index}_{stats.attempts}",
+                )
+                return stats
+            except _UnsettledLoadError:
+                # Retrying could append the chunk twice.
+                raise
+            except RuntimeError as exc:
+                if stats.attempts > config.fact_load_retries:
+                    raise
+                logging.warning(
+                    "Retrying fact load chunk %d (%d rows) after: %s",
+                    stats.index,
+                    stats.rows,
+                    exc,
+                )
+                time.sleep(_LOAD_RETRY_BACKOFF_SECONDS * stats.attempts)
+    finally:
+        stats.seconds = time.perf_counter() - started
+        spool.close()
+
+
+def _load_json_file(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    spool: IO[bytes],
+    *,
+    table_id: str | None = None,
+    job_id: str | None = None,
+) -> None:
+    table_id = table_id or config.fully_qualified_table
+
+    job_config = LoadJobConfig()
+    job_config.write_disposition = "WRITE_APPEND"
+    job_config.source_format = bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+
+    try:
+        load_job = client.load_table_from_file(
+            spool,
+            table_id,
+            job_id=job_id,
+            job_config=job_config,
+            location=config.bq_location,
+        )
+        load_job.result(timeout=_LOAD_JOB_TIMEOUT)
+    except (exceptions.GoogleAPICallError, exceptions.RetryError, TimeoutError) as exc:
+        # The job may still be running after the client gave up waiting;
+        # loading the chunk again before it settles could append it twice.
+        if job_id is not None and _settle_load_job(client, job_id, config.bq_location):
+            return
+        raise RuntimeError(
+            "Failed to load rows into {table}: {error}".format(
+                table=table_id,
+                error=exc,
+            )
+        ) from exc
+
+
+class _UnsettledLoadError(RuntimeError):
+    """A load attempt whose outcome could not be established."""
+
+
+def _settle_load_job(client: bigquery.Client, job_id: str, location: str | None) -> bool:
+    """Wait until a failed load attempt is DONE; True when it loaded its rows.
+
+    A job still running after another ``_LOAD_JOB_TIMEOUT`` is cancelled and
+    waited on as well, since a cancel can lose the race with completion. Only
+    a job known to be DONE, or one that never started, lets the caller retry;
+    otherwise :class:`_UnsettledLoadError` is raised.
+    """
+
+    try:
+        job = client.get_job(job_id, location=location)
+    except NotFound:
+        return False
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise _UnsettledLoadError(f"Could not look up load job {job_id}: {exc}") from exc
+
+    try:
+        if not _wait_for_job(job):
+            client.cancel_job(job_id, location=location)
+            if not _wait_for_job(job):
+                raise _UnsettledLoadError(
+                    f"Load job {job_id} is still running after it was cancelled; "
+                    "check it before loading the chunk again."
+                )
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise _UnsettledLoadError(f"Could not settle load job {job_id}: {exc}") from exc
+    return job.error_result is None
+
+
+def _wait_for_job(job: Any) -> bool:
+    deadline = time.monotonic() + _LOAD_JOB_TIMEOUT
+    while not job.done(reload=True):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(_LOAD_JOB_POLL_SECONDS)
+    return True
+
+
+def insert_cluster_configs(
+    config: MonitoringConfig,
+    *,
+    records: Iterable[ClusterConfigRecord],
+) -> MergeStats | None:
+    """Upsert the distinct cluster configs referenced by this cycle's facts.
+
+    Rows are merged on ``config_key``, so a config seen again by a later
+    cycle refreshes its one row instead of appending another. The match
+    spans every partition; the table's clustering on ``config_key`` keeps
+    that scan to the blocks holding the keys.
+    """
+
+    return merge_rows(
+        config,
+        table_id=config.fully_qualified_cluster_config_table,
+        rows=[record.to_json() for record in records],
+        schema=_CLUSTER_CONFIG_SCHEMA,
+        key_columns=("config_key",),
+    )
+
+
+def backfill_fact_metric_columns(
+    config: MonitoringConfig,
+    *,
+    since: date | None = None,
+) -> int:
+    """Populate the typed metric columns of facts written before they existed.
+
+    Adds any missing columns, then copies each metric out of the JSON columns
+    for rows whose typed metric columns are all NULL or that lack a run
+    identifier, optionally only from ingest date ``since`` onwards. Columns
+    that already hold a value keep it, and re-running only touches rows still
+    unmigrated. Returns the number of rows updated.
+    """
+
+    if config.dry_run:
+        return 0
+
+    client = bigquery.Client(project=config.project_id)
+    table_id = config.fully_qualified_table
+    assignments = ",\n          ".join(
+        f"{column} = IFNULL({column}, {source})"
+        for column, source in _TYPED_COLUMN_SOURCES.items()
+    )
+    # Rows migrated before run_identifier existed only lack that column.
+    unmigrated = " AND ".join(
+        f"{column} IS NULL" for column in _TYPED_COLUMN_SOURCES if column != "run_identifier"
+    )
+    unmigrated = f"(({unmigrated}) OR run_identifier IS NULL)"
+    params = []
+    date_filter = ""
+    if since is not None:
+        date_filter = "\n          AND ingest_date >= @since"
+        params.append(bigquery.ScalarQueryParameter("since", "DATE", since.isoformat()))
+    statement = f"""
+        UPDATE `{table_id}`
+        SET
+          {assignments}
+        WHERE {unmigrated}
+          AND (job_metrics IS NOT NULL OR cluster_metrics IS NOT NULL){date_filter}
+    """
+
+    try:
+        _add_missing_columns(client, client.get_table(table_id), _TABLE_SCHEMA)
+        job = client.query(
+            statement,
+            job_config=bigquery.QueryJobConfig(query_parameters=params),
+            location=config.bq_location,
+        )
+        job.result(timeout=_LOAD_JOB_TIMEOUT)
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise RuntimeError(
+            "Failed to backfill metric columns of {table}: {error}".format(
+                table=table_id,
+                error=exc,
+            )
+        ) from exc
+    return job.num_dml_affected_rows or 0
+
+
+_STAGING_TABLE_TTL = timedelta(hours=1)
+
+
+def merge_rows(
+    config: MonitoringConfig,
+    *,
+    table_id: str,
+    rows: list[dict],
+    schema: Sequence[bigquery.SchemaField],
+    key_columns: Sequence[str],
+    partition_column: str | None = None,
+) -> MergeStats | None:
+    """Upsert ``rows`` into ``table_id`` on ``key_columns``.
+
+    Rows are loaded into a short-lived staging table and applied with one
+    MERGE statement, so readers never see a key half replaced. The staging
+    table is dropped afterwards and expires on its own if that fails.
+
+    ``partition_column`` restricts the target to the partitions the rows
+    fall in, so the MERGE does not scan the whole table.
+    """
+
+    if not rows or config.dry_run:
+        return None
+
+    client = bigquery.Client(project=config.project_id)
+    target_filter = None
+    params = []
+    if partition_column is not None:
+        target_filter = f"target.{partition_column} IN UNNEST(@partition_values)"
+        partition_type = next(
+            field.field_type for field in schema if field.name == partition_column
+        )
+        params.append(
+            bigquery.ArrayQueryParameter(
+                "partition_values",
+                partition_type,
+                sorted({row[partition_column] for row in rows}),
+            )
+        )
+
+    try:
+        _add_missing_columns(client, client.get_table(table_id), schema)
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise RuntimeError(f"Failed to merge rows into {table_id}: {exc}") from exc
+    staging_id = _create_staging_table(client, table_id, schema)
+    job_config = LoadJobConfig(schema=list(schema))
+    job_config.write_disposition = "WRITE_TRUNCATE"
+    try:
+        try:
+            load_job = client.load_table_from_json(
+                rows,
+                staging_id,
+                job_config=job_config,
+                location=config.bq_location,
+            )
+            load_job.result(timeout=_LOAD_JOB_TIMEOUT)
+        except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+            raise RuntimeError(f"Failed to merge rows into {table_id}: {exc}") from exc
+        return _merge_staging(
+            client,
+            config,
+            table_id=table_id,
+            staging_id=staging_id,
+            schema=schema,
+            key_columns=key_columns,
+            staged_rows=len(rows),
+            target_filter=target_filter,
+            params=params,
+        )
+    finally:
+        _drop_staging_table(client, staging_id)
+
+
+def _create_staging_table(
+    client: bigquery.Client,
+    table_id: str,
+    schema: Sequence[bigquery.SchemaField],
+) -> str:
+    staging_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+    staging = bigquery.Table(staging_id, schema=list(schema))
+    staging.expires = utc_now() + _STAGING_TABLE_TTL
+    try:
+        client.create_table(staging)
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise RuntimeError(f"Failed to create staging table {staging_id}: {exc}") from exc
+    return staging_id
+
+
+def _drop_staging_table(client: bigquery.Client, staging_id: str) -> None:
+    try:
+        client.delete_table(staging_id, not_found_ok=True)
+    except exceptions.GoogleAPICallError:
+        pass
+
+
+def _merge_staging(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    *,
+    table_id: str,
+    staging_id: str,
+    schema: Sequence[bigquery.SchemaField],
+    key_columns: Sequence[str],
+    staged_rows: int,
+    target_filter: str | None = None,
+    params: Sequence[Any] = (),
+    latest_by: str | None = None,
+) -> MergeStats:
+    """MERGE ``staging_id`` into ``table_id`` on ``key_columns``.
+
+    Keys compare NULLs as equal. With ``latest_by``, staged rows sharing a
+    key are collapsed to the one with the greatest ``latest_by`` first.
+    """
+
+    columns = [field.name for field in schema]
+    updated = [column for column in columns if column not in key_columns]
+    conditions = [
+        f"target.{column} IS NOT DISTINCT FROM source.{column}" for column in key_columns
+    ]
+    if target_filter is not None:
+        conditions.append(target_filter)
+    source = f"`{staging_id}`"
+    if latest_by is not None:
+        source = f"""(
+          SELECT *
+          FROM `{staging_id}`
+          WHERE TRUE
+          QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY {", ".join(key_columns)} ORDER BY {latest_by} DESC
+          ) = 1
+        )"""
+    statement = f"""
+        MERGE `{table_id}` AS target
+        USING {source} AS source
+        ON {" AND ".join(conditions)}
+        WHEN MATCHED THEN
+          UPDATE SET {", ".join(f"{column} = source.{column}" for column in updated)}
+        WHEN NOT MATCHED THEN
+          INSERT ({", ".join(columns)})
+          VALUES ({", ".join(f"source.{column}" for column in columns)})
+    """
+    try:
+        job = client.query(
+            statement,
+            job_config=bigquery.QueryJobConfig(query_parameters=list(params)),
+            location=config.bq_location,
+        )
+        job.result(timeout=_LOAD_JOB_TIMEOUT)
+    except (exceptions.GoogleAPICallError, exceptions.RetryError) as exc:
+        raise RuntimeError(
+            "Failed to merge rows into {table}: {error}".format(
+                table=table_id,
+                error=exc,
+            )
+        ) from exc
+    stats = MergeStats(staged_rows=staged_rows)
+    if job.dml_stats is not None:
+        stats.inserted_rows = job.dml_stats.inserted_row_count
+        stats.updated_rows = job.dml_stats.updated_row_count
+    return stats
+
+
+def _add_missing_columns(
+    client: bigquery.Client,
+    table: bigquery.Table,
+    schema: Sequence[bigquery.SchemaField],
+) -> None:
+    """Append the columns of ``schema`` that ``table`` predates, as NULLABLE."""
+
+    existing = {field.name for field in table.schema}
+    missing = [field for field in schema if field.name not in existing]
+    if not missing:
+        return
+    table.schema = list(table.schema) + missing
+    client.update_table(table, ["schema"])
+
+
+def utc_now() -> datetime:
+    return datetime.now(tz=timezone.utc)
@@ -0,0 +1,188 @@
+"""Local index of runs whose facts have already been persisted."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import hashlib
+from pathlib import Path
+import re
+import struct
+from typing import Iterable
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from ..config.settings import MonitoringConfig
+from .run_state_repository import TERMINAL_STATUSES, SparkRunState
+from .state_files import replace_atomically
+
+
+# 8-byte BLAKE2b digest of the run key followed by the unix second the entry
+# was recorded, so the file can be compacted without keeping the keys.
+_ENTRY = struct.Struct("<8sI")
+
+
+class ProcessedRunIndex:
+    """Compact on-disk key set of runs already materialised as facts.
+
+    Runs are keyed on ``run_identifier``, the start second and how far the
+    run had got: its end second, or whether it had finished at all. These are
+    also recoverable from persisted ``daily_facts`` rows. A run persisted while
+    still in flight therefore does not hide its completed snapshot. When no
+    index file exists yet it is seeded from the performance table. Entries
+    older than the retention window are dropped whenever the index is saved.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        entries: dict[bytes, int] | None = None,
+        *,
+        dirty: bool = False,
+    ) -> None:
+        self._path = path
+        self._entries: dict[bytes, int] = dict(entries or {})
+        self._dirty = dirty
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, run_state: object) -> bool:
+        if not isinstance(run_state, SparkRunState):
+            return False
+        return _digest(processed_run_key(run_state)) in self._entries
+
+    def add(self, run_states: Iterable[SparkRunState], *, as_of: datetime) -> None:
+        recorded_at = int(as_of.timestamp())
+        for run_state in run_states:
+            self._entries[_digest(processed_run_key(run_state))] = recorded_at
+            self._dirty = True
+
+    def save(self, *, as_of: datetime, retention: timedelta) -> None:
+        if not self._dirty:
+            return
+        cutoff = int((as_of - retention).timestamp())
+        self._entries = {
+            digest: recorded_at
+            for digest, recorded_at in self._entries.items()
+            if recorded_at >= cutoff
+        }
+        data = b"".join(
+            _ENTRY.pack(digest, recorded_at) for digest, recorded_at in self._entries.items()
+        )
+        replace_atomically(self._path, lambda temp_path: temp_path.write_bytes(data))
+        self._dirty = False
+
+
+def processed_run_key(run_state: SparkRunState) -> str:
+    return _run_key(
+        run_state.run_identifier,
+        run_state.start_epoch,
+        run_state.end_epoch,
+        terminal=run_state.is_terminal,
+    )
+
+
+def load_processed_run_index(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+) -> ProcessedRunIndex:
+    """Load the index from the state directory, seeding it on first use."""
+
+    path = _index_path(config)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        entries = _seed_from_facts(config, as_of=as_of)
+        return ProcessedRunIndex(path, entries, dirty=True)
+
+    usable = len(data) - len(data) % _ENTRY.size
+    entries = {
+        digest: recorded_at
+        for digest, recorded_at in _ENTRY.iter_unpack(data[:usable])
+    }
+    return ProcessedRunIndex(path, entries)
+
+
+def processed_run_retention(config: MonitoringConfig) -> timedelta:
+    """How long a run may keep reappearing in ingestion windows."""
+
+    return max(config.lookback, config.baseline_window)
+
+
+def _seed_from_facts(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+) -> dict[bytes, int]:
+    client = bigquery.Client(project=config.project_id)
+    query = f"""
+        SELECT DISTINCT
+          COALESCE(
+            JSON_VALUE(anomaly_flags, '$.run_identifier'),
+            JSON_VALUE(job_metrics, '$.metadata.run_identifier')
+          ) AS run_identifier,
+          job_start_time,
+          job_end_time,
+          job_state
+        FROM `{config.fully_qualified_table}`
+        WHERE ingest_date >= DATE(@since)
+          AND ingest_timestamp >= @since
+    """
+    params = [
+        bigquery.ScalarQueryParameter(
+            "since",
+            "TIMESTAMP",
+            (as_of - processed_run_retention(config)).isoformat(),
+        ),
+    ]
+    job_config = bigquery.QueryJobConfig(query_parameters=params)
+    try:
+        rows = client.query(query, job_config=job_config).result()
+    except exceptions.GoogleAPICallError as exc:
+        raise RuntimeError(f"Failed seeding the processed run index: {exc}") from exc
+
+    recorded_at = int(as_of.timestamp())
+    entries: dict[bytes, int] = {}
+    for row in rows:
+        if not row.run_identifier:
+            continue
+        start, end = row.job_start_time, row.job_end_time
+        key = _run_key(
+            row.run_identifier,
+            start.timestamp() if start else None,
+            end.timestamp() if end else None,
+            terminal=end is not None or (row.job_state or "").upper() in TERMINAL_STATUSES,
+        )
+        entries[_digest(key)] = recorded_at
+    return entries
+
+
+def _run_key(
+    run_identifier: str,
+    start_epoch: float | None,
+    end_epoch: float | None,
+    *,
+    terminal: bool,
+) -> str:
+    start = "" if start_epoch is None else str(int(start_epoch))
+    if end_epoch is not None:
+        progress = str(int(end_epoch))
+    else:
+        progress = "done" if terminal else "running"
+    return f"{run_identifier}@{start}@{progress}"
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _index_path(config: MonitoringConfig) -> Path:
+    name = _UNSAFE_FILENAME_CHARS.sub("_", config.fully_qualified_table)
+    # Version 1 files keyed runs without their progress, so they cannot tell a
+    # run persisted in flight from its completion; a new file is reseeded.
+    return config.state_path / "processed_runs" / f"{name}.v2.bin"
@@ -0,0 +1,325 @@
+"""Local result cache for run state window queries.
+
+Results are stored as zstd-compressed Arrow (Feather) files under
+``<state_dir>/run_state_cache`` next to a small JSON index. An entry is only
+served while the source table's ``modified`` timestamp equals the one seen
+when the entry was written and the table has no streaming buffer, so any
+Composer write invalidates it. Entries are evicted least-recently-used once
+the directory exceeds ``run_state_cache_max_mb``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timezone
+import hashlib
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any
+
+from google.api_core import exceptions
+from google.cloud import bigquery
+
+from ..config.settings import MonitoringConfig
+from .state_files import replace_atomically
+
+
+_TIMESTAMP_COLUMNS = ("application_start_time", "application_end_time")
+_JSON_COLUMNS = ("cluster_config_details", "spark_event_metrics")
+_INDEX_FILE = "index.json"
+
+
+@dataclass(frozen=True, slots=True)
+class SourceTableState:
+    """Freshness markers of the run state table used to validate entries."""
+
+    modified: str | None
+    streaming: bool
+
+    @property
+    def cacheable(self) -> bool:
+        return self.modified is not None and not self.streaming
+
+
+@dataclass(slots=True)
+class _CacheEntry:
+    file: str
+    table: str
+    variant: str
+    completed_after: str | None
+    window_start: str
+    window_end: str
+    table_modified: str
+    size_bytes: int
+    last_access: float
+
+
+class RunStateResultCache:
+    """LRU cache of run state query results keyed on table, window and columns.
+
+    ``variant`` identifies the projected column set. A lookup is served by an
+    entry for the same table, variant and ``completed_after`` whose window
+    covers the requested one; the stored rows are then filtered with the same
+    predicate the query would apply. A later window end is still covered when
+    the table was last modified before the cached window closed, because no
+    row starting after that point can have been written since.
+    """
+
+    def __init__(self, directory: Path, *, max_bytes: int) -> None:
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    def lookup(
+        self,
+        *,
+        table: str,
+        variant: str,
+        start_time: datetime,
+        end_time: datetime,
+        completed_after: datetime | None,
+        table_state: SourceTableState,
+    ) -> dict[str, list[Any]] | None:
+        if not table_state.cacheable:
+            return None
+
+        entries = self._load_index()
+        stale = [
+            key
+            for key, entry in entries.items()
+            if entry.table == table and entry.table_modified != table_state.modified
+        ]
+        for key in stale:
+            self._remove(entries.pop(key))
+
+        start, end = _to_utc(start_time), _to_utc(end_time)
+        after = _to_utc(completed_after).isoformat() if completed_after else None
+        candidates = [
+            (key, entry)
+            for key, entry in entries.items()
+            if entry.table == table
+            and entry.variant == variant
+            and entry.completed_after == after
+            and _covers(entry, start, end)
+        ]
+        if not candidates:
+            if stale:
+                self._save_index(entries)
+            return None
+
+        # Prefer the narrowest covering entry: it has the fewest rows to filter.
+        key, entry = min(
+            candidates,
+            key=lambda item: _parse_timestamp(item[1].window_end)
+            - _parse_timestamp(item[1].window_start),
+        )
+        try:
+            columns = _read_columns(self._directory / entry.file, start, end)
+        except (OSError, ValueError):
+            self._remove(entries.pop(key))
+            self._save_index(entries)
+            return None
+
+        entry.last_access = time.time()
+        self._save_index(entries)
+        return columns
+
+    def store(
+        self,
+        *,
+        table: str,
+        variant: str,
+        start_time: datetime,
+        end_time: datetime,
+        completed_after: datetime | None,
+        table_state: SourceTableState,
+        columns: dict[str, list[Any]],
+    ) -> None:
+        if not table_state.cacheable:
+            return
+
+        start, end = _to_utc(start_time), _to_utc(end_time)
+        after = _to_utc(completed_after).isoformat() if completed_after else None
+        key = hashlib.sha1(
+            "|".join(
+                (table, variant, after or "", start.isoformat(), end.isoformat())
+            ).encode("utf-8")
+        ).hexdigest()[:24]
+        file_name = f"{key}.arrow"
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        size_bytes = _write_columns(self._directory / file_name, columns)
+
+        entries = self._load_index()
+        entries[key] = _CacheEntry(
+            file=file_name,
+            table=table,
+            variant=variant,
+            completed_after=after,
+            window_start=start.isoformat(),
+            window_end=end.isoformat(),
+            table_modified=table_state.modified,
+            size_bytes=size_bytes,
+            last_access=time.time(),
+        )
+        self._evict(entries)
+        self._save_index(entries)
+
+    def _evict(self, entries: dict[str, _CacheEntry]) -> None:
+        total = sum(entry.size_bytes for entry in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].last_access):
+            if total <= self._max_bytes:
+                break
+            total -= entry.size_bytes
+            self._remove(entries.pop(key))
+
+    def _remove(self, entry: _CacheEntry) -> None:
+        try:
+            (self._directory / entry.file).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self) -> dict[str, _CacheEntry]:
+        try:
+            payload = json.loads((self._directory / _INDEX_FILE).read_text(encoding="utf-8"))
+            return {key: _CacheEntry(**value) for key, value in payload.items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save_index(self, entries: dict[str, _CacheEntry]) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self._directory / _INDEX_FILE
+        payload = json.dumps({key: asdict(entry) for key, entry in entries.items()})
+        replace_atomically(path, lambda temp_path: temp_path.write_text(payload, encoding="utf-8"))
+
+
+_warned_missing_pyarrow = False
+
+
+def open_result_cache(config: MonitoringConfig) -> RunStateResultCache | None:
+    """Return the configured cache, or None when disabled or pyarrow is missing."""
+
+    global _warned_missing_pyarrow
+    if not config.run_state_cache:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        if not _warned_missing_pyarrow:
+            _warned_missing_pyarrow = True
+            logging.warning(
+                "DATAPROC_RUN_STATE_CACHE=true needs pyarrow (%s); run state is not cached",
+                exc,
+            )
+        return None
+    return RunStateResultCache(
+        config.state_path / "run_state_cache",
+        max_bytes=config.run_state_cache_max_mb * 1024 * 1024,
+    )
+
+
+def describe_source_table(client: bigquery.Client, table_id: str) -> SourceTableState:
+    """Read the freshness markers of ``table_id``; unknown state is uncacheable."""
+
+    try:
+        table = client.get_table(table_id)
+    except exceptions.GoogleAPICallError:
+        return SourceTableState(modified=None, streaming=False)
+    modified = table.modified
+    return SourceTableState(
+        modified=_to_utc(modified).isoformat() if modified else None,
+        streaming=table.streaming_buffer is not None,
+    )
+
+
+def _covers(entry: _CacheEntry, start: datetime, end: datetime) -> bool:
+    cached_start = _parse_timestamp(entry.window_start)
+    cached_end = _parse_timestamp(entry.window_end)
+    if start < cached_start:
+        return False
+    if end <= cached_end:
+        return True
+    if end.date() > cached_end.date():
+        # Rows without a start time match on run_date, which the cached
+        # window does not span.
+        return False
+    return _parse_timestamp(entry.table_modified) <= cached_end
+
+
+def _write_columns(path: Path, columns: dict[str, list[Any]]) -> int:
+    import pyarrow as pa
+    from pyarrow import feather
+
+    arrays = {}
+    for name, values in columns.items():
+        if name in _TIMESTAMP_COLUMNS:
+            arrays[name] = pa.array(
+                [_parse_timestamp(value) for value in values],
+                type=pa.timestamp("us", tz="UTC"),
+            )
+        elif name in _JSON_COLUMNS:
+            arrays[name] = pa.array([_json_text(value) for value in values], type=pa.string())
+        else:
+            arrays[name] = pa.array([_text(value) for value in values], type=pa.string())
+
+    replace_atomically(
+        path,
+        lambda temp_path: feather.write_feather(pa.table(arrays), temp_path, compression="zstd"),
+    )
+    return path.stat().st_size
+
+
+def _read_columns(path: Path, start: datetime, end: datetime) -> dict[str, list[Any]]:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import feather
+
+    table = feather.read_table(path, memory_map=True)
+    started = table.column("application_start_time")
+    run_date = pc.utf8_slice_codeunits(table.column("run_date"), 0, 10)
+    start_scalar = pa.scalar(start, type=pa.timestamp("us", tz="UTC"))
+    end_scalar = pa.scalar(end, type=pa.timestamp("us", tz="UTC"))
+    dated = pc.and_(
+        pc.greater_equal(started, start_scalar),
+        pc.less_equal(started, end_scalar),
+    )
+    undated = pc.and_(
+        pc.is_null(started),
+        pc.and_(
+            pc.greater_equal(run_date, start.date().isoformat()),
+            pc.less_equal(run_date, end.date().isoformat()),
+        ),
+    )
+    # Comparisons against NULL start times yield NULL; treat those as False
+    # before combining so the undated branch can still match.
+    mask = pc.or_(pc.fill_null(dated, False), pc.fill_null(undated, False))
+    return table.filter(mask).to_pydict()
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return _to_utc(value)
+
+
+def _json_text(value: Any) -> str | None:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def _text(value: Any) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_utc(moment: datetime) -> datetime:
+    if not moment.tzinfo:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
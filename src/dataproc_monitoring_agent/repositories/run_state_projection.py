@@ -0,0 +1,190 @@
+"""Declarative projection of the run state JSON columns pushed down into SQL.
+
+The pipeline only reads ``app.*``, a handful of per-job fields and the
+max/p95 task timings of each stage from ``spark_event_metrics``, plus the worker
+and autoscaling sections of ``cluster_config_details``. Extracting those slices
+with ``JSON_QUERY``/``JSON_VALUE`` keeps the remaining payload (task lists,
+accumulators, executor timelines) from crossing the wire or being decoded.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import json
+from typing import Any, Mapping
+
+
+@dataclass(frozen=True, slots=True)
+class MetricField:
+    """Single key extracted from every element of a JSON array.
+
+    ``text`` fields are extracted with ``JSON_VALUE`` and arrive as plain
+    strings; all others use ``JSON_QUERY`` so numbers keep their JSON type and
+    are decoded on the client.
+    """
+
+    key: str
+    text: bool = False
+
+    def sql(self, element: str) -> str:
+        function = "JSON_VALUE" if self.text else "JSON_QUERY"
+        return f"{function}({element}, '$.{self.key}') AS {self.key}"
+
+    def decode(self, value: Any) -> Any:
+        if self.text or not isinstance(value, str):
+            return value
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            # JSON-typed columns are already decoded by the client library.
+            return value
+
+
+@dataclass(frozen=True, slots=True)
+class RunStateProjection:
+    """Paths of ``spark_event_metrics``/``cluster_config_details`` to fetch."""
+
+    job_fields: tuple[MetricField, ...]
+    stage_fields: tuple[MetricField, ...]
+    cluster_config_sections: tuple[tuple[str, str], ...]
+    app_column: str = "spark_app_metrics"
+    jobs_column: str = "spark_jobs"
+    stages_column: str = "spark_stages"
+
+    @property
+    def columns(self) -> tuple[str, ...]:
+        """Result columns produced by :meth:`select_expressions`."""
+
+        return (
+            self.app_column,
+            self.jobs_column,
+            self.stages_column,
+            *(alias for _, alias in self.cluster_config_sections),
+        )
+
+    def select_expressions(
+        self,
+        *,
+        metrics_column: str = "spark_event_metrics",
+        cluster_column: str = "cluster_config_details",
+    ) -> list[str]:
+        expressions = [
+            f"JSON_QUERY({metrics_column}, '$.app') AS {self.app_column}",
+            _array_projection(metrics_column, "jobs", self.job_fields, self.jobs_column),
+            _array_projection(metrics_column, "stages", self.stage_fields, self.stages_column),
+        ]
+        expressions.extend(
+            f"JSON_QUERY({cluster_column}, '$.config.{section}') AS {alias}"
+            for section, alias in self.cluster_config_sections
+        )
+        return expressions
+
+    def assemble(self, values: Mapping[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Rebuild ``(cluster_config_details, spark_event_metrics)`` from a row.
+
+        Keys whose value is missing or null are omitted; every consumer reads
+        these payloads through ``dict.get``.
+        """
+
+        metrics: dict[str, Any] = {}
+        app = _decode_object(values.get(self.app_column))
+        if app is not None:
+            metrics["app"] = app
+        jobs = _assemble_array(values.get(self.jobs_column), self.job_fields)
+        if jobs:
+            metrics["jobs"] = jobs
+        stages = _assemble_array(values.get(self.stages_column), self.stage_fields)
+        if stages:
+            metrics["stages"] = stages
+
+        cluster_config: dict[str, Any] = {}
+        for section, alias in self.cluster_config_sections:
+            decoded = _decode_object(values.get(alias))
+            if decoded is not None:
+                cluster_config[section] = decoded
+        cluster_details = {"config": cluster_config} if cluster_config else {}
+        return cluster_details, metrics
+
+
+SPARK_METRIC_PROJECTION = RunStateProjection(
+    # Read by detect_task_straggler, _format_spark_event_snippet and the local
+    # baseline samples.
+    job_fields=(
+        MetricField("job_id"),
+        MetricField("job_name", text=True),
+        MetricField("name", text=True),
+        MetricField("num_tasks"),
+        MetricField("job_duration_ms"),
+        MetricField("max_over_median_ratio"),
+        MetricField("p95_task_duration_ms"),
+        MetricField("max_task_duration_ms"),
+    ),
+    # Read by _extract_stage_lookup (both snake_case and camelCase spellings).
+    stage_fields=(
+        MetricField("stage_id"),
+        MetricField("stageId"),
+        MetricField("name", text=True),
+        MetricField("stage_name", text=True),
+        MetricField("num_tasks"),
+        MetricField("numTasks"),
+        MetricField("max_task_duration_ms"),
+        MetricField("maxTaskDurationMs"),
+        MetricField("p95_task_duration_ms"),
+        MetricField("p95TaskDurationMs"),
+        # Summed into the run's data volume by SparkRunState._byte_volume.
+        MetricField("input_bytes"),
+        MetricField("inputBytes"),
+        MetricField("shuffle_read_bytes"),
+        MetricField("shuffleReadBytes"),
+    ),
+    # Read by _summarize_cluster_profile.
+    cluster_config_sections=(
+        ("workerConfig", "cluster_worker_config"),
+        ("secondaryWorkerConfig", "cluster_secondary_worker_config"),
+        ("autoscalingConfig", "cluster_autoscaling_config"),
+    ),
+)
+
+
+def _array_projection(
+    source: str,
+    key: str,
+    fields: tuple[MetricField, ...],
+    alias: str,
+) -> str:
+    field_sql = ", ".join(field.sql("element") for field in fields)
+    return (
+        f"ARRAY(SELECT AS STRUCT {field_sql} "
+        f"FROM UNNEST(JSON_QUERY_ARRAY({source}, '$.{key}')) AS element "
+        f"WITH OFFSET AS position ORDER BY position) AS {alias}"
+    )
+
+
+def _assemble_array(
+    elements: Any,
+    fields: tuple[MetricField, ...],
+) -> list[dict[str, Any]]:
+    if not elements:
+        return []
+    assembled: list[dict[str, Any]] = []
+    for element in elements:
+        if not isinstance(element, Mapping):
+            continue
+        item: dict[str, Any] = {}
+        for field in fields:
+            value = field.decode(element.get(field.key))
+            if value is not None:
+                item[field.key] = value
+        assembled.append(item)
+    return assembled
+
+
+def _decode_object(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    if value in (None, {}, []):
+        return None
+    return value
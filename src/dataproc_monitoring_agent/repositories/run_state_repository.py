@@ -2,21 +2,41 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import hashlib
 import json
+import logging
 import re
-from typing import Any
+import sys
+from typing import Any, Callable, Iterable, Iterator, TypeVar
 
 from google.api_core import exceptions
 from google.cloud import bigquery
 
 from ..config.settings import MonitoringConfig
+from .run_state_cache import describe_source_table, open_result_cache
+from .run_state_projection import SPARK_METRIC_PROJECTION, RunStateProjection
+
+
+TERMINAL_STATUSES = frozenset(
+    {"SUCCEEDED", "SUCCESS", "DONE", "COMPLETED", "FAILED", "ERROR", "KILLED", "CANCELLED"}
+)
+
+RUN_STATE_READ_MODES = ("rest", "storage")
 
 
 @dataclass(slots=True)
 class SparkRunState:
-    """Domain object representing a single Spark application execution."""
+    """Domain object representing a single Spark application execution.
+
+    Identity and timing fields are derived once at construction so the
+    memory builder can read them repeatedly without re-running the job-suffix
+    regex or timestamp parsing. The JSON columns are kept in their source form
+    (text or mapping) and only decoded on first access; the cost summary and
+    byte volumes derived from them are memoised the same way.
+    """
 
     run_date: str | None
     application_start_time: str | None
@@ -26,10 +46,58 @@ class SparkRunState:
     dataproc_cluster_uuid: str | None
     spark_taskid: str | None
     spark_jobid: str | None
-    cluster_config_details: dict[str, Any]
+    # The source JSON is dropped once decoded, so it is left out of equality.
+    cluster_config_json: Any = field(compare=False)
     log_location: str | None
     application_id: str | None
-    spark_event_metrics: dict[str, Any]
+    spark_event_metrics_json: Any = field(compare=False)
+    cluster_name: str = field(init=False, compare=False)
+    job_family: str = field(init=False, compare=False)
+    run_identifier: str = field(init=False, compare=False)
+    start_epoch: float | None = field(init=False, compare=False)
+    end_epoch: float | None = field(init=False, compare=False)
+    duration_seconds: float | None = field(init=False, compare=False)
+    _cluster_config_details: dict[str, Any] | None = field(
+        init=False, default=None, repr=False, compare=False
+    )
+    _spark_event_metrics: dict[str, Any] | None = field(
+        init=False, default=None, repr=False, compare=False
+    )
+    _app_metrics: dict[str, Any] | None = field(
+        init=False, default=None, repr=False, compare=False
+    )
+    _cost_summary: dict[str, Any] | None = field(
+        init=False, default=None, repr=False, compare=False
+    )
+    _byte_volumes: dict[str, float | None] = field(
+        init=False, default_factory=dict, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self.status = _intern(self.status)
+        self.dataproc_cluster_uuid = _intern(self.dataproc_cluster_uuid)
+        self.cluster_name = _intern((self.dataproc_jobid or "").strip())
+
+        family = ""
+        for candidate in (self.spark_jobid, self.spark_taskid, self.application_id):
+            family = _normalize_identifier(candidate)
+            if family:
+                break
+        self.job_family = _intern(family)
+
+        self.run_identifier = ""
+        for candidate in (self.spark_jobid, self.application_id, self.spark_taskid):
+            if candidate:
+                self.run_identifier = candidate
+                break
+
+        start = _parse_timestamp(self.application_start_time)
+        end = _parse_timestamp(self.application_end_time)
+        self.start_epoch = start.timestamp() if start else None
+        self.end_epoch = end.timestamp() if end else None
+        self.duration_seconds = None
+        if start and end:
+            self.duration_seconds = max((end - start).total_seconds(), 0.0)
 
     @classmethod
     def from_row(cls, row: bigquery.table.Row) -> "SparkRunState":
@@ -42,10 +110,10 @@ class SparkRunState:
             dataproc_cluster_uuid=row.get("dataproc_cluster_uuid"),
             spark_taskid=row.get("spark_taskid"),
             spark_jobid=row.get("spark_jobid"),
-            cluster_config_details=_coerce_json(row.get("cluster_config_details")),
+            cluster_config_json=row.get("cluster_config_details"),
             log_location=row.get("log_location"),
             application_id=row.get("application_id"),
-            spark_event_metrics=_coerce_json(row.get("spark_event_metrics")),
+            spark_event_metrics_json=row.get("spark_event_metrics"),
         )
 
     @classmethod
@@ -59,10 +127,10 @@ class SparkRunState:
             dataproc_cluster_uuid=payload.get("dataproc_cluster_uuid"),
             spark_taskid=payload.get("spark_taskid"),
             spark_jobid=payload.get("spark_jobid"),
-            cluster_config_details=_coerce_json(payload.get("cluster_config_details")),
+            cluster_config_json=payload.get("cluster_config_details"),
             log_location=payload.get("log_location"),
             application_id=payload.get("application_id"),
-            spark_event_metrics=_coerce_json(payload.get("spark_event_metrics")),
+            spark_event_metrics_json=payload.get("spark_event_metrics"),
         )
 
     def to_payload(self) -> dict[str, Any]:
@@ -82,34 +150,46 @@ class SparkRunState:
         }
 
     @property
-    def cluster_name(self) -> str:
-        return (self.dataproc_jobid or "").strip()
+    def cluster_config_details(self) -> dict[str, Any]:
+        if self._cluster_config_details is None:
+            self._cluster_config_details = _coerce_json(self.cluster_config_json)
+            self.cluster_config_json = None
+        return self._cluster_config_details
+
+    @property
+    def spark_event_metrics(self) -> dict[str, Any]:
+        if self._spark_event_metrics is None:
+            self._spark_event_metrics = _coerce_json(self.spark_event_metrics_json)
+            self.spark_event_metrics_json = None
+        return self._spark_event_metrics
+
+    def share_cluster_config(self, details: dict[str, Any]) -> None:
+        """Point this run at a cluster config shared with other runs."""
+
+        self._cluster_config_details = details
+        self.cluster_config_json = None
 
     @property
     def primary_job_id(self) -> str:
-        family = self.job_family
-        if family:
-            return family
-        return self.run_identifier
+        return self.job_family or self.run_identifier
 
     @property
-    def duration_seconds(self) -> float | None:
-        if not self.application_start_time or not self.application_end_time:
-            return None
-        try:
-            start = datetime.fromisoformat(self.application_start_time)
-            end = datetime.fromisoformat(self.application_end_time)
-        except ValueError:
-            return None
-        if not start.tzinfo:
-            start = start.replace(tzinfo=timezone.utc)
-        if not end.tzinfo:
-            end = end.replace(tzinfo=timezone.utc)
-        return max((end - start).total_seconds(), 0.0)
+    def is_terminal(self) -> bool:
+        """Whether the run has finished, so no later snapshot supersedes it."""
+
+        return bool(self.application_end_time) or (
+            (self.status or "").upper() in TERMINAL_STATUSES
+        )
 
     @property
     def app_metrics(self) -> dict[str, Any]:
-        return _ensure_dict(self.spark_event_metrics.get("app"))
+        """Application metrics with camelCase keys normalised to snake_case."""
+
+        if self._app_metrics is None:
+            self._app_metrics = _normalize_metric_keys(
+                _ensure_dict(self.spark_event_metrics.get("app"))
+            )
+        return self._app_metrics
 
     @property
     def job_metrics(self) -> list[dict[str, Any]]:
@@ -125,27 +205,199 @@ class SparkRunState:
 
     @property
     def cost_summary(self) -> dict[str, Any]:
-        app = self.app_metrics
-        return {
-            "app_vcore_seconds": app.get("app_vcore_seconds"),
-            "app_memory_gb_seconds": app.get("app_memory_gb_seconds"),
-            "executor_peak": app.get("executor_peak"),
-        }
+        if self._cost_summary is None:
+            app = self.app_metrics
+            self._cost_summary = {
+                "app_vcore_seconds": app.get("app_vcore_seconds"),
+                "app_memory_gb_seconds": app.get("app_memory_gb_seconds"),
+                "executor_peak": app.get("executor_peak"),
+            }
+        return self._cost_summary
 
     @property
-    def job_family(self) -> str:
-        for candidate in (self.spark_jobid, self.spark_taskid, self.application_id):
-            normalized = _normalize_identifier(candidate)
-            if normalized:
-                return normalized
-        return ""
+    def input_bytes(self) -> float | None:
+        """Bytes read from input sources, or None when not reported."""
+
+        return self._byte_volume("input_bytes")
 
     @property
-    def run_identifier(self) -> str:
-        for candidate in (self.spark_jobid, self.application_id, self.spark_taskid):
-            if candidate:
-                return candidate
-        return ""
+    def shuffle_read_bytes(self) -> float | None:
+        """Bytes read by shuffles, or None when not reported."""
+
+        return self._byte_volume("shuffle_read_bytes")
+
+    def _byte_volume(self, key: str) -> float | None:
+        if key not in self._byte_volumes:
+            self._byte_volumes[key] = self._sum_byte_volume(key)
+        return self._byte_volumes[key]
+
+    def _sum_byte_volume(self, key: str) -> float | None:
+        # Application totals win; otherwise the stages' values are summed.
+        total = _to_float(self.app_metrics.get(key))
+        if total is not None:
+            return total
+        stages = self.spark_event_metrics.get("stages")
+        if not isinstance(stages, list):
+            return None
+        for stage in stages:
+            if not isinstance(stage, dict):
+                continue
+            value = _to_float(_normalize_metric_keys(stage).get(key))
+            if value is not None:
+                total = (total or 0.0) + value
+        return total
+
+
+_RUN_STATE_COLUMNS = (
+    "run_date",
+    "application_start_time",
+    "application_end_time",
+    "status",
+    "dataproc_jobid",
+    "dataproc_cluster_uuid",
+    "spark_taskid",
+    "spark_jobid",
+    "cluster_config_details",
+    "log_location",
+    "application_id",
+    "spark_event_metrics",
+)
+_RUN_STATE_JSON_COLUMNS = ("cluster_config_details", "spark_event_metrics")
+_RUN_STATE_SCALAR_COLUMNS = tuple(
+    name for name in _RUN_STATE_COLUMNS if name not in _RUN_STATE_JSON_COLUMNS
+)
+
+
+@dataclass(slots=True)
+class RunStateBatch:
+    """Columnar view over run state rows.
+
+    Columns hold the raw BigQuery values (datetimes, JSON text). Conversion to
+    ``SparkRunState`` or payload dicts only happens when a caller iterates.
+
+    Arrow record batches are not kept as Arrow: each column is converted to a
+    Python list as the batch is built, and ``ingest_dataproc_signals`` still
+    turns the batch into one payload dict per run, because tool state has to
+    be JSON. The Storage Read API therefore speeds up the transfer, not the
+    per-row work after it; ``streaming`` is the mode that bounds that work.
+    """
+
+    columns: dict[str, list[Any]]
+    read_mode: str = "rest"
+    stream_count: int = 0
+    row_count: int = field(init=False, default=0)
+
+    def __post_init__(self) -> None:
+        for name in _RUN_STATE_COLUMNS:
+            self.columns.setdefault(name, [])
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("RunStateBatch columns must have equal lengths")
+        self.row_count = lengths.pop() if lengths else 0
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[bigquery.table.Row],
+        *,
+        read_mode: str = "rest",
+    ) -> "RunStateBatch":
+        columns: dict[str, list[Any]] = {name: [] for name in _RUN_STATE_COLUMNS}
+        for row in rows:
+            for name in _RUN_STATE_COLUMNS:
+                columns[name].append(row.get(name))
+        return cls(columns=columns, read_mode=read_mode)
+
+    @classmethod
+    def from_record_batches(
+        cls,
+        record_batches: Iterable[Any],
+        *,
+        stream_count: int = 0,
+        projection: RunStateProjection | None = None,
+    ) -> "RunStateBatch":
+        columns: dict[str, list[Any]] = {name: [] for name in _RUN_STATE_COLUMNS}
+        direct_columns = _RUN_STATE_SCALAR_COLUMNS if projection else _RUN_STATE_COLUMNS
+        for record_batch in record_batches:
+            for name in direct_columns:
+                columns[name].extend(_record_batch_column(record_batch, name))
+            if projection is None:
+                continue
+            projected = {
+                name: _record_batch_column(record_batch, name)
+                for name in projection.columns
+            }
+            for index in range(record_batch.num_rows):
+                cluster_details, metrics = projection.assemble(
+                    {name: values[index] for name, values in projected.items()}
+                )
+                columns["cluster_config_details"].append(cluster_details)
+                columns["spark_event_metrics"].append(metrics)
+        return cls(columns=columns, read_mode="storage", stream_count=stream_count)
+
+    @classmethod
+    def concat(cls, batches: list["RunStateBatch"]) -> "RunStateBatch":
+        columns: dict[str, list[Any]] = {name: [] for name in _RUN_STATE_COLUMNS}
+        for batch in batches:
+            for name in _RUN_STATE_COLUMNS:
+                columns[name].extend(batch.columns[name])
+        read_modes = {batch.read_mode for batch in batches}
+        return cls(
+            columns=columns,
+            read_mode=read_modes.pop() if len(read_modes) == 1 else "mixed",
+            stream_count=max((batch.stream_count for batch in batches), default=0),
+        )
+
+    def column(self, name: str) -> list[Any]:
+        return self.columns[name]
+
+    def distinct(self, name: str) -> set[Any]:
+        return {value for value in self.columns[name] if value}
+
+    def iter_payloads(self) -> Iterator[dict[str, Any]]:
+        """Yield payload dicts equivalent to ``SparkRunState.to_payload``."""
+
+        columns = [self.columns[name] for name in _RUN_STATE_COLUMNS]
+        for values in zip(*columns):
+            (
+                run_date,
+                start,
+                end,
+                status,
+                dataproc_jobid,
+                cluster_uuid,
+                spark_taskid,
+                spark_jobid,
+                cluster_config_details,
+                log_location,
+                application_id,
+                spark_event_metrics,
+            ) = values
+            yield {
+                "run_date": _to_iso(run_date),
+                "application_start_time": _to_iso(start),
+                "application_end_time": _to_iso(end),
+                "status": status,
+                "dataproc_jobid": dataproc_jobid,
+                "dataproc_cluster_uuid": cluster_uuid,
+                "spark_taskid": spark_taskid,
+                "spark_jobid": spark_jobid,
+                "cluster_config_details": _coerce_json(cluster_config_details),
+                "log_location": log_location,
+                "application_id": application_id,
+                "spark_event_metrics": _coerce_json(spark_event_metrics),
+            }
+
+    def iter_run_states(self) -> Iterator[SparkRunState]:
+        """Yield run states that decode their JSON columns lazily."""
+
+        columns = [self.columns[name] for name in _RUN_STATE_COLUMNS]
+        for values in zip(*columns):
+            row = dict(zip(_RUN_STATE_COLUMNS, values))
+            yield SparkRunState.from_row(row)
 
 
 def fetch_run_state_records(
@@ -153,33 +405,329 @@ def fetch_run_state_records(
     *,
     start_time: datetime,
     end_time: datetime,
+    completed_after: datetime | None = None,
+) -> list[SparkRunState]:
+    """Fetch Spark application run records within the supplied window.
+
+    ``completed_after`` additionally restricts the result to runs that are
+    still in flight or finished at/after that moment (incremental ingestion).
+    Windows longer than ``run_state_shard_hours`` are split into time shards
+    queried concurrently without a global ORDER BY and merged newest-first.
+    With ``run_state_cache`` enabled, results are served from the local result
+    cache while the source table is unchanged.
+    """
+
+    client = bigquery.Client(project=config.project_id)
+    projection = _resolve_projection(config)
+    cache_key = _result_cache_key(config, projection, start_time, end_time, completed_after)
+    cache = open_result_cache(config)
+    if cache is not None:
+        table_state = describe_source_table(client, config.fully_qualified_run_state_table)
+        cached = cache.lookup(**cache_key, table_state=table_state)
+        if cached is not None:
+            records = list(RunStateBatch(columns=cached, read_mode="cache").iter_run_states())
+            records.sort(key=_recency_sort_key)
+            return records
+
+    records = _query_run_state_records(
+        client,
+        config,
+        projection=projection,
+        start_time=start_time,
+        end_time=end_time,
+        completed_after=completed_after,
+    )
+    if cache is not None:
+        cache.store(**cache_key, table_state=table_state, columns=_run_state_columns(records))
+    return records
+
+
+def _query_run_state_records(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    *,
+    projection: RunStateProjection | None,
+    start_time: datetime,
+    end_time: datetime,
+    completed_after: datetime | None,
 ) -> list[SparkRunState]:
-    """Fetch Spark application run records within the supplied window."""
+    slices = _plan_window_slices(config, start_time, end_time)
+
+    def fetch_slice(window_slice: _WindowSlice) -> list[SparkRunState]:
+        _, rows = _run_run_state_query(
+            client,
+            config,
+            window_slice=window_slice,
+            completed_after=completed_after,
+            projection=projection,
+            ordered=len(slices) == 1,
+        )
+        return [SparkRunState.from_row(row) for row in _assemble_rows(rows, projection)]
+
+    if len(slices) == 1:
+        return fetch_slice(slices[0])
+
+    merged: list[SparkRunState] = []
+    # Slices are planned newest-first with the NULL start-time slice last, so
+    # sorting each shard locally yields the global DESC NULLS LAST order.
+    for shard in _fetch_concurrently(config, slices, fetch_slice):
+        shard.sort(key=_recency_sort_key)
+        merged.extend(shard)
+    return merged
+
+
+def iter_run_state_records(
+    config: MonitoringConfig,
+    *,
+    start_time: datetime,
+    end_time: datetime,
+    completed_after: datetime | None = None,
+    page_size: int | None = None,
+) -> Iterator[SparkRunState]:
+    """Yield the window's run states oldest-first, one result page at a time.
+
+    Used by the streaming pipeline: only the current page of ``page_size``
+    rows is held, so the window is neither sharded nor cached. Rows come
+    oldest-first by start time only (end time or run date when unset); ties
+    are left in any order for ``iter_deduplicated_run_states`` to sort.
+    """
+
+    client = bigquery.Client(project=config.project_id)
+    projection = _resolve_projection(config)
+    _, rows = _run_run_state_query(
+        client,
+        config,
+        window_slice=_WindowSlice(start_time, end_time),
+        completed_after=completed_after,
+        projection=projection,
+        ordered=True,
+        ascending=True,
+        page_size=page_size,
+    )
+    for row in _assemble_rows(rows, projection):
+        yield SparkRunState.from_row(row)
+
+
+def check_read_mode(read_mode: str) -> None:
+    """Raise for a ``run_state_read_mode`` other than ``rest`` or ``storage``."""
+
+    if read_mode not in RUN_STATE_READ_MODES:
+        raise ValueError(
+            f"Unknown run state read mode '{read_mode}'; "
+            f"expected one of {', '.join(RUN_STATE_READ_MODES)}"
+        )
+
+
+def fetch_run_state_batch(
+    config: MonitoringConfig,
+    *,
+    start_time: datetime,
+    end_time: datetime,
+    completed_after: datetime | None = None,
+) -> RunStateBatch:
+    """Fetch the run state window as a columnar batch.
+
+    With ``run_state_read_mode == "storage"`` the query result is streamed
+    through the BigQuery Storage Read API as Arrow record batches over up to
+    ``run_state_read_streams`` parallel streams. The ORDER BY is dropped in that
+    mode because an ordered result pins the read session to a single stream;
+    callers sort the run states themselves. When pyarrow or
+    google-cloud-bigquery-storage are unavailable, or the read session cannot
+    be created, the rows are paged through the REST API instead. Time shards
+    are fetched concurrently and concatenated like in
+    :func:`fetch_run_state_records`, including its result cache.
+    """
 
+    check_read_mode(config.run_state_read_mode)
     client = bigquery.Client(project=config.project_id)
+    projection = _resolve_projection(config)
+    cache_key = _result_cache_key(config, projection, start_time, end_time, completed_after)
+    cache = open_result_cache(config)
+    if cache is not None:
+        table_state = describe_source_table(client, config.fully_qualified_run_state_table)
+        cached = cache.lookup(**cache_key, table_state=table_state)
+        if cached is not None:
+            return RunStateBatch(columns=cached, read_mode="cache")
+
+    slices = _plan_window_slices(config, start_time, end_time)
+
+    def fetch_slice(window_slice: _WindowSlice) -> RunStateBatch:
+        return _fetch_batch_slice(
+            client,
+            config,
+            window_slice=window_slice,
+            completed_after=completed_after,
+            projection=projection,
+        )
+
+    if len(slices) == 1:
+        batch = fetch_slice(slices[0])
+    else:
+        batch = RunStateBatch.concat(_fetch_concurrently(config, slices, fetch_slice))
+    if cache is not None:
+        cache.store(**cache_key, table_state=table_state, columns=batch.columns)
+    return batch
+
+
+@dataclass(frozen=True, slots=True)
+class _WindowSlice:
+    """Part of the fetch window covered by a single query."""
+
+    start: datetime
+    end: datetime
+    dated: bool = True
+    undated: bool = True
+    end_inclusive: bool = True
+
+    def predicate(self) -> str:
+        clauses: list[str] = []
+        if self.dated:
+            upper = "<=" if self.end_inclusive else "<"
+            clauses.append(
+                "(application_start_time >= @window_start "
+                f"AND application_start_time {upper} @window_end)"
+            )
+        if self.undated:
+            clauses.append(
+                "(application_start_time IS NULL "
+                "AND run_date BETWEEN DATE(@window_start) AND DATE(@window_end))"
+            )
+        return "\n          OR ".join(clauses)
+
+
+def _plan_window_slices(
+    config: MonitoringConfig,
+    start_time: datetime,
+    end_time: datetime,
+) -> list[_WindowSlice]:
+    """Split the window into newest-first time shards plus one NULL-start slice."""
+
+    shard_width = timedelta(hours=config.run_state_shard_hours)
+    if config.run_state_shard_hours <= 0 or end_time - start_time <= shard_width:
+        return [_WindowSlice(start_time, end_time)]
+
+    slices: list[_WindowSlice] = []
+    shard_end = end_time
+    while shard_end > start_time:
+        shard_start = max(start_time, shard_end - shard_width)
+        slices.append(
+            _WindowSlice(
+                shard_start,
+                shard_end,
+                undated=False,
+                end_inclusive=shard_end == end_time,
+            )
+        )
+        shard_end = shard_start
+    # Rows without a start time are matched on run_date, which does not align
+    # with hourly shards; fetch them once over the whole window.
+    slices.append(_WindowSlice(start_time, end_time, dated=False))
+    return slices
+
+
+_T = TypeVar("_T")
+
+
+def _fetch_concurrently(
+    config: MonitoringConfig,
+    slices: list[_WindowSlice],
+    fetch_slice: Callable[[_WindowSlice], _T],
+) -> list[_T]:
+    workers = max(1, min(config.run_state_fetch_workers, len(slices)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="run-state-shard") as pool:
+        return list(pool.map(fetch_slice, slices))
+
 
+def _recency_sort_key(run_state: SparkRunState) -> tuple[bool, float, bool, float]:
+    return (
+        run_state.start_epoch is None,
+        -(run_state.start_epoch or 0.0),
+        run_state.end_epoch is None,
+        -(run_state.end_epoch or 0.0),
+    )
+
+
+def _fetch_batch_slice(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    *,
+    window_slice: _WindowSlice,
+    completed_after: datetime | None,
+    projection: RunStateProjection | None,
+) -> RunStateBatch:
+    use_storage = config.run_state_read_mode == "storage"
+    query_job, rows = _run_run_state_query(
+        client,
+        config,
+        window_slice=window_slice,
+        completed_after=completed_after,
+        projection=projection,
+        ordered=not use_storage,
+    )
+
+    if use_storage:
+        read_client = _create_read_client()
+        if read_client is not None:
+            stream_count = max(config.run_state_read_streams, 1)
+            try:
+                return RunStateBatch.from_record_batches(
+                    rows.to_arrow_iterable(
+                        bqstorage_client=read_client,
+                        max_stream_count=stream_count,
+                    ),
+                    stream_count=stream_count,
+                    projection=projection,
+                )
+            except (exceptions.GoogleAPICallError, ValueError) as exc:
+                # Fall back to REST paging, e.g. when the caller lacks
+                # bigquery.readsessions.create on the result table. A fresh
+                # iterator is required because the failed one may be consumed.
+                logging.warning(
+                    "Storage Read API fetch failed, paging run state through REST: %s", exc
+                )
+                rows = query_job.result()
+
+    return RunStateBatch.from_rows(_assemble_rows(rows, projection))
+
+
+def _run_run_state_query(
+    client: bigquery.Client,
+    config: MonitoringConfig,
+    *,
+    window_slice: _WindowSlice,
+    completed_after: datetime | None,
+    projection: RunStateProjection | None,
+    ordered: bool,
+    ascending: bool = False,
+    page_size: int | None = None,
+) -> tuple[bigquery.QueryJob, bigquery.table.RowIterator]:
+    select_list = list(_RUN_STATE_COLUMNS)
+    if projection is not None:
+        select_list = [*_RUN_STATE_SCALAR_COLUMNS, *projection.select_expressions()]
+    select_sql = ",\n          ".join(select_list)
     query = f"""
         SELECT
-          run_date,
-          application_start_time,
-          application_end_time,
-          status,
-          dataproc_jobid,
-          dataproc_cluster_uuid,
-          spark_taskid,
-          spark_jobid,
-          cluster_config_details,
-          log_location,
-          application_id,
-          spark_event_metrics
+          {select_sql}
         FROM `{config.fully_qualified_run_state_table}`
         WHERE (
-            application_start_time BETWEEN @window_start AND @window_end
+          {window_slice.predicate()}
         )
-        OR (
-            application_start_time IS NULL
-            AND run_date BETWEEN DATE(@window_start) AND DATE(@window_end)
+    """
+    if completed_after is not None:
+        query += """
+        AND (
+          application_end_time IS NULL
+          OR application_end_time >= @completed_after
         )
+    """
+    if ordered and ascending:
+        # Streaming consumers only group rows on this leading moment and sort
+        # each group themselves, so no tie-breaking terms are needed.
+        query += """
+        ORDER BY COALESCE(application_start_time, application_end_time, TIMESTAMP(run_date)) ASC NULLS FIRST
+    """
+    elif ordered:
+        query += """
         ORDER BY application_start_time DESC NULLS LAST,
                  application_end_time DESC NULLS LAST
     """
@@ -188,21 +736,30 @@ def fetch_run_state_records(
         bigquery.ScalarQueryParameter(
             "window_start",
             "TIMESTAMP",
-            _to_query_timestamp(start_time),
+            _to_query_timestamp(window_slice.start),
         ),
         bigquery.ScalarQueryParameter(
             "window_end",
             "TIMESTAMP",
-            _to_query_timestamp(end_time),
+            _to_query_timestamp(window_slice.end),
         ),
     ]
+    if completed_after is not None:
+        params.append(
+            bigquery.ScalarQueryParameter(
+                "completed_after",
+                "TIMESTAMP",
+                _to_query_timestamp(completed_after),
+            )
+        )
 
     job_config = bigquery.QueryJobConfig(query_parameters=params)
     if config.bq_location:
         job_config.location = config.bq_location
 
     try:
-        rows = client.query(query, job_config=job_config).result()
+        query_job = client.query(query, job_config=job_config)
+        return query_job, query_job.result(page_size=page_size)
     except exceptions.GoogleAPICallError as exc:
         raise RuntimeError(
             "Failed to query Spark run state table: {table}: {exc}".format(
@@ -211,7 +768,100 @@ def fetch_run_state_records(
             )
         ) from exc
 
-    return [SparkRunState.from_row(row) for row in rows]
+
+def _resolve_projection(config: MonitoringConfig) -> RunStateProjection | None:
+    return SPARK_METRIC_PROJECTION if config.project_spark_metrics else None
+
+
+def _result_cache_key(
+    config: MonitoringConfig,
+    projection: RunStateProjection | None,
+    start_time: datetime,
+    end_time: datetime,
+    completed_after: datetime | None,
+) -> dict[str, Any]:
+    variant = "full"
+    if projection is not None:
+        variant = "projected:" + hashlib.sha1(
+            "\n".join(projection.select_expressions()).encode("utf-8")
+        ).hexdigest()[:16]
+    return {
+        "table": config.fully_qualified_run_state_table,
+        "variant": variant,
+        "start_time": start_time,
+        "end_time": end_time,
+        "completed_after": completed_after,
+    }
+
+
+def _run_state_columns(records: list[SparkRunState]) -> dict[str, list[Any]]:
+    """Columns of freshly fetched records, keeping the JSON in source form."""
+
+    columns: dict[str, list[Any]] = {name: [] for name in _RUN_STATE_COLUMNS}
+    for record in records:
+        for name in _RUN_STATE_SCALAR_COLUMNS:
+            columns[name].append(getattr(record, name))
+        columns["cluster_config_details"].append(
+            record.cluster_config_json
+            if record.cluster_config_json is not None
+            else record.cluster_config_details
+        )
+        columns["spark_event_metrics"].append(
+            record.spark_event_metrics_json
+            if record.spark_event_metrics_json is not None
+            else record.spark_event_metrics
+        )
+    return columns
+
+
+def _assemble_rows(
+    rows: Iterable[Any],
+    projection: RunStateProjection | None,
+) -> Iterable[Any]:
+    """Rebuild the JSON columns of projected rows; pass other rows through."""
+
+    if projection is None:
+        return rows
+    return (_assemble_row(row, projection) for row in rows)
+
+
+def _assemble_row(row: Any, projection: RunStateProjection) -> dict[str, Any]:
+    assembled = {name: row.get(name) for name in _RUN_STATE_SCALAR_COLUMNS}
+    cluster_details, metrics = projection.assemble(
+        {name: row.get(name) for name in projection.columns}
+    )
+    assembled["cluster_config_details"] = cluster_details
+    assembled["spark_event_metrics"] = metrics
+    return assembled
+
+
+def _record_batch_column(record_batch: Any, name: str) -> list[Any]:
+    index = record_batch.schema.get_field_index(name)
+    if index < 0:
+        return [None] * record_batch.num_rows
+    return record_batch.column(index).to_pylist()
+
+
+_warned_missing_read_client = False
+
+
+def _create_read_client() -> Any | None:
+    """Return a Storage Read API client, or None when the extras are missing."""
+
+    global _warned_missing_read_client
+    try:
+        import pyarrow  # noqa: F401
+        from google.cloud import bigquery_storage
+    except ImportError as exc:
+        if not _warned_missing_read_client:
+            _warned_missing_read_client = True
+            logging.warning(
+                "DATAPROC_RUN_STATE_READ_MODE=storage needs pyarrow and "
+                "google-cloud-bigquery-storage (%s); paging run state through REST",
+                exc,
+            )
+        return None
+    return bigquery_storage.BigQueryReadClient()
 
 
 def _coerce_json(value: Any) -> dict[str, Any]:
@@ -239,6 +889,15 @@ def _ensure_dict(value: Any) -> dict[str, Any]:
     return {"value": value}
 
 
+def _to_float(value: Any) -> float | None:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def _to_iso(value: Any) -> str | None:
     if value is None:
         return None
@@ -252,6 +911,42 @@ def _to_iso(value: Any) -> str | None:
         return None
 
 
+def _parse_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if not moment.tzinfo:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def _intern(value: str | None) -> str | None:
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+_CAMEL_BOUNDARY_PATTERN = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _normalize_metric_keys(metrics: dict[str, Any]) -> dict[str, Any]:
+    """Map camelCase metric keys to snake_case; snake_case spellings win."""
+
+    normalized: dict[str, Any] = {}
+    for key, value in metrics.items():
+        if not isinstance(key, str) or key.islower():
+            normalized[key] = value
+            continue
+        snake_key = _CAMEL_BOUNDARY_PATTERN.sub("_", key).lower()
+        if snake_key != key and snake_key in metrics:
+            continue
+        normalized[snake_key] = value
+    return normalized
+
+
 def _to_query_timestamp(moment: datetime) -> str:
     if not moment.tzinfo:
         moment = moment.replace(tzinfo=timezone.utc)
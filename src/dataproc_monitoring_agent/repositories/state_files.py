@@ -0,0 +1,29 @@
+"""Atomic writes of files kept under the agent's state directory."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Callable
+
+
+def replace_atomically(path: Path, write: Callable[[Path], Any]) -> None:
+    """Write ``path`` through ``write`` on a temp file, then swap it in.
+
+    Agents may share the state directory, so every writer gets its own temp
+    file next to the target; readers see the old or the new file, never a
+    torn one. The temp file is removed if writing or the swap fails.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    ) as handle:
+        temp_path = Path(handle.name)
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
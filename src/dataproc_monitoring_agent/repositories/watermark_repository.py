@@ -0,0 +1,212 @@
+"""Local persistence of the incremental ingestion high-watermark."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import json
+from pathlib import Path
+import re
+from typing import Any, Iterable
+
+from ..config.settings import MonitoringConfig
+from .run_state_repository import SparkRunState
+from .state_files import replace_atomically
+
+
+@dataclass(slots=True)
+class RunStateWatermark:
+    """High-watermark over ``cag_run_state`` completion times.
+
+    ``boundary_runs`` maps the finished runs observed inside the overlap
+    window behind ``high_watermark`` to their completion time, so rows that are
+    re-read because of the overlap are recognised as already ingested. Runs
+    still in flight are never recorded: their completed snapshot must be
+    ingested when it arrives.
+    """
+
+    table: str
+    high_watermark: str
+    boundary_runs: dict[str, str] = field(default_factory=dict)
+    updated_at: str | None = None
+
+    @property
+    def high_watermark_time(self) -> datetime:
+        moment = _parse_timestamp(self.high_watermark)
+        if moment is None:  # pragma: no cover - validated on load
+            raise ValueError(f"Invalid watermark timestamp: {self.high_watermark}")
+        return moment
+
+    def fetch_after(self, overlap: timedelta) -> datetime:
+        """Completion time from which the next fetch should start."""
+
+        return self.high_watermark_time - overlap
+
+    def is_boundary_run(self, run_state: SparkRunState) -> bool:
+        """Whether this exact finished snapshot was ingested before.
+
+        The recorded completion time must match too, so a run recorded by an
+        earlier snapshot is not mistaken for a later one of the same run.
+        """
+
+        if not run_state.run_identifier or not run_state.is_terminal:
+            return False
+        recorded = _parse_timestamp(self.boundary_runs.get(run_state.run_identifier))
+        return recorded is not None and recorded == _observed_moment(run_state)
+
+    @classmethod
+    def from_payload(cls, payload: dict[str, Any]) -> "RunStateWatermark":
+        return cls(
+            table=str(payload["table"]),
+            high_watermark=str(payload["high_watermark"]),
+            boundary_runs=dict(payload.get("boundary_runs") or {}),
+            updated_at=payload.get("updated_at"),
+        )
+
+    def to_payload(self) -> dict[str, Any]:
+        return {
+            "table": self.table,
+            "high_watermark": self.high_watermark,
+            "boundary_runs": dict(self.boundary_runs),
+            "updated_at": self.updated_at,
+        }
+
+
+def load_watermark(config: MonitoringConfig) -> RunStateWatermark | None:
+    """Return the persisted watermark for the run state table, if any."""
+
+    path = _watermark_path(config)
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        watermark = RunStateWatermark.from_payload(payload)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        # A corrupt watermark only costs one full-window scan.
+        return None
+    if watermark.table != config.fully_qualified_run_state_table:
+        return None
+    if _parse_timestamp(watermark.high_watermark) is None:
+        return None
+    return watermark
+
+
+def save_watermark(config: MonitoringConfig, watermark: RunStateWatermark) -> None:
+    """Atomically persist the watermark under the configured state directory."""
+
+    payload = json.dumps(watermark.to_payload(), sort_keys=True)
+    replace_atomically(
+        _watermark_path(config),
+        lambda temp_path: temp_path.write_text(payload, encoding="utf-8"),
+    )
+
+
+def advance_watermark(
+    config: MonitoringConfig,
+    previous: RunStateWatermark | None,
+    run_states: Iterable[SparkRunState],
+    *,
+    as_of: datetime,
+) -> RunStateWatermark | None:
+    """Fold freshly ingested runs into a new watermark.
+
+    Runs without a completion time fall back to their start time or
+    ``run_date`` but, being unfinished, are not recorded as boundary runs.
+    Boundary identifiers older than the overlap window behind the
+    new high-watermark are dropped to keep the state small.
+    """
+
+    tracker = WatermarkTracker(config, previous)
+    for run_state in run_states:
+        tracker.observe(run_state)
+    return tracker.result(as_of=as_of)
+
+
+class WatermarkTracker:
+    """Incremental form of :func:`advance_watermark` for streamed runs.
+
+    Identifiers that fall behind the overlap window of the running
+    high-watermark can never become boundary runs again, so they are pruned
+    whenever the tracked set has doubled since the last pruning.
+    """
+
+    __slots__ = ("_config", "_previous", "_observed", "_high_watermark", "_prune_at")
+
+    def __init__(self, config: MonitoringConfig, previous: RunStateWatermark | None) -> None:
+        self._config = config
+        self._previous = previous
+        self._observed: dict[str, datetime] = {}
+        if previous is not None:
+            for run_id, moment_text in previous.boundary_runs.items():
+                moment = _parse_timestamp(moment_text)
+                if moment is not None:
+                    self._observed[run_id] = moment
+        self._high_watermark = previous.high_watermark_time if previous is not None else None
+        self._prune_at = max(2 * len(self._observed), _MIN_PRUNE_SIZE)
+
+    def observe(self, run_state: SparkRunState) -> None:
+        moment = _observed_moment(run_state)
+        if moment is None:
+            return
+        if self._high_watermark is None or moment > self._high_watermark:
+            self._high_watermark = moment
+        if run_state.run_identifier and run_state.is_terminal:
+            current = self._observed.get(run_state.run_identifier)
+            if current is None or moment > current:
+                self._observed[run_state.run_identifier] = moment
+                if len(self._observed) >= self._prune_at:
+                    self._prune()
+
+    def result(self, *, as_of: datetime) -> RunStateWatermark | None:
+        if self._high_watermark is None:
+            return self._previous
+
+        cutoff = self._high_watermark - self._config.incremental_overlap
+        return RunStateWatermark(
+            table=self._config.fully_qualified_run_state_table,
+            high_watermark=self._high_watermark.isoformat(),
+            boundary_runs={
+                run_id: moment.isoformat()
+                for run_id, moment in sorted(self._observed.items())
+                if moment >= cutoff
+            },
+            updated_at=as_of.isoformat(),
+        )
+
+    def _prune(self) -> None:
+        cutoff = self._high_watermark - self._config.incremental_overlap
+        self._observed = {
+            run_id: moment for run_id, moment in self._observed.items() if moment >= cutoff
+        }
+        self._prune_at = max(2 * len(self._observed), _MIN_PRUNE_SIZE)
+
+
+_MIN_PRUNE_SIZE = 4096
+
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _watermark_path(config: MonitoringConfig) -> Path:
+    name = _UNSAFE_FILENAME_CHARS.sub("_", config.fully_qualified_run_state_table)
+    return config.state_path / "watermarks" / f"{name}.json"
+
+
+def _observed_moment(run_state: SparkRunState) -> datetime | None:
+    return _parse_timestamp(
+        run_state.application_end_time
+        or run_state.application_start_time
+        or run_state.run_date
+    )
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if not moment.tzinfo:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
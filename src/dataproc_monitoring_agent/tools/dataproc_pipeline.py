@@ -2,27 +2,66 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-import math
-import copy
-from collections import defaultdict
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import islice
+import logging
+import multiprocessing
+import pickle
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from google.adk.tools.tool_context import ToolContext
 
-from ..analytics.anomaly_detection import synthesize_anomaly_flags
-from ..analytics.performance_memory import load_baselines, BaselineStats
+from ..analytics.baseline_cache import BaselineCache, open_baseline_cache
+from ..analytics.baseline_rollup import (
+    BaselineRollupBuilder,
+    merge_baseline_rollups,
+    rollup_run_key,
+)
+from ..analytics.batch_anomaly_detection import AnomalyInput, synthesize_anomaly_flags_batch
+from ..analytics.cluster_registry import ClusterConfigEntry, ClusterConfigRegistry
+from ..analytics.horizons import horizon_label, parse_horizons, slice_by_horizon, within_horizon
+from ..analytics.local_baseline import LocalBaselineAccumulator, per_gb_rates
+from ..analytics.run_deduplication import (
+    DeduplicationCounts,
+    deduplicate_run_states,
+    iter_deduplicated_run_states,
+)
+from ..analytics.performance_memory import BaselineLoader, load_baselines, segment_values
 from ..config.settings import MonitoringConfig, load_config
-from ..reporting.report_builder import build_status_report
+from ..reporting.report_builder import (
+    FactSummary,
+    render_horizon_report,
+)
 from ..repositories.bigquery_repository import (
+    ClusterConfigRecord,
     DataprocFact,
+    FactLoadReport,
+    MetadataOverlay,
     ensure_performance_table,
+    insert_cluster_configs,
     insert_daily_facts,
     utc_now,
 )
+from ..repositories.processed_run_repository import (
+    load_processed_run_index,
+    processed_run_retention,
+)
 from ..repositories.run_state_repository import (
     SparkRunState,
+    check_read_mode,
+    fetch_run_state_batch,
     fetch_run_state_records,
+    iter_run_state_records,
+)
+from ..repositories.watermark_repository import (
+    RunStateWatermark,
+    WatermarkTracker,
+    advance_watermark,
+    load_watermark,
+    save_watermark,
 )
 
 
@@ -31,55 +70,157 @@ def ingest_dataproc_signals(
     project_id: Optional[str] = None,
     region: Optional[str] = None,
     lookback_hours: Optional[int] = None,
+    horizons: Optional[List[str]] = None,
     tool_context: Optional[ToolContext] = None,
 ) -> dict[str, Any]:
-    """Collect Spark run state snapshots sourced from BigQuery."""
-
+    """Collect Spark run state snapshots sourced from BigQuery.
+
+    ``horizons`` (e.g. ``["1h", "24h", "7d"]``) requests several views from one
+    scan: the widest horizon (or the lookback, if wider) is fetched once and
+    later steps slice the runs per horizon in memory.
+
+    With ``streaming`` enabled only the window is recorded here; the runs are
+    streamed by ``build_performance_memory``, which reports the counts.
+    """
+
+    horizon_hours = parse_horizons(horizons or [])
+    if horizon_hours:
+        configured = _resolve_config(
+            project_id=project_id,
+            region=region,
+            lookback_hours=lookback_hours,
+        ).lookback_hours
+        lookback_hours = max(configured, horizon_hours[-1])
     config = _resolve_config(
         project_id=project_id,
         region=region,
         lookback_hours=lookback_hours,
     )
+    check_read_mode(config.run_state_read_mode)
     end_time = utc_now()
     start_time = end_time - config.lookback
 
-    run_states = fetch_run_state_records(
-        config,
-        start_time=start_time,
-        end_time=end_time,
+    watermark = load_watermark(config) if config.incremental else None
+    completed_after = (
+        watermark.fetch_after(config.incremental_overlap) if watermark else None
     )
 
+    if config.streaming:
+        ingestion_payload = {
+            "window": {
+                "start": start_time.isoformat(),
+                "end": end_time.isoformat(),
+            },
+            "runs": [],
+            "watermark": None,
+            "horizons": list(horizon_hours),
+            "streaming": {
+                "completed_after": completed_after.isoformat() if completed_after else None,
+                "previous_watermark": watermark.to_payload() if watermark else None,
+            },
+        }
+        if tool_context is not None:
+            tool_context.state["dataproc_ingestion"] = ingestion_payload
+        return {
+            "window": ingestion_payload["window"],
+            "run_count": None,
+            "distinct_clusters": None,
+            "read_mode": "streaming",
+            "message": (
+                "Streaming mode: runs in this window are paged from BigQuery while "
+                "build_performance_memory builds and loads their facts."
+            ),
+        }
+
+    if config.run_state_read_mode == "storage":
+        batch = fetch_run_state_batch(
+            config,
+            start_time=start_time,
+            end_time=end_time,
+            completed_after=completed_after,
+        )
+        # Tool state must be JSON, so the columnar batch ends here as one
+        # payload per run (see RunStateBatch).
+        run_payloads = list(batch.iter_payloads())
+        read_mode = batch.read_mode
+    else:
+        run_states = fetch_run_state_records(
+            config,
+            start_time=start_time,
+            end_time=end_time,
+            completed_after=completed_after,
+        )
+        run_payloads = [run.to_payload() for run in run_states]
+        read_mode = "rest"
+
+    pending_watermark: RunStateWatermark | None = None
+    skipped_boundary_runs = 0
+    if config.incremental:
+        run_payloads, pending_watermark, skipped_boundary_runs = _apply_watermark(
+            config,
+            watermark,
+            run_payloads,
+            as_of=end_time,
+        )
+
+    distinct_clusters = {
+        (payload.get("dataproc_jobid") or "").strip()
+        for payload in run_payloads
+    }
+    distinct_clusters.discard("")
+
     ingestion_payload = {
         "window": {
             "start": start_time.isoformat(),
             "end": end_time.isoformat(),
         },
-        "runs": [run.to_payload() for run in run_states],
+        "runs": run_payloads,
+        "watermark": pending_watermark.to_payload() if pending_watermark else None,
+        "horizons": list(horizon_hours),
     }
 
     if tool_context is not None:
         tool_context.state["dataproc_ingestion"] = ingestion_payload
 
-    distinct_clusters = {
-        run.cluster_name
-        for run in run_states
-        if run.cluster_name
-    }
-
-    return {
+    result = {
         "window": ingestion_payload["window"],
-        "run_count": len(run_states),
+        "run_count": len(run_payloads),
         "distinct_clusters": len(distinct_clusters),
+        "read_mode": read_mode,
     }
+    if horizon_hours:
+        result["horizons"] = {
+            label: len(positions)
+            for label, positions in slice_by_horizon(
+                (SparkRunState.from_payload(payload) for payload in run_payloads),
+                window_end=end_time,
+                horizons=horizon_hours,
+            ).items()
+        }
+    if config.incremental:
+        result["incremental"] = {
+            "completed_after": completed_after.isoformat() if completed_after else None,
+            "skipped_boundary_runs": skipped_boundary_runs,
+            "pending_high_watermark": (
+                pending_watermark.high_watermark if pending_watermark else None
+            ),
+        }
+    return result
 
 
 def build_performance_memory(
     *,
     project_id: Optional[str] = None,
     region: Optional[str] = None,
+    reprocess: Optional[bool] = None,
     tool_context: Optional[ToolContext] = None,
 ) -> dict[str, Any]:
-    """Persist Spark job observations into BigQuery with anomaly flags."""
+    """Persist Spark job observations into BigQuery with anomaly flags.
+
+    When ``skip_processed_runs`` is enabled, runs already recorded in the
+    processed-run index are skipped; pass ``reprocess=True`` to rebuild and
+    re-append them anyway (e.g. for backfills).
+    """
 
     config = _resolve_config(project_id=project_id, region=region)
     ingestion_payload = None
@@ -97,6 +238,14 @@ def build_performance_memory(
             "message": message,
         }
 
+    if ingestion_payload.get("streaming"):
+        return _build_performance_memory_streaming(
+            config,
+            ingestion_payload,
+            reprocess=bool(reprocess),
+            tool_context=tool_context,
+        )
+
     run_payloads = ingestion_payload.get("runs", [])
     if not run_payloads:
         message = (
@@ -110,71 +259,277 @@ def build_performance_memory(
             "message": message,
         }
 
-    run_states = [SparkRunState.from_payload(payload) for payload in run_payloads]
+    deduplication = deduplicate_run_states(
+        (SparkRunState.from_payload(payload) for payload in run_payloads),
+        policy=config.dedup_policy,
+    )
+    run_states = deduplication.run_states
     run_states.sort(key=_run_state_sort_key)
 
+    now = utc_now()
+    processed_index = None
+    skipped_runs = 0
+    if config.skip_processed_runs:
+        processed_index = load_processed_run_index(config, as_of=now)
+        if not reprocess:
+            pending = [run_state for run_state in run_states if run_state not in processed_index]
+            skipped_runs = len(run_states) - len(pending)
+            run_states = pending
+
+    if not run_states:
+        _commit_watermark(config, ingestion_payload)
+        return {
+            "persisted_rows": 0,
+            "dry_run": config.dry_run,
+            "has_anomalies": False,
+            "skipped_processed_runs": skipped_runs,
+            "message": "Every ingested run was already persisted by an earlier cycle.",
+        }
+
     ensure_performance_table(config)
 
-    now = utc_now()
-    baselines = load_baselines(
+    job_families = {run_state.primary_job_id for run_state in run_states}
+    baseline_cache = open_baseline_cache(config, load=load_baselines)
+    baselines = (baseline_cache.load_baselines if baseline_cache else load_baselines)(
         config,
         as_of=now,
         trailing_window=config.baseline_window,
+        job_families=job_families,
     )
 
-    local_history: dict[str, List[dict[str, Any]]] = defaultdict(list)
-    local_baseline_families: set[str] = set()
+    # Configs are registered in run order before any fact is built; each run
+    # keeps a snapshot of its entry as it stood when the run was registered.
+    cluster_registry = ClusterConfigRegistry()
+    runs = [
+        (run_state, replace(cluster_registry.register(run_state)))
+        for run_state in run_states
+    ]
+    facts = _build_facts(config, as_of=now, runs=runs, baselines=baselines)
+    has_anomaly = any(fact.anomaly_flags.get("has_issues") for fact in facts)
+    rollups = BaselineRollupBuilder(now.date().isoformat()) if config.baseline_rollups else None
+    if rollups is not None:
+        for fact in facts:
+            _add_to_rollups(rollups, fact)
+
+    fact_load = FactLoadReport()
+    insert_daily_facts(config, records=facts, report=fact_load)
+    if rollups is not None:
+        merge_baseline_rollups(config, rollups, as_of=now)
+    _refresh_baseline_cache(config, baseline_cache, job_families, as_of=now)
+    _persist_cluster_configs(config, cluster_registry, as_of=now)
+    if processed_index is not None and not config.dry_run:
+        processed_index.add(run_states, as_of=now)
+        processed_index.save(as_of=now, retention=processed_run_retention(config))
+    _commit_watermark(config, ingestion_payload)
 
-    facts: list[DataprocFact] = []
-    has_anomaly = False
-    for run_state in run_states:
-        job_family = run_state.job_family or run_state.primary_job_id
-        job_key = job_family or run_state.primary_job_id
-        history_key = job_family or job_key
+    serialized = [fact.to_json() for fact in facts]
+    fact_horizons = None
+    if ingestion_payload.get("horizons"):
+        fact_horizons = slice_by_horizon(
+            run_states,
+            window_end=datetime.fromisoformat(ingestion_payload["window"]["end"]),
+            horizons=ingestion_payload["horizons"],
+        )
+    if tool_context is not None:
+        tool_context.state["dataproc_facts"] = serialized
+        tool_context.state["dataproc_fact_horizons"] = fact_horizons
+        # The report is rendered from summaries folded from the facts in hand,
+        # rather than by decoding ``dataproc_facts`` back into facts.
+        tool_context.state["dataproc_fact_summary"] = (
+            _summary_payload(facts, fact_horizons) if facts else None
+        )
 
-        if job_key:
-            prior_samples = local_history[history_key]
-            if baselines.get(job_key) is None and prior_samples:
-                baselines[job_key] = _build_local_baseline(
-                    history_key,
-                    run_state.cluster_name or "unknown",
-                    prior_samples,
-                )
-                local_baseline_families.add(job_key)
+    result = {
+        "persisted_rows": len(serialized),
+        "dry_run": config.dry_run,
+        "has_anomalies": has_anomaly,
+        "distinct_cluster_configs": len(cluster_registry),
+        "deduplicated_rows": deduplication.collapsed_rows,
+        "duplicated_runs": deduplication.duplicated_runs,
+        "skipped_processed_runs": skipped_runs,
+    }
+    if fact_load.chunks:
+        result["fact_load"] = fact_load.to_payload()
+    if baseline_cache is not None:
+        result["baseline_cache"] = baseline_cache.stats.to_payload()
+    if fact_horizons:
+        result["horizons"] = {
+            label: {
+                "facts": len(positions),
+                "anomalies": sum(
+                    1
+                    for position in positions
+                    if facts[position].anomaly_flags.get("has_issues")
+                ),
+            }
+            for label, positions in fact_horizons.items()
+        }
+    return result
 
-        fact, fact_has_issue = _build_fact(
-            config=config,
-            as_of=now,
-            run_state=run_state,
-            baselines=baselines,
-        )
-        if fact_has_issue:
-            has_anomaly = True
-        facts.append(fact)
 
-        if job_key:
-            sample = _build_local_sample(fact, run_state)
-            if sample:
-                local_history[history_key].append(sample)
-                if baselines.get(job_key) is None or job_key in local_baseline_families:
-                    baselines[job_key] = _build_local_baseline(
-                        history_key,
-                        fact.cluster_name,
-                        local_history[history_key],
-                    )
-                    local_baseline_families.add(job_key)
+def _build_performance_memory_streaming(
+    config: MonitoringConfig,
+    ingestion_payload: dict[str, Any],
+    *,
+    reprocess: bool,
+    tool_context: Optional[ToolContext],
+) -> dict[str, Any]:
+    """``build_performance_memory`` over a run stream with bounded memory.
+
+    Runs are paged oldest-first from BigQuery, deduplicated per start-time
+    group, filtered against the watermark and processed-run index, and built
+    in chunks of ``stream_chunk_rows`` that carry local baselines forward.
+    Facts are spooled straight into the load jobs and folded into report
+    summaries. Only per-family state (baselines, local sketches), the cluster
+    registry, processed-run keys and the summaries outlive a chunk.
+    """
+
+    window_start = datetime.fromisoformat(ingestion_payload["window"]["start"])
+    window_end = datetime.fromisoformat(ingestion_payload["window"]["end"])
+    streaming = ingestion_payload["streaming"]
+    completed_after = (
+        datetime.fromisoformat(streaming["completed_after"])
+        if streaming.get("completed_after")
+        else None
+    )
+    previous_watermark = (
+        RunStateWatermark.from_payload(streaming["previous_watermark"])
+        if streaming.get("previous_watermark")
+        else None
+    )
 
-    insert_daily_facts(config, records=facts)
+    now = utc_now()
+    processed_index = (
+        load_processed_run_index(config, as_of=now) if config.skip_processed_runs else None
+    )
+    ensure_performance_table(config)
+    # Families are only known as runs stream in; each chunk loads the
+    # baselines of its unseen families in one query.
+    baseline_cache = open_baseline_cache(config, load=load_baselines)
+    baselines = BaselineLoader(
+        config,
+        as_of=now,
+        trailing_window=config.baseline_window,
+        load=baseline_cache.load_baselines if baseline_cache else load_baselines,
+    )
+    persisted_families: set[str] = set()
+    rollups = BaselineRollupBuilder(now.date().isoformat()) if config.baseline_rollups else None
+
+    tracker = WatermarkTracker(config, previous_watermark) if config.incremental else None
+    deduplication = DeduplicationCounts()
+    counters = {"ingested": 0, "boundary": 0, "processed": 0}
+    summary = FactSummary()
+    horizon_summaries = [
+        (horizon_label(hours), hours, FactSummary())
+        for hours in ingestion_payload.get("horizons") or []
+    ]
+    cluster_registry = ClusterConfigRegistry()
+    history = _LocalHistory()
+
+    def fetched_runs() -> Iterator[SparkRunState]:
+        for run_state in iter_run_state_records(
+            config,
+            start_time=window_start,
+            end_time=window_end,
+            completed_after=completed_after,
+            page_size=config.stream_chunk_rows,
+        ):
+            counters["ingested"] += 1
+            if previous_watermark is not None and previous_watermark.is_boundary_run(run_state):
+                counters["boundary"] += 1
+                continue
+            if tracker is not None:
+                tracker.observe(run_state)
+            yield run_state
+
+    def pending_runs() -> Iterator[SparkRunState]:
+        for run_state in iter_deduplicated_run_states(
+            fetched_runs(),
+            policy=config.dedup_policy,
+            sort_key=_run_state_sort_key,
+            counts=deduplication,
+            max_open_runs=config.stream_chunk_rows,
+        ):
+            if processed_index is not None and not reprocess and run_state in processed_index:
+                counters["processed"] += 1
+                continue
+            yield run_state
+
+    def built_facts() -> Iterator[DataprocFact]:
+        run_stream = pending_runs()
+        while chunk := list(islice(run_stream, config.stream_chunk_rows)):
+            runs = [
+                (run_state, replace(cluster_registry.register(run_state)))
+                for run_state in chunk
+            ]
+            chunk_families = {run_state.primary_job_id for run_state in chunk}
+            persisted_families.update(chunk_families)
+            baselines.prefetch(chunk_families)
+            facts = _build_fact_shard(config, now, baselines, runs, history)
+            for run_state, fact in zip(chunk, facts):
+                summary.add(fact)
+                if rollups is not None:
+                    _add_to_rollups(rollups, fact)
+                for _, hours, horizon_summary in horizon_summaries:
+                    if within_horizon(run_state, window_end=window_end, hours=hours):
+                        horizon_summary.add(fact)
+            if processed_index is not None:
+                processed_index.add(chunk, as_of=now)
+            yield from facts
+
+    fact_load = FactLoadReport()
+    persisted_rows = insert_daily_facts(config, records=built_facts(), report=fact_load)
+    if rollups is not None:
+        merge_baseline_rollups(config, rollups, as_of=now)
+    _refresh_baseline_cache(config, baseline_cache, persisted_families, as_of=now)
+    _persist_cluster_configs(config, cluster_registry, as_of=now)
+    if processed_index is not None and not config.dry_run:
+        processed_index.save(as_of=now, retention=processed_run_retention(config))
+    if tracker is not None and not config.dry_run:
+        watermark = tracker.result(as_of=window_end)
+        if watermark is not None:
+            save_watermark(config, watermark)
 
-    serialized = [fact.to_json() for fact in facts]
     if tool_context is not None:
-        tool_context.state["dataproc_facts"] = serialized
+        tool_context.state["dataproc_facts"] = None
+        tool_context.state["dataproc_fact_horizons"] = None
+        tool_context.state["dataproc_fact_summary"] = {
+            "overall": summary.to_payload(),
+            "horizons": [
+                [label, horizon_summary.to_payload()]
+                for label, _, horizon_summary in horizon_summaries
+            ],
+        }
 
-    return {
-        "persisted_rows": len(serialized),
+    result = {
+        "persisted_rows": persisted_rows,
         "dry_run": config.dry_run,
-        "has_anomalies": has_anomaly,
+        "has_anomalies": summary.anomaly_count > 0,
+        "distinct_cluster_configs": len(cluster_registry),
+        "deduplicated_rows": deduplication.collapsed_rows,
+        "duplicated_runs": deduplication.duplicated_runs,
+        "skipped_processed_runs": counters["processed"],
+        "streaming": {
+            "ingested_runs": counters["ingested"],
+            "skipped_boundary_runs": counters["boundary"],
+            "chunk_rows": config.stream_chunk_rows,
+            "baseline_queries": baselines.query_count,
+            "baseline_families": baselines.loaded_families,
+        },
     }
+    if fact_load.chunks:
+        result["fact_load"] = fact_load.to_payload()
+    if baseline_cache is not None:
+        result["baseline_cache"] = baseline_cache.stats.to_payload()
+    if horizon_summaries:
+        result["horizons"] = {
+            label: {
+                "facts": horizon_summary.count,
+                "anomalies": horizon_summary.anomaly_count,
+            }
+            for label, _, horizon_summary in horizon_summaries
+        }
+    return result
 
 
 def generate_dataproc_report(
@@ -183,31 +538,44 @@ def generate_dataproc_report(
 ) -> dict[str, Any]:
     """Return a human readable Dataproc status report."""
 
-    facts_payload = None
+    summary_payload = None
     if tool_context is not None:
-        facts_payload = tool_context.state.get("dataproc_facts")
+        summary_payload = tool_context.state.get("dataproc_fact_summary")
 
-    if not facts_payload:
-        report = (
-            "No Dataproc facts are cached yet. Run build_performance_memory before requesting a report."
-        )
-        if tool_context is not None:
-            tool_context.state["dataproc_report"] = report
+    if summary_payload:
+        if summary_payload.get("horizons"):
+            report = render_horizon_report(
+                (label, FactSummary.from_payload(payload))
+                for label, payload in summary_payload["horizons"]
+            )
+        else:
+            report = FactSummary.from_payload(summary_payload["overall"]).render()
+        tool_context.state["dataproc_report"] = report
         return {"report": report}
 
-    report = build_status_report(
-        [
-            DataprocFact(**fact)
-            for fact in facts_payload
-        ]
+    report = (
+        "No Dataproc facts are cached yet. Run build_performance_memory before requesting a report."
     )
-
     if tool_context is not None:
         tool_context.state["dataproc_report"] = report
-
     return {"report": report}
 
 
+def _summary_payload(
+    facts: Sequence[DataprocFact],
+    fact_horizons: Optional[dict[str, list[int]]],
+) -> dict[str, Any]:
+    """The ``dataproc_fact_summary`` state streaming mode keeps, for a batch."""
+
+    return {
+        "overall": FactSummary().update(facts).to_payload(),
+        "horizons": [
+            [label, FactSummary().update(facts[position] for position in positions).to_payload()]
+            for label, positions in (fact_horizons or {}).items()
+        ],
+    }
+
+
 def _resolve_config(**overrides: Any) -> MonitoringConfig:
     usable_overrides = {
         key: value
@@ -219,29 +587,301 @@ def _resolve_config(**overrides: Any) -> MonitoringConfig:
     return load_config()
 
 
+def _apply_watermark(
+    config: MonitoringConfig,
+    watermark: RunStateWatermark | None,
+    run_payloads: list[dict[str, Any]],
+    *,
+    as_of: datetime,
+) -> tuple[list[dict[str, Any]], RunStateWatermark | None, int]:
+    """Drop runs already ingested at the watermark boundary and advance it."""
+
+    kept_payloads: list[dict[str, Any]] = []
+    kept_states: list[SparkRunState] = []
+    for payload in run_payloads:
+        run_state = SparkRunState.from_payload(payload)
+        if watermark is not None and watermark.is_boundary_run(run_state):
+            continue
+        kept_payloads.append(payload)
+        kept_states.append(run_state)
+
+    pending = advance_watermark(config, watermark, kept_states, as_of=as_of)
+    return kept_payloads, pending, len(run_payloads) - len(kept_payloads)
+
+
+def _commit_watermark(config: MonitoringConfig, ingestion_payload: dict[str, Any]) -> None:
+    """Persist the ingestion watermark once its runs have been loaded."""
+
+    if not config.incremental or config.dry_run:
+        return
+    watermark_payload = ingestion_payload.get("watermark")
+    if not watermark_payload:
+        return
+    save_watermark(config, RunStateWatermark.from_payload(watermark_payload))
+
+
+def _build_facts(
+    config: MonitoringConfig,
+    *,
+    as_of: datetime,
+    runs: list[tuple[SparkRunState, ClusterConfigEntry]],
+    baselines: Dict[str, Any],
+) -> list[DataprocFact]:
+    """Facts with anomaly flags for ``runs``, in the order given.
+
+    Local baselines only depend on earlier runs of the same job family, so
+    when ``fact_build_workers`` allows it, batches of at least
+    ``fact_build_parallel_min_runs`` runs are sharded by family across a
+    process pool and merged back by position. Smaller batches, a pool that
+    cannot be started and shards whose runs or facts cannot be pickled are
+    built in-process, the latter two after logging a warning.
+
+    Workers are never forked from this process, which may be running the
+    baseline cache refresh or client library threads; a fork could copy a
+    lock one of them holds. They come from a forkserver (or are spawned) and
+    receive their shard's runs pickled.
+    """
+
+    workers = config.fact_build_workers
+    if workers <= 1 or len(runs) < config.fact_build_parallel_min_runs:
+        return _build_fact_shard(config, as_of, baselines, runs)
+    shards = _shard_by_family(runs, workers)
+    if len(shards) <= 1:
+        return _build_fact_shard(config, as_of, baselines, runs)
+
+    facts: list[DataprocFact | None] = [None] * len(runs)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=len(shards),
+            mp_context=_pool_context(),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _build_pooled_fact_shard,
+                    config,
+                    as_of,
+                    {family: baselines[family] for family in families if family in baselines},
+                    [runs[position] for position in positions],
+                )
+                for positions, families in shards
+            ]
+            for (positions, _), future in zip(shards, futures):
+                for position, fact in zip(positions, future.result()):
+                    fact.job_metrics = MetadataOverlay(
+                        runs[position][0].spark_event_metrics,
+                        fact.job_metrics.metadata,
+                    )
+                    facts[position] = fact
+    except (BrokenProcessPool, OSError, pickle.PicklingError, TypeError, AttributeError) as exc:
+        # Arguments or results that cannot be pickled surface here as
+        # PicklingError, TypeError or AttributeError.
+        logging.warning(
+            "Fact-building process pool failed (%s: %s); building %d runs in-process",
+            type(exc).__name__,
+            exc,
+            len(runs),
+        )
+        return _build_fact_shard(config, as_of, baselines, runs)
+    return facts
+
+
+@dataclass(slots=True)
+class _LocalHistory:
+    """Per-family local baselines grown while facts are built."""
+
+    accumulators: dict[str, LocalBaselineAccumulator] = field(default_factory=dict)
+    local_baseline_families: set[str] = field(default_factory=set)
+
+
+def _build_fact_shard(
+    config: MonitoringConfig,
+    as_of: datetime,
+    baselines: Dict[str, Any],
+    runs: Sequence[tuple[SparkRunState, ClusterConfigEntry]],
+    history: _LocalHistory | None = None,
+) -> list[DataprocFact]:
+    """Sequentially build facts, growing local baselines run by run.
+
+    Passing the same ``history`` and ``baselines`` to consecutive calls
+    continues the local baselines across chunks of one ordered run stream.
+    """
+
+    history = history if history is not None else _LocalHistory()
+    local_history = history.accumulators
+    local_baseline_families = history.local_baseline_families
+
+    facts: list[DataprocFact] = []
+    anomaly_inputs: list[AnomalyInput] = []
+    for run_state, cluster_config in runs:
+        job_family = run_state.job_family or run_state.primary_job_id
+        job_key = job_family or run_state.primary_job_id
+        history_key = job_family or job_key
+
+        if job_key:
+            prior_samples = local_history.get(history_key)
+            if baselines.get(job_key) is None and prior_samples is not None:
+                baselines[job_key] = prior_samples.to_baseline(
+                    run_state.cluster_name or "unknown"
+                )
+                local_baseline_families.add(job_key)
+
+        fact, anomaly_input = _build_fact(
+            config=config,
+            as_of=as_of,
+            run_state=run_state,
+            baselines=baselines,
+            cluster_config=cluster_config,
+        )
+        facts.append(fact)
+        anomaly_inputs.append(anomaly_input)
+
+        if job_key:
+            sample = _build_local_sample(fact)
+            if sample:
+                accumulator = local_history.get(history_key)
+                if accumulator is None:
+                    accumulator = local_history[history_key] = LocalBaselineAccumulator(
+                        history_key
+                    )
+                accumulator.add(sample)
+                if baselines.get(job_key) is None or job_key in local_baseline_families:
+                    baselines[job_key] = accumulator.to_baseline(fact.cluster_name)
+                    local_baseline_families.add(job_key)
+
+    # Baselines are snapshotted per run above, so every fact is scored against
+    # the same baseline the sequential detectors would have seen.
+    for fact, anomaly_payload in zip(facts, synthesize_anomaly_flags_batch(anomaly_inputs)):
+        fact.anomaly_flags = anomaly_payload
+    return facts
+
+
+def _build_pooled_fact_shard(
+    config: MonitoringConfig,
+    as_of: datetime,
+    baselines: Dict[str, Any],
+    runs: Sequence[tuple[SparkRunState, ClusterConfigEntry]],
+) -> list[DataprocFact]:
+    """Pool entry point: facts without the metrics payload the parent holds."""
+
+    facts = _build_fact_shard(config, as_of, baselines, runs)
+    for fact in facts:
+        fact.job_metrics = MetadataOverlay(None, fact.job_metrics.metadata)
+    return facts
+
+
+def _shard_by_family(
+    runs: Sequence[tuple[SparkRunState, ClusterConfigEntry]],
+    shard_count: int,
+) -> list[tuple[list[int], set[str]]]:
+    """Split run positions into at most ``shard_count`` family-disjoint shards."""
+
+    positions_by_family: dict[str, list[int]] = {}
+    for position, (run_state, _) in enumerate(runs):
+        positions_by_family.setdefault(run_state.primary_job_id, []).append(position)
+
+    shards: list[tuple[list[int], set[str]]] = [
+        ([], set()) for _ in range(min(shard_count, len(positions_by_family)))
+    ]
+    # Largest families go first onto the least loaded shard; ties break on the
+    # family name so the assignment is deterministic.
+    for family, positions in sorted(
+        positions_by_family.items(), key=lambda item: (-len(item[1]), item[0])
+    ):
+        shard_positions, families = min(shards, key=lambda shard: len(shard[0]))
+        shard_positions.extend(positions)
+        families.add(family)
+    for shard_positions, _ in shards:
+        shard_positions.sort()
+    return shards
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # The server starts once per process; preloading the pipeline lets every
+    # later worker fork with its imports done.
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _refresh_baseline_cache(
+    config: MonitoringConfig,
+    baseline_cache: BaselineCache | None,
+    job_families: set[str],
+    *,
+    as_of: datetime,
+) -> None:
+    """Invalidate families that just received facts and reload them in the background."""
+
+    if baseline_cache is None or config.dry_run or not job_families:
+        return
+    baseline_cache.invalidate(job_families, as_of=as_of)
+    baseline_cache.refresh(job_families, as_of=as_of)
+
+
+def _persist_cluster_configs(
+    config: MonitoringConfig,
+    cluster_registry: ClusterConfigRegistry,
+    *,
+    as_of: datetime,
+) -> None:
+    if config.cluster_config_mode != "reference":
+        return
+    insert_cluster_configs(
+        config,
+        records=[
+            ClusterConfigRecord(
+                config_key=entry.config_key,
+                dataproc_cluster_uuid=entry.dataproc_cluster_uuid,
+                ingest_date=as_of.date().isoformat(),
+                ingest_timestamp=as_of.isoformat(),
+                cluster_config_details=entry.cluster_config_details,
+                cluster_profile=entry.cluster_profile,
+            )
+            for entry in cluster_registry.entries()
+        ],
+    )
+
+
 def _build_fact(
     *,
     config: MonitoringConfig,
     as_of: datetime,
     run_state: SparkRunState,
     baselines: Dict[str, Any],
-) -> Tuple[DataprocFact, bool]:
+    cluster_config: ClusterConfigEntry,
+) -> Tuple[DataprocFact, AnomalyInput]:
     job_id = run_state.primary_job_id
     duration_seconds = run_state.duration_seconds
 
     job_family = run_state.job_family or run_state.primary_job_id
     run_identifier = run_state.run_identifier
 
-    metrics_payload = run_state.spark_event_metrics
-    if not isinstance(metrics_payload, dict):
-        metrics_payload = {}
-    else:
-        metrics_payload = copy.deepcopy(metrics_payload)
-    metadata_section = metrics_payload.setdefault("metadata", {})
-    metadata_section.setdefault("run_identifier", run_identifier)
-    metadata_section.setdefault("job_family", job_family)
+    spark_metrics = run_state.spark_event_metrics
+    # The run state's payload is shared, not copied; the metadata keys are
+    # merged in when the fact is serialised.
+    metrics_payload = MetadataOverlay(
+        spark_metrics,
+        {"run_identifier": run_identifier, "job_family": job_family},
+    )
 
-    cluster_profile = _summarize_cluster_profile(run_state.cluster_config_details)
+    cluster_profile = cluster_config.cluster_profile
+    cost_summary = run_state.cost_summary
+    job_sample = _extract_job_metric_sample(spark_metrics)
+    autoscaling = (cluster_profile or {}).get("autoscaling_enabled")
+    if config.cluster_config_mode == "reference":
+        cluster_metrics = {
+            "cluster_config_key": cluster_config.config_key,
+            "dataproc_cluster_uuid": run_state.dataproc_cluster_uuid,
+            "cluster_profile": cluster_profile,
+        }
+    else:
+        cluster_metrics = {
+            "cluster_config_details": cluster_config.cluster_config_details,
+            "dataproc_cluster_uuid": run_state.dataproc_cluster_uuid,
+            "cluster_profile": cluster_profile,
+        }
 
     fact = DataprocFact(
         ingest_date=as_of.date().isoformat(),
@@ -258,33 +898,37 @@ def _build_fact(
         yarn_application_ids=[run_state.application_id]
         if run_state.application_id
         else [],
-        cluster_metrics={
-            "cluster_config_details": run_state.cluster_config_details,
-            "dataproc_cluster_uuid": run_state.dataproc_cluster_uuid,
-            "cluster_profile": cluster_profile,
-        },
+        cluster_metrics=cluster_metrics,
         job_metrics=metrics_payload,
         driver_log_excerpt=run_state.log_location,
         yarn_log_excerpt=None,
-        spark_event_snippet=_format_spark_event_snippet(
-            run_state.spark_event_metrics
-        ),
+        spark_event_snippet=_format_spark_event_snippet(spark_metrics),
         anomaly_flags={},
+        input_bytes=run_state.input_bytes,
+        shuffle_read_bytes=run_state.shuffle_read_bytes,
+        app_vcore_seconds=_safe_float(cost_summary.get("app_vcore_seconds")),
+        app_memory_gb_seconds=_safe_float(cost_summary.get("app_memory_gb_seconds")),
+        max_over_median_ratio=_safe_float(job_sample.get("max_over_median_ratio")),
+        p95_task_duration_ms=_safe_float(job_sample.get("p95_task_duration_ms")),
+        primary_machine_type=(cluster_profile or {}).get("primary_machine_type"),
+        autoscaling_enabled=None if autoscaling is None else bool(autoscaling),
+        run_identifier=run_identifier or None,
     )
 
     baseline = baselines.get(job_id)
-    anomaly_payload = synthesize_anomaly_flags(
-        fact,
+    if baseline is not None and baseline.segments:
+        baseline = baseline.for_segment(segment_values(fact.cluster_name, cluster_profile))
+
+    anomaly_input = AnomalyInput(
+        fact=fact,
         baseline=baseline,
-        spark_metrics=run_state.spark_event_metrics,
-        cost_summary=run_state.cost_summary,
+        spark_metrics=spark_metrics,
+        cost_summary=cost_summary,
         cluster_profile=cluster_profile,
         job_family=job_family,
         run_identifier=run_identifier,
     )
-    has_issues = bool(anomaly_payload.get("has_issues")) if anomaly_payload else False
-    fact.anomaly_flags = anomaly_payload or {}
-    return fact, has_issues
+    return fact, anomaly_input
 
 
 def _format_spark_event_snippet(metrics: dict[str, Any]) -> str | None:
@@ -359,15 +1003,22 @@ def _run_state_sort_key(run_state: SparkRunState) -> tuple[str, str, str]:
     return (primary, secondary, run_state.run_identifier)
 
 
-def _build_local_sample(fact: DataprocFact, run_state: SparkRunState) -> dict[str, Any]:
-    cost_summary = run_state.cost_summary
-    job_metrics = _extract_job_metric_sample(run_state.spark_event_metrics)
+def _add_to_rollups(rollups: BaselineRollupBuilder, fact: DataprocFact) -> None:
+    rollups.add(
+        fact.job_id,
+        fact.cluster_name,
+        _build_local_sample(fact),
+        run_key=rollup_run_key(fact.run_identifier, fact.job_start_time),
+    )
+
+
+def _build_local_sample(fact: DataprocFact) -> dict[str, Any]:
     sample = {
         "duration": fact.duration_seconds,
-        "vcores": _safe_float(cost_summary.get("app_vcore_seconds")),
-        "memory": _safe_float(cost_summary.get("app_memory_gb_seconds")),
-        "ratio": _safe_float(job_metrics.get("max_over_median_ratio")),
-        "p95_task_duration_ms": _safe_float(job_metrics.get("p95_task_duration_ms")),
+        "vcores": fact.app_vcore_seconds,
+        "memory": fact.app_memory_gb_seconds,
+        "ratio": fact.max_over_median_ratio,
+        "p95_task_duration_ms": fact.p95_task_duration_ms,
         "job_type": fact.job_type,
     }
     has_measure = any(
@@ -376,6 +1027,7 @@ def _build_local_sample(fact: DataprocFact, run_state: SparkRunState) -> dict[st
     )
     if not has_measure:
         return {}
+    sample.update(per_gb_rates(sample, fact.processed_gb))
     return sample
 
 
@@ -395,82 +1047,6 @@ def _extract_job_metric_sample(metrics: dict[str, Any] | None) -> dict[str, Any]
     return {}
 
 
-def _build_local_baseline(
-    job_family: str,
-    cluster_name: str,
-    samples: List[dict[str, Any]],
-) -> BaselineStats:
-    durations = [s.get("duration") for s in samples if s.get("duration") is not None]
-    vcores = [s.get("vcores") for s in samples if s.get("vcores") is not None]
-    memories = [s.get("memory") for s in samples if s.get("memory") is not None]
-    ratios = [s.get("ratio") for s in samples if s.get("ratio") is not None]
-    p95_values = [s.get("p95_task_duration_ms") for s in samples if s.get("p95_task_duration_ms") is not None]
-    job_type = next((s.get("job_type") for s in reversed(samples) if s.get("job_type")), "SPARK")
-
-    return BaselineStats(
-        job_id=job_family,
-        job_type=job_type,
-        cluster_name=cluster_name,
-        p50_duration=_quantile(durations, 0.5),
-        p95_duration=_quantile(durations, 0.95),
-        avg_duration=_average(durations),
-        p50_app_vcore_seconds=_quantile(vcores, 0.5),
-        p95_app_vcore_seconds=_quantile(vcores, 0.95),
-        avg_app_vcore_seconds=_average(vcores),
-        p50_app_memory_gb_seconds=_quantile(memories, 0.5),
-        p95_app_memory_gb_seconds=_quantile(memories, 0.95),
-        avg_app_memory_gb_seconds=_average(memories),
-        avg_max_over_median_ratio=_average(ratios),
-        p95_task_duration_ms=_quantile(p95_values, 0.95),
-        run_count=len(samples),
-    )
-
-
-def _quantile(values: List[float], percentile: float) -> float | None:
-    if not values:
-        return None
-    sorted_vals = sorted(values)
-    if len(sorted_vals) == 1:
-        return sorted_vals[0]
-    position = (len(sorted_vals) - 1) * percentile
-    lower = math.floor(position)
-    upper = math.ceil(position)
-    if lower == upper:
-        return sorted_vals[lower]
-    weight = position - lower
-    return sorted_vals[lower] + (sorted_vals[upper] - sorted_vals[lower]) * weight
-
-
-def _average(values: List[float]) -> float | None:
-    if not values:
-        return None
-    return sum(values) / len(values)
-
-
-def _summarize_cluster_profile(details: dict[str, Any] | None) -> dict[str, Any]:
-    if not isinstance(details, dict):
-        return {}
-
-    config = details.get("config") or {}
-    worker_cfg = config.get("workerConfig") or {}
-    secondary_cfg = config.get("secondaryWorkerConfig") or {}
-
-    primary_workers = _safe_int(worker_cfg.get("numInstances"))
-    secondary_workers = _safe_int(secondary_cfg.get("numInstances"))
-    total_workers = (primary_workers or 0) + (secondary_workers or 0)
-
-    profile = {
-        "primary_workers": primary_workers,
-        "secondary_workers": secondary_workers,
-        "total_workers": total_workers,
-        "primary_machine_type": worker_cfg.get("machineTypeUri"),
-        "secondary_machine_type": secondary_cfg.get("machineTypeUri"),
-        "autoscaling_enabled": bool(config.get("autoscalingConfig")),
-    }
-
-    return {key: value for key, value in profile.items() if value not in (None, "", [])}
-
-
 def _safe_float(value: Any) -> float | None:
     try:
         if value is None:
@@ -478,12 +1054,3 @@ def _safe_float(value: Any) -> float | None:
         return float(value)
     except (TypeError, ValueError):
         return None
-
-
-def _safe_int(value: Any) -> int | None:
-    try:
-        if value is None:
-            return None
-        return int(value)
-    except (TypeError, ValueError):
-        return None
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta, timezone
+import logging
+
+from dataproc_monitoring_agent.analytics.baseline_cache import open_baseline_cache
+from dataproc_monitoring_agent.analytics.performance_memory import BaselineStats
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+from dataproc_monitoring_agent.repositories import state_files
+
+
+AS_OF = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+
+def _baseline(job_id: str, run_count: int) -> BaselineStats:
+    return BaselineStats(
+        job_id=job_id,
+        job_type="SPARK",
+        cluster_name="cluster",
+        p50_duration=60.0,
+        p95_duration=120.0,
+        avg_duration=70.0,
+        p50_app_vcore_seconds=None,
+        p95_app_vcore_seconds=None,
+        avg_app_vcore_seconds=None,
+        p50_app_memory_gb_seconds=None,
+        p95_app_memory_gb_seconds=None,
+        avg_app_memory_gb_seconds=None,
+        avg_max_over_median_ratio=None,
+        p95_task_duration_ms=None,
+        run_count=run_count,
+    )
+
+
+class _Table:
+    """Stands in for daily_facts: run counts per family, one query per call."""
+
+    def __init__(self) -> None:
+        self.run_counts = {"ingest": 10, "export": 4}
+        self.queries: list[set] = []
+
+    def load(self, config, *, as_of, trailing_window, job_families=None):
+        self.queries.append(set(job_families))
+        return {
+            family: _baseline(family, self.run_counts[family])
+            for family in job_families
+            if family in self.run_counts
+        }
+
+
+def _open(tmp_path, table: _Table, **overrides):
+    config = MonitoringConfig(
+        project_id="demo-project",
+        region="us-central1",
+        state_dir=str(tmp_path),
+        baseline_cache=True,
+        **overrides,
+    )
+    return config, open_baseline_cache(config, load=table.load)
+
+
+def test_warm_cycle_skips_the_query_until_facts_land(tmp_path):
+    table = _Table()
+    config, cache = _open(tmp_path, table)
+    families = {"ingest", "export", "new_job"}
+
+    cold = cache.load_baselines(
+        config, as_of=AS_OF, trailing_window=config.baseline_window, job_families=families
+    )
+    assert cache.stats.to_payload() == {"hits": 0, "misses": 3, "queries": 1, "refreshing": 0}
+
+    config, cache = _open(tmp_path, table)
+    warm = cache.load_baselines(
+        config,
+        as_of=AS_OF + timedelta(hours=1),
+        trailing_window=config.baseline_window,
+        job_families=families,
+    )
+    assert warm == cold and "new_job" not in warm
+    assert cache.stats.hits == 3 and len(table.queries) == 1
+
+    # Facts for ingest land: it is invalidated and reloaded in the background.
+    table.run_counts["ingest"] = 11
+    later = AS_OF + timedelta(hours=2)
+    cache.invalidate({"ingest"}, as_of=later)
+    cache.refresh({"ingest"}, as_of=later).join()
+    assert table.queries[-1] == {"ingest"}
+
+    config, cache = _open(tmp_path, table)
+    refreshed = cache.load_baselines(
+        config,
+        as_of=later + timedelta(hours=1),
+        trailing_window=config.baseline_window,
+        job_families=families,
+    )
+    assert refreshed["ingest"].run_count == 11
+    assert cache.stats.queries == 0 and len(table.queries) == 2
+
+
+def test_expired_entries_and_late_refreshes_are_not_served(tmp_path):
+    table = _Table()
+    config, cache = _open(tmp_path, table, baseline_cache_ttl_minutes=60)
+    cache.load_baselines(
+        config, as_of=AS_OF, trailing_window=config.baseline_window, job_families={"ingest"}
+    )
+    # A refresh that started before a newer invalidation must not win.
+    cache.invalidate({"export"}, as_of=AS_OF + timedelta(minutes=30))
+    cache._store({"export"}, {"export": _baseline("export", 1)}, as_of=AS_OF)
+
+    cache.load_baselines(
+        config,
+        as_of=AS_OF + timedelta(minutes=45),
+        trailing_window=config.baseline_window,
+        job_families={"ingest", "export"},
+    )
+    assert table.queries[-1] == {"export"}
+
+    config, cache = _open(tmp_path, table, baseline_cache_ttl_minutes=60)
+    cache.load_baselines(
+        config,
+        as_of=AS_OF + timedelta(minutes=90),
+        trailing_window=config.baseline_window,
+        job_families={"ingest", "export"},
+    )
+    assert table.queries[-1] == {"ingest"}
+    assert cache.stats.hits == 1
+
+
+def test_segment_dimensions_and_the_rollup_source_get_their_own_entries(tmp_path):
+    table = _Table()
+    variants = [{}, {"baseline_dimensions": ("cluster",)}, {"baseline_rollups": True}]
+    for overrides in variants * 2:
+        config, cache = _open(tmp_path, table, **overrides)
+        cache.load_baselines(
+            config, as_of=AS_OF, trailing_window=config.baseline_window, job_families={"ingest"}
+        )
+
+    # Each variant queries once, then serves its own entry.
+    assert len(table.queries) == len(variants)
+
+
+def test_a_refresh_whose_write_fails_is_logged_not_raised(tmp_path, monkeypatch, caplog):
+    table = _Table()
+    config, cache = _open(tmp_path, table)
+
+    def lost_race(source, target):
+        # Another process sharing the state directory removed our temp file.
+        raise FileNotFoundError(source)
+
+    monkeypatch.setattr(state_files.os, "replace", lost_race)
+    with caplog.at_level(logging.WARNING):
+        cache.refresh({"ingest"}, as_of=AS_OF).join()
+
+    assert "Background baseline refresh failed" in caplog.text
+    assert not list((tmp_path / "baseline_cache").glob("*.tmp"))
@@ -0,0 +1,132 @@
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+import random
+
+import pytest
+
+from dataproc_monitoring_agent.analytics import baseline_rollup
+from dataproc_monitoring_agent.analytics.baseline_rollup import BaselineRollupBuilder
+from dataproc_monitoring_agent.analytics.local_baseline import LocalBaselineAccumulator
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+
+
+AS_OF = datetime(2024, 5, 8, 12, tzinfo=timezone.utc)
+
+
+def _samples(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "duration": rng.uniform(30, 900),
+            "vcores": rng.uniform(10, 400) if index % 5 else None,
+            "memory": rng.uniform(10, 900),
+            "ratio": rng.uniform(1, 4),
+            "p95_task_duration_ms": rng.uniform(100, 5000),
+            "job_type": "SPARK",
+        }
+        for index in range(count)
+    ]
+
+
+def test_merged_daily_rollups_match_one_accumulator_over_all_runs(monkeypatch):
+    days = {f"2024-05-0{day}": _samples(25, day) for day in range(2, 9)}
+    # One day's row has no duration and must not count, as in the raw query.
+    days["2024-05-08"].append({"duration": None, "memory": 1e9})
+
+    rows = []
+    for rollup_date, samples in days.items():
+        builder = BaselineRollupBuilder(rollup_date)
+        for sample in samples:
+            builder.add("daily_load", f"cluster-{rollup_date}", sample)
+        rows.extend(
+            baseline_rollup._row(family, rollup_date, accumulator, cluster, as_of=AS_OF)
+            for family, accumulator, cluster, _ in builder.accumulators()
+        )
+    queries = []
+
+    def query(config, query, params):
+        queries.append(query)
+        return rows
+
+    monkeypatch.setattr(baseline_rollup, "_query_rollups", query)
+
+    config = MonitoringConfig(project_id="demo-project", region="us-central1")
+    baselines = baseline_rollup.load_rollup_baselines(
+        config,
+        as_of=AS_OF,
+        trailing_window=timedelta(days=7),
+        job_families=["daily_load"],
+    )
+
+    expected = LocalBaselineAccumulator("daily_load")
+    for samples in days.values():
+        for sample in samples:
+            if sample["duration"] is not None:
+                expected.add(sample)
+    # Within k runs the merged sketches are exact; sums are added per day, so
+    # averages may differ in the last bits.
+    actual = asdict(baselines["daily_load"])
+    assert actual.pop("segments") == {}
+    assert actual == pytest.approx(
+        {
+            key: value
+            for key, value in asdict(expected.to_baseline("cluster-2024-05-08")).items()
+            if key != "segments"
+        }
+    )
+    assert baselines["daily_load"].run_count == 175
+    assert "run_keys" not in queries[0] and "*" not in queries[0]
+
+
+def test_a_rebuilt_run_is_counted_once_by_the_stored_rollups(monkeypatch):
+    stored: dict[tuple, dict] = {}
+
+    def query(config, query, params):
+        # Honour the projection and the single-day filter of the full read.
+        columns = [name.strip() for name in query.split("SELECT")[1].split("FROM")[0].split(",")]
+        values = {param.name: param.value for param in params if hasattr(param, "value")}
+        return [
+            {column: row.get(column) for column in columns}
+            for row in stored.values()
+            if "rollup_date = @rollup_date" not in query
+            or row["rollup_date"] == values["rollup_date"]
+        ]
+
+    def merge(config, *, rows, **kwargs):
+        stored.update({(row["job_id"], row["rollup_date"]): row for row in rows})
+
+    monkeypatch.setattr(baseline_rollup, "_query_rollups", query)
+    monkeypatch.setattr(baseline_rollup, "merge_rows", merge)
+    config = MonitoringConfig(project_id="demo-project", region="us-central1")
+    samples = _samples(4, 7)
+    start = datetime(2024, 5, 7, 23, tzinfo=timezone.utc)
+
+    def cycle(rollup_date, runs):
+        builder = BaselineRollupBuilder(rollup_date)
+        for index in runs:
+            run_key = baseline_rollup.rollup_run_key(f"run-{index}", start.isoformat())
+            builder.add("daily_load", "etl", samples[index], run_key=run_key)
+        return baseline_rollup.merge_baseline_rollups(config, builder, as_of=AS_OF)
+
+    assert cycle("2024-05-07", [0, 1, 1]) == 1
+    # A retried cycle, then an overlapping window on the next day.
+    assert cycle("2024-05-07", [0, 1]) == 0
+    assert cycle("2024-05-08", [1, 2, 3]) == 1
+
+    counts = {
+        rollup_date: baseline_rollup._accumulator_from_row(row).to_baseline("etl").run_count
+        for (_, rollup_date), row in stored.items()
+    }
+    assert counts == {"2024-05-07": 2, "2024-05-08": 2}
+    assert len(stored[("daily_load", "2024-05-08")]["run_keys"]) == 2
+
+
+def test_accumulator_payload_round_trips_past_the_exact_range():
+    accumulator = LocalBaselineAccumulator("daily_load", k=16)
+    for sample in _samples(500, 1):
+        accumulator.add(sample)
+
+    restored = LocalBaselineAccumulator.from_payload("daily_load", accumulator.to_payload())
+
+    assert restored.to_payload() == accumulator.to_payload()
+    assert restored.to_baseline("cluster") == accumulator.to_baseline("cluster")
@@ -0,0 +1,211 @@
+import logging
+import random
+
+from dataproc_monitoring_agent.analytics import batch_anomaly_detection
+from dataproc_monitoring_agent.analytics.anomaly_detection import synthesize_anomaly_flags
+from dataproc_monitoring_agent.analytics.batch_anomaly_detection import (
+    AnomalyInput,
+    synthesize_anomaly_flags_batch,
+)
+from dataproc_monitoring_agent.analytics.performance_memory import BaselineStats
+from dataproc_monitoring_agent.repositories.bigquery_repository import DataprocFact
+
+
+def _fact(index: int, duration, input_bytes=None, shuffle_read_bytes=None) -> DataprocFact:
+    return DataprocFact(
+        ingest_date="2024-05-01",
+        ingest_timestamp="2024-05-01T00:00:00+00:00",
+        project_id="demo-project",
+        region="us-central1",
+        cluster_name=f"cluster-{index % 3}",
+        job_id=f"family_{index % 7}",
+        job_type="SPARK",
+        job_state="SUCCEEDED",
+        job_start_time=None,
+        job_end_time=None,
+        duration_seconds=duration,
+        yarn_application_ids=[],
+        cluster_metrics={},
+        job_metrics={},
+        driver_log_excerpt=None,
+        yarn_log_excerpt=None,
+        spark_event_snippet=None,
+        anomaly_flags={},
+        input_bytes=input_bytes,
+        shuffle_read_bytes=shuffle_read_bytes,
+    )
+
+
+def _baseline(rng: random.Random) -> BaselineStats | None:
+    if rng.random() < 0.15:
+        return None
+    pick = lambda: rng.choice([None, 0.0, -5.0, rng.uniform(10, 500), rng.uniform(10, 500)])
+    return BaselineStats(
+        job_id="family",
+        job_type="SPARK",
+        cluster_name="cluster",
+        p50_duration=pick(),
+        p95_duration=pick(),
+        avg_duration=pick(),
+        p50_app_vcore_seconds=None,
+        p95_app_vcore_seconds=None,
+        avg_app_vcore_seconds=pick(),
+        p50_app_memory_gb_seconds=None,
+        p95_app_memory_gb_seconds=None,
+        avg_app_memory_gb_seconds=pick(),
+        avg_max_over_median_ratio=None,
+        p95_task_duration_ms=None,
+        run_count=rng.randint(1, 50),
+        p50_seconds_per_gb=rng.choice([None, pick()]),
+        avg_vcore_seconds_per_gb=rng.choice([None, pick()]),
+        avg_memory_gb_seconds_per_gb=rng.choice([None, pick()]),
+    )
+
+
+def _inputs(count: int) -> list[AnomalyInput]:
+    rng = random.Random(42)
+    inputs = []
+    for index in range(count):
+        jobs = [
+            {
+                "job_id": job,
+                "max_over_median_ratio": rng.choice(
+                    [None, "bad", str(rng.uniform(0, 8)), rng.uniform(0, 8), 3.0, float("nan")]
+                ),
+                "num_tasks": 10,
+            }
+            for job in range(rng.randint(0, 3))
+        ]
+        metrics = rng.choice(
+            [
+                None,
+                {},
+                {"jobs": "not-a-list"},
+                {
+                    "jobs": jobs + ["junk"],
+                    "stages": [{"stage_id": 1, "name": "scan", "max_task_duration_ms": 900, "p95_task_duration_ms": 100}],
+                },
+            ]
+        )
+        cost = rng.choice(
+            [
+                None,
+                {},
+                {
+                    "app_vcore_seconds": rng.choice([None, "12.5", rng.uniform(0, 900)]),
+                    "app_memory_gb_seconds": rng.choice([None, rng.uniform(0, 900)]),
+                    "executor_peak": rng.choice([None, "x", rng.randint(0, 12)]),
+                },
+            ]
+        )
+        profile = rng.choice([None, {}, {"total_workers": rng.choice([0, 2, 4, 8, 10])}])
+        inputs.append(
+            AnomalyInput(
+                fact=_fact(
+                    index,
+                    rng.choice([None, 0.0, -1.0, rng.uniform(1, 1500)]),
+                    input_bytes=rng.choice([None, 0.0, rng.uniform(0, 4) * (1 << 30)]),
+                    shuffle_read_bytes=rng.choice([None, rng.uniform(0, 2) * (1 << 30)]),
+                ),
+                baseline=_baseline(rng),
+                spark_metrics=metrics,
+                cost_summary=cost,
+                cluster_profile=profile,
+                job_family=f"family_{index % 7}",
+                run_identifier=f"run_{index}",
+            )
+        )
+    return inputs
+
+
+def test_batch_engine_matches_scalar_detectors():
+    inputs = _inputs(3_000)
+
+    expected = [
+        synthesize_anomaly_flags(
+            item.fact,
+            baseline=item.baseline,
+            spark_metrics=item.spark_metrics,
+            cost_summary=item.cost_summary,
+            cluster_profile=item.cluster_profile,
+            job_family=item.job_family,
+            run_identifier=item.run_identifier,
+        )
+        for item in inputs
+    ]
+    actual = synthesize_anomaly_flags_batch(inputs)
+
+    assert repr(actual) == repr(expected)
+    kinds = {finding["kind"] for payload in actual for finding in payload["findings"]}
+    assert kinds == {
+        "job_runtime_regression",
+        "job_runtime_volume_growth",
+        "task_straggler_detected",
+        "cost_regression",
+        "cluster_underutilized",
+        "cluster_capacity_near_limit",
+    }
+
+
+def test_batch_engine_handles_empty_batch():
+    assert synthesize_anomaly_flags_batch([]) == []
+
+
+def test_batch_engine_warns_once_when_falling_back_without_numpy(monkeypatch, caplog):
+    monkeypatch.setattr(batch_anomaly_detection, "np", None)
+    monkeypatch.setattr(batch_anomaly_detection, "_warned_missing_numpy", False)
+    inputs = _inputs(20)
+
+    with caplog.at_level(logging.WARNING):
+        first = synthesize_anomaly_flags_batch(inputs)
+        synthesize_anomaly_flags_batch(inputs)
+
+    assert len(first) == len(inputs)
+    assert [record.getMessage() for record in caplog.records] == [
+        "numpy is not installed; anomaly detectors run per row"
+    ]
+
+
+def test_more_data_is_told_apart_from_a_slower_rate():
+    baseline = BaselineStats(
+        job_id="month_end",
+        job_type="SPARK",
+        cluster_name="cluster",
+        p50_duration=600.0,
+        p95_duration=700.0,
+        avg_duration=600.0,
+        p50_app_vcore_seconds=None,
+        p95_app_vcore_seconds=None,
+        avg_app_vcore_seconds=1_000.0,
+        p50_app_memory_gb_seconds=None,
+        p95_app_memory_gb_seconds=None,
+        avg_app_memory_gb_seconds=None,
+        avg_max_over_median_ratio=None,
+        p95_task_duration_ms=None,
+        run_count=30,
+        p50_seconds_per_gb=6.0,
+        avg_vcore_seconds_per_gb=10.0,
+    )
+    # Five times the usual 100 GiB at the usual rate, and the usual volume
+    # processed 1.8x slower per GiB.
+    bigger = AnomalyInput(
+        fact=_fact(0, 3_000.0, input_bytes=400 << 30, shuffle_read_bytes=100 << 30),
+        baseline=baseline,
+        cost_summary={"app_vcore_seconds": 5_000.0},
+    )
+    slower = AnomalyInput(
+        fact=_fact(1, 1_080.0, input_bytes=100 << 30),
+        baseline=baseline,
+        cost_summary={"app_vcore_seconds": 1_800.0},
+    )
+
+    volume, regression = synthesize_anomaly_flags_batch([bigger, slower])
+
+    assert [finding["kind"] for finding in volume["findings"]] == ["job_runtime_volume_growth"]
+    assert not volume["has_issues"]
+    assert [(finding["kind"], finding["severity"]) for finding in regression["findings"]] == [
+        ("job_runtime_regression", "warning"),
+        ("cost_regression", "critical"),
+    ]
+    assert regression["findings"][0]["evidence"]["rate_ratio"] == 1.8
+    assert regression["findings"][1]["evidence"]["metric"] == "vcore_seconds_per_gb"
@@ -0,0 +1,388 @@
+import copy
+from dataclasses import replace
+from datetime import date
+import json
+
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+from google.cloud import bigquery
+import pytest
+
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+from dataproc_monitoring_agent.repositories import bigquery_repository
+from dataproc_monitoring_agent.repositories.bigquery_repository import (
+    DataprocFact,
+    ClusterConfigRecord,
+    MetadataOverlay,
+    FactLoadReport,
+    backfill_fact_metric_columns,
+    ensure_performance_table,
+    insert_cluster_configs,
+    insert_daily_facts,
+)
+
+
+def _fact(job_metrics) -> DataprocFact:
+    return DataprocFact(
+        ingest_date="2024-05-01",
+        ingest_timestamp="2024-05-01T00:00:00+00:00",
+        project_id="demo-project",
+        region="us-central1",
+        cluster_name="cluster-a",
+        job_id="ingest",
+        job_type="SPARK",
+        job_state="SUCCEEDED",
+        job_start_time="2024-05-01T00:00:00+00:00",
+        job_end_time="2024-05-01T00:01:30+00:00",
+        duration_seconds=90.0,
+        yarn_application_ids=["application_1"],
+        cluster_metrics={"cluster_profile": {"total_workers": 4}},
+        job_metrics=job_metrics,
+        driver_log_excerpt=None,
+        yarn_log_excerpt=None,
+        spark_event_snippet=None,
+        anomaly_flags={"has_anomalies": False},
+    )
+
+
+def _legacy_payload(metrics, overlay: dict) -> dict:
+    payload = copy.deepcopy(metrics) if isinstance(metrics, dict) else {}
+    section = payload.setdefault("metadata", {})
+    for key, value in overlay.items():
+        section.setdefault(key, value)
+    return payload
+
+
+def test_overlay_serialises_like_an_updated_copy():
+    overlay = {"run_identifier": "ingest_a1b2c3", "job_family": "ingest"}
+    for metrics in (
+        {"app": {"executor_peak": 2}, "jobs": [{"job_id": 0}], "stages": [{"stage_id": 1}]},
+        {"metadata": {"job_family": "custom", "source": "history"}, "app": {}},
+        {},
+        None,
+    ):
+        original = copy.deepcopy(metrics)
+        fact = _fact(MetadataOverlay(metrics, overlay))
+        expected = _fact(_legacy_payload(metrics, overlay))
+
+        assert fact.to_json() == expected.to_json()
+        assert dict(fact.job_metrics) == expected.job_metrics
+        assert metrics == original
+
+
+def test_overlay_shares_nested_payloads():
+    metrics = {"jobs": [{"job_id": 0}], "metadata": {"source": "history"}}
+    overlay = MetadataOverlay(metrics, {"job_family": "ingest"})
+
+    assert overlay["jobs"] is metrics["jobs"]
+    assert overlay["metadata"] == {"source": "history", "job_family": "ingest"}
+    assert list(overlay) == ["jobs", "metadata"]
+    assert len(overlay) == 2
+    assert json.loads(_fact(overlay).to_json()["job_metrics"]) == overlay.to_dict()
+
+
+def test_json_columns_are_encoded_once_until_a_payload_is_replaced(monkeypatch):
+    encoded = []
+    dump = bigquery_repository._dump_json_column
+    monkeypatch.setattr(
+        bigquery_repository,
+        "_dump_json_column",
+        lambda value: encoded.append(value) or dump(value),
+    )
+    fact = _fact({"app": {"app_vcore_seconds": 12.5}, "note": "résumé"})
+
+    row = fact.to_json()
+    assert fact.to_json() == row and len(encoded) == 3
+    assert json.loads(row["job_metrics"])["note"] == "résumé"
+    assert "_json_columns" not in row
+
+    fact.anomaly_flags = {"has_issues": True}
+    assert json.loads(fact.to_json()["anomaly_flags"]) == {"has_issues": True}
+    assert len(encoded) == 6
+    assert DataprocFact(**row).to_json() == row
+
+
+def test_backfill_adds_missing_columns_and_fills_only_unmigrated_rows(monkeypatch):
+    calls = {}
+
+    class _Job:
+        num_dml_affected_rows = 12
+
+        def result(self, timeout=None):
+            return self
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def get_table(self, table_id):
+            schema = [bigquery.SchemaField("job_id", "STRING")]
+            return bigquery.Table(table_id.replace("`", ""), schema=schema)
+
+        def update_table(self, table, fields):
+            calls["added"] = [field.name for field in table.schema][1:]
+
+        def query(self, statement, job_config, location):
+            calls["statement"] = statement
+            calls["params"] = job_config.query_parameters
+            return _Job()
+
+    monkeypatch.setattr(bigquery_repository.bigquery, "Client", _Client)
+    config = MonitoringConfig(project_id="demo-project", region="us-central1")
+
+    assert backfill_fact_metric_columns(config, since=date(2024, 5, 1)) == 12
+    assert "app_vcore_seconds" in calls["added"] and "run_identifier" in calls["added"]
+    statement = calls["statement"]
+    assert (
+        "app_vcore_seconds = IFNULL(app_vcore_seconds, "
+        "SAFE_CAST(JSON_VALUE(job_metrics, '$.app.app_vcore_seconds')"
+    ) in statement
+    assert "WHERE ((app_vcore_seconds IS NULL AND" in statement
+    assert "autoscaling_enabled IS NULL) OR run_identifier IS NULL)" in statement
+    assert "ingest_date >= @since" in statement
+    assert str(calls["params"][0].value) == "2024-05-01"
+
+
+def test_provisioning_creates_partitioned_tables_and_verifies_existing_ones(monkeypatch):
+    tables = {}
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def get_dataset(self, dataset_ref):
+            return dataset_ref
+
+        def get_table(self, table_ref):
+            if table_ref.table_id not in tables:
+                raise NotFound(table_ref.table_id)
+            return tables[table_ref.table_id]
+
+        def create_table(self, table, exists_ok):
+            tables[table.table_id] = table
+            return table
+
+        def update_table(self, table, fields):
+            tables[table.table_id] = table
+
+    monkeypatch.setattr(bigquery_repository.bigquery, "Client", _Client)
+    config = MonitoringConfig(
+        project_id="demo-project",
+        region="us-central1",
+        baseline_rollups=True,
+        provision_tables=True,
+    )
+
+    ensure_performance_table(config)
+    facts, rollups = tables["daily_facts"], tables["baseline_rollups"]
+    assert facts.time_partitioning.field == "ingest_date"
+    assert facts.clustering_fields == ["job_id", "cluster_name"]
+    assert rollups.time_partitioning.field == "rollup_date"
+
+    # An existing table without clustering is clustered in place...
+    unclustered = bigquery.Table(facts.reference, schema=facts.schema)
+    unclustered.time_partitioning = facts.time_partitioning
+    tables["daily_facts"] = unclustered
+    ensure_performance_table(config)
+    assert tables["daily_facts"].clustering_fields == ["job_id", "cluster_name"]
+
+    # ...but one that is not partitioned cannot be fixed without a rebuild.
+    tables["daily_facts"] = bigquery.Table(facts.reference, schema=facts.schema)
+    with pytest.raises(RuntimeError, match="PARTITION BY ingest_date"):
+        ensure_performance_table(config)
+
+
+def test_facts_load_in_chunks_and_only_the_failed_chunk_is_retried(monkeypatch):
+    loaded: dict[str, list[str]] = {}
+    failed: list[str] = []
+    clients: list[object] = []
+
+    class _Job:
+        def __init__(self, job_id, state="DONE", error_result=None):
+            self.job_id, self.state, self.error_result = job_id, state, error_result
+
+        def result(self, timeout=None):
+            if self.job_id.endswith("_1_1"):
+                failed.append(self.job_id)
+                raise ServiceUnavailable("backend error")
+            return self
+
+        def done(self, reload=True):
+            return self.state == "DONE"
+
+    class _Client:
+        def __init__(self, project):
+            clients.append(self)
+
+        def load_table_from_file(self, spool, table_id, job_id, job_config, location):
+            loaded[job_id] = [json.loads(line)["job_id"] for line in spool.read().splitlines()]
+            return _Job(job_id)
+
+        def get_job(self, job_id, location):
+            return _Job(job_id, error_result={"reason": "backendError"})
+
+    monkeypatch.setattr(bigquery_repository.bigquery, "Client", _Client)
+    monkeypatch.setattr(bigquery_repository, "_LOAD_RETRY_BACKOFF_SECONDS", 0.0)
+    config = MonitoringConfig(
+        project_id="demo-project",
+        region="us-central1",
+        fact_load_chunk_rows=3,
+        fact_load_workers=2,
+    )
+    facts = (replace(_fact({}), job_id=f"job-{index}") for index in range(7))
+    report = FactLoadReport()
+
+    assert insert_daily_facts(config, records=facts, report=report) == 7
+    assert [chunk.rows for chunk in report.chunks] == [3, 3, 1]
+    assert [chunk.attempts for chunk in report.chunks] == [1, 2, 1]
+    assert len(failed) == 1
+    # Every chunk and the retry share one client.
+    assert len(clients) == 1
+    # The failed attempt reached the fake table too; real BigQuery discards it.
+    del loaded[failed[0]]
+    assert sorted(job for jobs in loaded.values() for job in jobs) == [
+        f"job-{index}" for index in range(7)
+    ]
+    payload = report.to_payload()
+    assert payload["retries"] == 1 and payload["rows"] == 7
+    assert payload["bytes"] == sum(chunk.bytes for chunk in report.chunks) > 0
+
+
+def test_merge_mode_stages_every_chunk_and_upserts_on_the_run_key(monkeypatch):
+    calls: dict[str, list] = {"created": [], "loaded": [], "deleted": []}
+
+    class _Job:
+        dml_stats = type("DmlStats", (), {"inserted_row_count": 3, "updated_row_count": 1})()
+
+        def result(self, timeout=None):
+            return self
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def create_table(self, table):
+            calls["created"].append(table)
+
+        def load_table_from_file(self, spool, table_id, job_id, job_config, location):
+            calls["loaded"].append(table_id)
+            return _Job()
+
+        def query(self, statement, job_config, location):
+            calls["statement"] = statement
+            calls["params"] = job_config.query_parameters
+            return _Job()
+
+        def delete_table(self, table_id, not_found_ok):
+            calls["deleted"].append(table_id)
+
+    monkeypatch.setattr(bigquery_repository.bigquery, "Client", _Client)
+    config = MonitoringConfig(
+        project_id="demo-project",
+        region="us-central1",
+        fact_load_chunk_rows=2,
+        fact_write_mode="merge",
+    )
+    facts = [
+        replace(_fact({}), job_id=f"job-{index}", run_identifier=f"run-{index}")
+        for index in range(4)
+    ]
+    facts[3].job_start_time = "2024-04-30T23:00:00+00:00"
+    # A retried run within the batch: only the later row is applied.
+    facts.append(replace(facts[0], ingest_timestamp="2024-05-01T01:00:00+00:00"))
+    report = FactLoadReport()
+
+    assert insert_daily_facts(config, records=iter(facts), report=report) == 5
+    staging_id = calls["created"][0].table_id
+    assert "_staging_" in staging_id and calls["created"][0].expires is not None
+    assert len(calls["loaded"]) == 3
+    assert {table_id.split(".")[-1] for table_id in calls["loaded"]} == {staging_id}
+    assert calls["deleted"] == [calls["loaded"][0]]
+    statement = calls["statement"]
+    assert "MERGE `demo-project.dataproc_monitoring.daily_facts` AS target" in statement
+    for column in ("job_id", "run_identifier", "job_start_time"):
+        assert f"target.{column} IS NOT DISTINCT FROM source.{column}" in statement
+    assert "PARTITION BY job_id, run_identifier, job_start_time ORDER BY ingest_timestamp DESC" in statement
+    assert "target.ingest_date >= @earliest_ingest_date" in statement
+    assert str(calls["params"][0].value) == "2024-04-29"
+    assert report.to_payload()["upsert"] == {
+        "staged_rows": 5,
+        "inserted_rows": 3,
+        "replaced_rows": 1,
+        "collapsed_rows": 1,
+    }
+
+
+def test_cluster_configs_are_upserted_on_their_key(monkeypatch):
+    calls = {}
+
+    def merge_rows(config, **kwargs):
+        calls.update(kwargs)
+
+    monkeypatch.setattr(bigquery_repository, "merge_rows", merge_rows)
+    config = MonitoringConfig(project_id="demo-project", region="us-central1")
+    record = ClusterConfigRecord(
+        config_key="cluster-uuid-1",
+        dataproc_cluster_uuid="cluster-uuid-1",
+        ingest_date="2024-05-01",
+        ingest_timestamp="2024-05-01T00:00:00+00:00",
+        cluster_config_details={"config": {}},
+        cluster_profile={"total_workers": 4},
+    )
+
+    insert_cluster_configs(config, records=[record])
+
+    assert calls["table_id"] == "demo-project.dataproc_monitoring.cluster_configs"
+    assert calls["key_columns"] == ("config_key",)
+    assert calls["rows"] == [record.to_json()]
+
+
+def test_a_load_still_running_after_the_timeout_settles_before_any_retry(monkeypatch):
+    jobs: dict[str, dict] = {}
+
+    class _Job:
+        def __init__(self, job_id):
+            self.job_id = job_id
+
+        @property
+        def error_result(self):
+            return {"reason": "stopped"} if jobs[self.job_id]["cancelled"] else None
+
+        def result(self, timeout=None):
+            raise TimeoutError("gave up waiting")
+
+        def done(self, reload=True):
+            # The job finishes on the second poll after the client gave up.
+            jobs[self.job_id]["polls"] += 1
+            return jobs[self.job_id]["polls"] >= 2 or jobs[self.job_id]["cancelled"]
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def load_table_from_file(self, spool, table_id, job_id, job_config, location):
+            jobs[job_id] = {"polls": 0, "cancelled": False}
+            return _Job(job_id)
+
+        def get_job(self, job_id, location):
+            return _Job(job_id)
+
+        def cancel_job(self, job_id, location):
+            jobs[job_id]["cancelled"] = True
+
+    monkeypatch.setattr(bigquery_repository.bigquery, "Client", _Client)
+    monkeypatch.setattr(bigquery_repository, "_LOAD_JOB_POLL_SECONDS", 0.0)
+    config = MonitoringConfig(project_id="demo-project", region="us-central1")
+    report = FactLoadReport()
+
+    assert insert_daily_facts(config, records=[_fact({})], report=report) == 1
+    assert report.chunks[0].attempts == 1
+    assert len(jobs) == 1 and not next(iter(jobs.values()))["cancelled"]
+
+    # A job that outlives the wait is cancelled, then retried once it is DONE.
+    jobs.clear()
+    monkeypatch.setattr(bigquery_repository, "_LOAD_JOB_TIMEOUT", -1.0)
+    monkeypatch.setattr(bigquery_repository, "_LOAD_RETRY_BACKOFF_SECONDS", 0.0)
+    with pytest.raises(RuntimeError, match="gave up waiting"):
+        insert_daily_facts(config, records=[_fact({})])
+    assert len(jobs) == config.fact_load_retries + 1
+    assert all(job["cancelled"] for job in jobs.values())
@@ -0,0 +1,55 @@
+import json
+
+from dataproc_monitoring_agent.analytics.cluster_registry import ClusterConfigRegistry
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+
+
+def _run(index: int, uuid: str | None, workers: int) -> SparkRunState:
+    return SparkRunState.from_row(
+        {
+            "spark_jobid": f"etl_{index:08x}",
+            "dataproc_cluster_uuid": uuid,
+            "cluster_config_details": json.dumps(
+                {"config": {"workerConfig": {"numInstances": workers, "machineTypeUri": "n2"}}}
+            ),
+        }
+    )
+
+
+def test_registry_shares_configs_by_uuid_and_content():
+    registry = ClusterConfigRegistry()
+    runs = [_run(1, "uuid-a", 4), _run(2, "uuid-a", 4), _run(3, None, 8), _run(4, None, 8)]
+
+    entries = [registry.register(run) for run in runs]
+
+    assert len(registry) == 2
+    assert entries[0] is entries[1]
+    assert entries[2] is entries[3]
+    assert entries[0].config_key.startswith("uuid-a/sha1:")
+    assert entries[2].config_key.startswith("sha1:")
+    assert runs[0].cluster_config_details is runs[1].cluster_config_details
+    # The second run on a known cluster never decodes its own copy.
+    assert runs[1].cluster_config_json is None
+    assert entries[0].cluster_profile == {
+        "primary_workers": 4,
+        "total_workers": 4,
+        "primary_machine_type": "n2",
+        "autoscaling_enabled": False,
+    }
+    assert entries[0].run_count == 2
+
+
+def test_registry_keeps_distinct_snapshots_on_one_cluster():
+    registry = ClusterConfigRegistry()
+    runs = [_run(1, "uuid-a", 4), _run(2, "uuid-a", 10), _run(3, "uuid-a", 4)]
+
+    entries = [registry.register(run) for run in runs]
+
+    assert len(registry) == 2
+    assert entries[0] is entries[2]
+    assert entries[1] is not entries[0]
+    assert entries[0].dataproc_cluster_uuid == entries[1].dataproc_cluster_uuid == "uuid-a"
+    assert entries[0].cluster_profile["total_workers"] == 4
+    assert entries[1].cluster_profile["total_workers"] == 10
+    assert runs[1].cluster_config_details["config"]["workerConfig"]["numInstances"] == 10
+    assert runs[2].cluster_config_details is runs[0].cluster_config_details
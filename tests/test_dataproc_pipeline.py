@@ -0,0 +1,186 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+import logging
+import random
+
+from dataproc_monitoring_agent.analytics.cluster_registry import ClusterConfigRegistry
+from dataproc_monitoring_agent.analytics.performance_memory import BaselineStats
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+from dataproc_monitoring_agent.tools import dataproc_pipeline
+
+
+AS_OF = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+
+def _runs(count: int) -> list:
+    rng = random.Random(7)
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    run_states = []
+    for index in range(count):
+        family = f"family_{rng.randrange(12)}"
+        began = start + timedelta(minutes=index)
+        run_states.append(
+            SparkRunState.from_payload(
+                {
+                    "application_start_time": began.isoformat(),
+                    "application_end_time": (began + timedelta(seconds=rng.uniform(30, 900))).isoformat(),
+                    "status": "SUCCEEDED",
+                    "dataproc_cluster_uuid": f"uuid-{index % 3}",
+                    "spark_jobid": f"{family}_{index:08x}",
+                    "application_id": f"application_{index}",
+                    "cluster_config_details": {"config": {"workerConfig": {"numInstances": 2 + index % 3}}},
+                    "spark_event_metrics": {
+                        "app": {
+                            "app_vcore_seconds": rng.uniform(10, 400),
+                            "app_memory_gb_seconds": rng.uniform(10, 900),
+                            "executor_peak": rng.randrange(1, 6),
+                        },
+                        "jobs": [{"job_id": 0, "max_over_median_ratio": rng.uniform(1, 5)}],
+                    },
+                }
+            )
+        )
+    run_states.sort(key=dataproc_pipeline._run_state_sort_key)
+    registry = ClusterConfigRegistry()
+    return [(run_state, replace(registry.register(run_state))) for run_state in run_states]
+
+
+def _baselines() -> dict:
+    return {
+        "family_0": BaselineStats(
+            job_id="family_0",
+            job_type="SPARK",
+            cluster_name="cluster",
+            p50_duration=60.0,
+            p95_duration=120.0,
+            avg_duration=70.0,
+            p50_app_vcore_seconds=50.0,
+            p95_app_vcore_seconds=90.0,
+            avg_app_vcore_seconds=55.0,
+            p50_app_memory_gb_seconds=100.0,
+            p95_app_memory_gb_seconds=200.0,
+            avg_app_memory_gb_seconds=120.0,
+            avg_max_over_median_ratio=1.5,
+            p95_task_duration_ms=None,
+            run_count=20,
+        )
+    }
+
+
+def test_sharded_fact_building_matches_sequential_order_and_flags():
+    runs = _runs(300)
+    sequential = MonitoringConfig(project_id="demo-project", region="us-central1")
+    parallel = replace(sequential, fact_build_workers=3, fact_build_parallel_min_runs=1)
+
+    expected = dataproc_pipeline._build_facts(
+        sequential, as_of=AS_OF, runs=runs, baselines=_baselines()
+    )
+    actual = dataproc_pipeline._build_facts(
+        parallel, as_of=AS_OF, runs=runs, baselines=_baselines()
+    )
+
+    assert [fact.to_json() for fact in actual] == [fact.to_json() for fact in expected]
+    assert any(fact.anomaly_flags["has_issues"] for fact in expected)
+
+
+def test_unpicklable_pool_work_falls_back_in_process(monkeypatch, caplog):
+    runs = _runs(60)
+    sequential = MonitoringConfig(project_id="demo-project", region="us-central1")
+    parallel = replace(sequential, fact_build_workers=2, fact_build_parallel_min_runs=1)
+    expected = dataproc_pipeline._build_facts(
+        sequential, as_of=AS_OF, runs=runs, baselines=_baselines()
+    )
+    # A lambda cannot be pickled by reference, so submitting it must fail.
+    monkeypatch.setattr(
+        dataproc_pipeline, "_build_pooled_fact_shard", lambda *args: []
+    )
+
+    with caplog.at_level(logging.WARNING):
+        actual = dataproc_pipeline._build_facts(
+            parallel, as_of=AS_OF, runs=runs, baselines=_baselines()
+        )
+
+    assert [fact.to_json() for fact in actual] == [fact.to_json() for fact in expected]
+    assert "building 60 runs in-process" in caplog.text
+
+
+def test_pool_workers_are_never_forked_from_the_threaded_parent():
+    assert dataproc_pipeline._pool_context().get_start_method() in {"forkserver", "spawn"}
+
+
+def test_shards_are_family_disjoint_and_ordered():
+    runs = _runs(120)
+    shards = dataproc_pipeline._shard_by_family(runs, 4)
+
+    assert len(shards) == 4
+    assert sorted(position for positions, _ in shards for position in positions) == list(range(120))
+    for positions, families in shards:
+        assert positions == sorted(positions)
+        assert {runs[position][0].primary_job_id for position in positions} == families
+    assert not set.intersection(*(families for _, families in shards))
+
+
+class _ToolContext:
+    def __init__(self) -> None:
+        self.state: dict = {}
+
+
+def _run_cycle(monkeypatch, tmp_path, run_states: list, *, streaming: bool) -> tuple:
+    for name, value in {
+        "DATAPROC_PROJECT_ID": "demo-project",
+        "DATAPROC_REGION": "us-central1",
+        "DATAPROC_STATE_DIR": str(tmp_path),
+        "DATAPROC_STREAMING": "true" if streaming else "false",
+        "DATAPROC_STREAM_CHUNK_ROWS": "7",
+    }.items():
+        monkeypatch.setenv(name, value)
+    loaded: list = []
+
+    def insert_daily_facts(config, *, records, report=None):
+        loaded.extend(fact.to_json() for fact in records)
+        return len(loaded)
+
+    ordered = sorted(run_states, key=dataproc_pipeline._run_state_sort_key)
+    monkeypatch.setattr(dataproc_pipeline, "utc_now", lambda: AS_OF)
+    monkeypatch.setattr(dataproc_pipeline, "ensure_performance_table", lambda config: None)
+    monkeypatch.setattr(dataproc_pipeline, "load_baselines", lambda config, **kwargs: _baselines())
+    monkeypatch.setattr(dataproc_pipeline, "insert_daily_facts", insert_daily_facts)
+    monkeypatch.setattr(
+        dataproc_pipeline, "fetch_run_state_records", lambda config, **kwargs: ordered[::-1]
+    )
+    monkeypatch.setattr(
+        dataproc_pipeline, "iter_run_state_records", lambda config, **kwargs: iter(ordered)
+    )
+
+    context = _ToolContext()
+    dataproc_pipeline.ingest_dataproc_signals(horizons=["6h", "1d"], tool_context=context)
+    result = dataproc_pipeline.build_performance_memory(tool_context=context)
+    report = dataproc_pipeline.generate_dataproc_report(tool_context=context)["report"]
+    return loaded, result, report
+
+
+def test_streaming_cycle_matches_materialised_cycle(monkeypatch, tmp_path):
+    run_states = [run_state for run_state, _ in _runs(60)]
+    # A re-snapshot of a run shares its start time and identity.
+    retry = run_states[10].to_payload()
+    retry["application_end_time"] = "2024-05-01T23:59:00+00:00"
+    run_states.append(SparkRunState.from_payload(retry))
+    # A Composer retry is a new application of the same job run, started later.
+    composer_retry = run_states[20].to_payload()
+    composer_retry["application_id"] = "application_retry"
+    composer_retry["application_start_time"] = "2024-05-01T00:23:30+00:00"
+    composer_retry["application_end_time"] = "2024-05-01T23:58:00+00:00"
+    run_states.append(SparkRunState.from_payload(composer_retry))
+
+    expected_rows, expected, expected_report = _run_cycle(
+        monkeypatch, tmp_path / "materialised", run_states, streaming=False
+    )
+    rows, result, report = _run_cycle(monkeypatch, tmp_path / "streaming", run_states, streaming=True)
+
+    assert rows == expected_rows
+    assert report == expected_report
+    assert result["deduplicated_rows"] == expected["deduplicated_rows"] == 2
+    assert result["horizons"] == expected["horizons"]
+    assert result["persisted_rows"] == len(expected_rows) == 60
+    assert result["streaming"]["ingested_runs"] == 62
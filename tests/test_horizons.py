@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from dataproc_monitoring_agent.analytics.horizons import (
+    horizon_label,
+    parse_horizons,
+    slice_by_horizon,
+)
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+
+
+def test_parse_horizons_normalises_units():
+    assert parse_horizons(["7d", "1h", 24, "24h", "1w"]) == (1, 24, 168)
+    assert [horizon_label(hours) for hours in (1, 24, 168, 36)] == ["1h", "1d", "7d", "36h"]
+    with pytest.raises(ValueError):
+        parse_horizons(["0h"])
+
+
+def test_slice_by_horizon_matches_window_predicate():
+    window_end = datetime(2024, 5, 8, 12, tzinfo=timezone.utc)
+    runs = [
+        SparkRunState.from_payload({"spark_jobid": "a", "application_start_time": "2024-05-08T11:30:00+00:00"}),
+        SparkRunState.from_payload({"spark_jobid": "b", "application_start_time": "2024-05-07T13:00:00+00:00"}),
+        SparkRunState.from_payload({"spark_jobid": "c", "application_start_time": "2024-05-02T00:00:00+00:00"}),
+        SparkRunState.from_payload({"spark_jobid": "d", "run_date": "2024-05-08"}),
+    ]
+
+    assert slice_by_horizon(runs, window_end=window_end, horizons=(1, 24, 168)) == {
+        "1h": [0, 3],
+        "1d": [0, 1, 3],
+        "7d": [0, 1, 2, 3],
+    }
@@ -0,0 +1,164 @@
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from dataproc_monitoring_agent.analytics import performance_memory
+from dataproc_monitoring_agent.analytics.performance_memory import (
+    BaselineLoader,
+    BaselineStats,
+    load_baselines,
+    plan_baseline_query,
+    segment_values,
+)
+from dataproc_monitoring_agent.config.settings import MonitoringConfig
+
+
+CONFIG = MonitoringConfig(project_id="demo-project", region="us-central1")
+AS_OF = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+
+def _baseline(job_id: str) -> BaselineStats:
+    return BaselineStats(
+        job_id=job_id,
+        job_type="SPARK",
+        cluster_name="cluster",
+        p50_duration=60.0,
+        p95_duration=120.0,
+        avg_duration=70.0,
+        p50_app_vcore_seconds=None,
+        p95_app_vcore_seconds=None,
+        avg_app_vcore_seconds=None,
+        p50_app_memory_gb_seconds=None,
+        p95_app_memory_gb_seconds=None,
+        avg_app_memory_gb_seconds=None,
+        avg_max_over_median_ratio=None,
+        p95_task_duration_ms=None,
+        run_count=10,
+    )
+
+
+def test_loader_batches_misses_and_remembers_families_without_history():
+    requested: list[set] = []
+
+    def load(config, *, as_of, trailing_window, job_families):
+        requested.append(set(job_families))
+        return {family: _baseline(family) for family in job_families if family != "new_job"}
+
+    loader = BaselineLoader(CONFIG, as_of=AS_OF, trailing_window=timedelta(days=7), load=load)
+    loader.prefetch(["ingest", "new_job", "ingest", ""])
+    loader.prefetch(["ingest", "new_job", "export"])
+
+    assert requested == [{"ingest", "new_job"}, {"export"}]
+    assert loader["ingest"].job_id == "ingest"
+    assert loader.get("new_job") is None and "new_job" not in loader
+
+    assert loader.get("adhoc").job_id == "adhoc"
+    assert requested[-1] == {"adhoc"}
+    loader["new_job"] = _baseline("new_job")
+    assert "new_job" in loader
+    assert loader.query_count == 3
+    assert loader.loaded_families == 4
+
+
+def test_empty_family_filter_skips_the_query():
+    assert load_baselines(
+        CONFIG, as_of=AS_OF, trailing_window=timedelta(days=7), job_families=[""]
+    ) == {}
+
+
+def test_planner_computes_each_quantile_array_once_in_one_grouping_sets_scan():
+    query = plan_baseline_query(
+        "demo-project.dataproc_monitoring.daily_facts",
+        dimension_sets=[("cluster",), ("machine_type", "autoscaling")],
+    )
+
+    assert query.count("APPROX_QUANTILES(duration_seconds, 20)") == 1
+    assert query.count("APPROX_QUANTILES(") == 5
+    assert query.count("FROM `demo-project") == 1
+    # Metrics and dimensions come from typed columns, not the JSON payloads.
+    assert "JSON_VALUE" not in query and "job_metrics" not in query
+    assert "ingest_date BETWEEN DATE(@window_start) AND DATE(@as_of)" in query
+    assert (
+        "GROUPING SETS ((logical_job_id), (logical_job_id, dim_cluster), "
+        "(logical_job_id, dim_machine_type, dim_autoscaling))"
+    ) in query
+    assert "GROUPING SETS" not in plan_baseline_query("demo-project.d.t")
+    with pytest.raises(ValueError, match="region"):
+        plan_baseline_query("demo-project.d.t", dimension_sets=[("region",)])
+
+
+class _Row(dict):
+    __getattr__ = dict.__getitem__
+
+
+def _stats_row(run_count: int, p50: float, **dimensions) -> _Row:
+    row = _Row.fromkeys(BaselineStats.__dataclass_fields__)
+    row.update(job_id="ingest", job_type="SPARK", cluster_name="etl-a")
+    row.update(p50_duration=p50, run_count=run_count)
+    for name in ("cluster", "machine_type", "autoscaling"):
+        row[f"dim_{name}"] = dimensions.get(name)
+        row[f"grouped_{name}"] = 0 if name in dimensions else 1
+    return row
+
+
+def test_segments_are_attached_and_the_most_specific_one_is_chosen(monkeypatch):
+    rows = [
+        _stats_row(40, 100.0),
+        _stats_row(30, 80.0, cluster="etl-a"),
+        _stats_row(3, 10.0, cluster="etl-b"),
+        _stats_row(12, 60.0, machine_type="n2-standard-8", autoscaling="true"),
+        _stats_row(5, 1.0, machine_type=None, autoscaling="false"),
+    ]
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def query(self, query, job_config):
+            assert "GROUPING SETS" in query
+            return type("Job", (), {"result": lambda self: rows})()
+
+    monkeypatch.setattr(performance_memory.bigquery, "Client", _Client)
+    config = replace(CONFIG, baseline_dimensions=("cluster", "machine_type+autoscaling"))
+    baseline = load_baselines(config, as_of=AS_OF, trailing_window=timedelta(days=7))["ingest"]
+
+    assert baseline.p50_duration == 100.0
+    assert set(baseline.segments) == {
+        "cluster=etl-a",
+        "cluster=etl-b",
+        "machine_type=n2-standard-8|autoscaling=true",
+    }
+    shape = {"primary_machine_type": "n2-standard-8", "autoscaling_enabled": True}
+    assert baseline.for_segment(segment_values("etl-a", shape)).p50_duration == 60.0
+    assert baseline.for_segment(segment_values("etl-a", {})).p50_duration == 80.0
+    # Too few runs on etl-b: the family baseline is used.
+    assert baseline.for_segment(segment_values("etl-b", {})) is baseline
+    assert BaselineStats.from_payload(asdict(baseline)) == baseline
+
+
+def test_a_dry_run_reads_columns_an_unupgraded_table_lacks_as_null(monkeypatch):
+    queries = []
+
+    class _Client:
+        def __init__(self, project):
+            pass
+
+        def get_table(self, table_id):
+            schema = [
+                performance_memory.bigquery.SchemaField(name, "STRING")
+                for name in ("ingest_date", "job_id", "cluster_name", "duration_seconds")
+            ]
+            return performance_memory.bigquery.Table(table_id, schema=schema)
+
+        def query(self, query, job_config):
+            queries.append(query)
+            return type("Job", (), {"result": lambda self: []})()
+
+    monkeypatch.setattr(performance_memory.bigquery, "Client", _Client)
+    config = replace(CONFIG, dry_run=True, baseline_dimensions=("machine_type",))
+
+    assert load_baselines(config, as_of=AS_OF, trailing_window=timedelta(days=7)) == {}
+    assert "CAST(NULL AS FLOAT64) AS input_bytes" in queries[0]
+    assert "CAST(NULL AS STRING) AS primary_machine_type" in queries[0]
+    assert "CAST(NULL" not in plan_baseline_query("demo-project.d.t")
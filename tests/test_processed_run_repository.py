@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+
+from dataproc_monitoring_agent.config.settings import load_config
+from dataproc_monitoring_agent.repositories import processed_run_repository
+from dataproc_monitoring_agent.repositories.processed_run_repository import (
+    load_processed_run_index,
+)
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+
+
+def _run(job_id: str, start: str, end: str | None = "2024-05-01T04:00:00+00:00") -> SparkRunState:
+    return SparkRunState.from_payload(
+        {"spark_jobid": job_id, "application_start_time": start, "application_end_time": end}
+    )
+
+
+def test_processed_run_index_seeds_persists_and_expires(tmp_path, monkeypatch):
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "skip_processed_runs": True,
+            "state_dir": str(tmp_path),
+        }
+    )
+    as_of = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    seeded = _run("load_aaaaaa01", "2024-05-01T01:00:00.250000+00:00")
+    retried = _run("load_aaaaaa01", "2024-05-01T03:00:00+00:00")
+    fresh = _run("load_aaaaaa02", "2024-05-01T02:00:00+00:00")
+
+    monkeypatch.setattr(
+        processed_run_repository,
+        "_seed_from_facts",
+        lambda config, *, as_of: {
+            processed_run_repository._digest(
+                processed_run_repository._run_key(
+                    "load_aaaaaa01",
+                    datetime(2024, 5, 1, 1, tzinfo=timezone.utc).timestamp(),
+                    datetime(2024, 5, 1, 4, tzinfo=timezone.utc).timestamp(),
+                    terminal=True,
+                )
+            ): int(as_of.timestamp())
+        },
+    )
+    index = load_processed_run_index(config, as_of=as_of)
+    assert seeded in index
+    assert retried not in index
+    assert fresh not in index
+
+    index.add([fresh], as_of=as_of + timedelta(days=6))
+    index.save(as_of=as_of + timedelta(days=6), retention=timedelta(days=3))
+    assert not list(tmp_path.rglob("*.tmp"))
+
+    monkeypatch.setattr(processed_run_repository, "_seed_from_facts", None)
+    reloaded = load_processed_run_index(config, as_of=as_of)
+    assert fresh in reloaded
+    assert seeded not in reloaded
+    assert len(reloaded) == 1
+
+
+def test_a_run_persisted_in_flight_is_not_skipped_once_it_completes(tmp_path, monkeypatch):
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "skip_processed_runs": True,
+            "state_dir": str(tmp_path),
+        }
+    )
+    as_of = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    running = _run("load_aaaaaa01", "2024-05-01T01:00:00+00:00", end=None)
+    done = _run("load_aaaaaa01", "2024-05-01T01:00:00+00:00")
+    monkeypatch.setattr(processed_run_repository, "_seed_from_facts", lambda config, *, as_of: {})
+
+    index = load_processed_run_index(config, as_of=as_of)
+    index.add([running], as_of=as_of)
+
+    assert running in index
+    assert done not in index
+    index.add([done], as_of=as_of)
+    assert done in index
@@ -0,0 +1,100 @@
+import bisect
+import random
+
+import pytest
+
+from dataproc_monitoring_agent.analytics.local_baseline import LocalBaselineAccumulator
+from dataproc_monitoring_agent.analytics.quantile_sketch import (
+    RANK_ERROR_BOUND,
+    QuantileSketch,
+)
+
+PERCENTILES = [index / 100 for index in range(1, 100)]
+
+
+def _exact_quantile(sorted_values, percentile):
+    position = (len(sorted_values) - 1) * percentile
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _worst_rank_error(sketch, values):
+    exact = sorted(values)
+    worst = 0.0
+    for percentile in PERCENTILES:
+        estimate = sketch.quantile(percentile)
+        low = bisect.bisect_left(exact, estimate)
+        high = bisect.bisect_right(exact, estimate)
+        target = percentile * (len(exact) - 1)
+        if not low <= target <= high:
+            worst = max(worst, min(abs(low - target), abs(high - target)) / len(exact))
+    return worst
+
+
+def test_sketch_is_exact_up_to_k():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(0, 2) for _ in range(200)]
+    sketch = QuantileSketch()
+    sketch.update(values)
+
+    assert sketch.is_exact
+    exact = sorted(values)
+    for percentile in (0.0, 0.5, 0.95, 1.0):
+        assert sketch.quantile(percentile) == _exact_quantile(exact, percentile)
+
+
+@pytest.mark.parametrize("shape", ["uniform", "lognormal", "ascending", "descending"])
+def test_sketch_rank_error_within_documented_bound(shape):
+    rng = random.Random(11)
+    if shape == "lognormal":
+        values = [rng.lognormvariate(0, 2) for _ in range(50_000)]
+    else:
+        values = [rng.random() for _ in range(50_000)]
+    if shape == "ascending":
+        values.sort()
+    elif shape == "descending":
+        values.sort(reverse=True)
+
+    sketch = QuantileSketch()
+    sketch.update(values)
+
+    assert not sketch.is_exact
+    assert sketch.count == len(values)
+    assert sum(len(items) for items in sketch.to_dict()["levels"]) < 1_000
+    assert _worst_rank_error(sketch, values) <= RANK_ERROR_BOUND
+
+
+def test_merged_and_restored_sketches_stay_within_bound():
+    rng = random.Random(5)
+    values = [rng.expovariate(0.01) for _ in range(40_000)]
+    parts = [QuantileSketch() for _ in range(4)]
+    for index, value in enumerate(values):
+        parts[index % 4].add(value)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(QuantileSketch.from_dict(part.to_dict()))
+
+    assert merged.count == len(values)
+    assert _worst_rank_error(merged, values) <= RANK_ERROR_BOUND
+
+
+def test_local_baseline_matches_exact_statistics_for_small_families():
+    samples = [
+        {"duration": 100.0 + index, "vcores": 10.0 * index, "memory": None, "ratio": 1.5, "job_type": "SPARK"}
+        for index in range(9)
+    ] + [{"duration": None, "vcores": None, "memory": 4.0, "p95_task_duration_ms": 250.0, "job_type": "PYSPARK"}]
+    accumulator = LocalBaselineAccumulator("daily_load")
+    for sample in samples:
+        accumulator.add(sample)
+
+    baseline = accumulator.to_baseline("cluster-a")
+    durations = sorted(100.0 + index for index in range(9))
+    assert baseline.run_count == 10
+    assert baseline.job_type == "PYSPARK"
+    assert baseline.p50_duration == _exact_quantile(durations, 0.5)
+    assert baseline.p95_duration == _exact_quantile(durations, 0.95)
+    assert baseline.avg_duration == sum(durations) / len(durations)
+    assert baseline.avg_app_memory_gb_seconds == 4.0
+    assert baseline.avg_max_over_median_ratio == 1.5
+    assert baseline.p95_task_duration_ms == 250.0
@@ -0,0 +1,152 @@
+from dataproc_monitoring_agent.analytics.run_deduplication import (
+    DeduplicationCounts,
+    deduplicate_run_states,
+    iter_deduplicated_run_states,
+)
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+
+
+def _snapshot(end: str | None, metrics: dict, status: str | None = "SUCCEEDED") -> SparkRunState:
+    return SparkRunState.from_payload(
+        {
+            "application_id": "application_1",
+            "spark_jobid": "ingest_a1b2c3d4",
+            "application_start_time": "2024-05-01T00:00:00+00:00",
+            "application_end_time": end,
+            "status": status,
+            "spark_event_metrics": metrics,
+        }
+    )
+
+
+def test_policies_pick_expected_snapshot():
+    complete = _snapshot("2024-05-01T01:00:00+00:00", {"app": {"executor_peak": 2}, "jobs": [{}]})
+    resnapshot = _snapshot("2024-05-01T01:05:00+00:00", {})
+    other = SparkRunState.from_payload({"application_id": "application_2"})
+
+    latest = deduplicate_run_states([complete, other, resnapshot], policy="latest")
+    richest = deduplicate_run_states([complete, other, resnapshot], policy="complete")
+    untouched = deduplicate_run_states([complete, other, resnapshot], policy="off")
+
+    assert latest.run_states == [resnapshot, other]
+    assert latest.collapsed_rows == 1
+    assert latest.duplicated_runs == 1
+    assert richest.run_states == [complete, other]
+    assert untouched.collapsed_rows == 0
+    assert len(untouched.run_states) == 3
+
+
+def test_composer_retries_of_one_job_run_are_collapsed():
+    first = SparkRunState.from_payload(
+        {
+            "application_id": "application_1",
+            "spark_jobid": "ingest_a1b2c3d4",
+            "spark_taskid": "ingest_task",
+            "application_start_time": "2024-05-01T00:00:00+00:00",
+            "application_end_time": "2024-05-01T00:05:00+00:00",
+            "status": "FAILED",
+        }
+    )
+    retry = SparkRunState.from_payload(
+        {
+            "application_id": "application_2",
+            "spark_jobid": "ingest_a1b2c3d4",
+            "spark_taskid": "ingest_task",
+            "application_start_time": "2024-05-01T00:10:00+00:00",
+            "application_end_time": "2024-05-01T00:40:00+00:00",
+            "status": "SUCCEEDED",
+        }
+    )
+    unrelated = SparkRunState.from_payload({"application_id": "application_3"})
+
+    result = deduplicate_run_states([first, unrelated, retry])
+
+    assert result.run_states == [retry, unrelated]
+    assert result.collapsed_rows == 1 and result.duplicated_runs == 1
+
+
+def _stream_sort_key(run_state):
+    primary = run_state.application_start_time or run_state.application_end_time or ""
+    return (primary, run_state.application_end_time or "", run_state.run_identifier)
+
+
+def test_streaming_matches_batch_for_snapshots_that_disagree_on_the_start_time():
+    # Snapshots of one run before and after its start time was recorded.
+    early = SparkRunState.from_payload(
+        {
+            "application_id": "application_1",
+            "spark_jobid": "ingest_a1b2c3d4",
+            "application_end_time": "2024-05-01T00:30:00+00:00",
+            "status": "RUNNING",
+        }
+    )
+    complete = _snapshot("2024-05-01T01:00:00+00:00", {"app": {"executor_peak": 2}})
+    other = SparkRunState.from_payload(
+        {
+            "application_id": "application_2",
+            "application_start_time": "2024-05-01T00:00:00+00:00",
+            "application_end_time": "2024-05-01T00:10:00+00:00",
+        }
+    )
+    runs = [complete, other, early]
+
+    for policy in ("latest", "complete", "off"):
+        batch = deduplicate_run_states(runs, policy=policy)
+        counts = DeduplicationCounts()
+        streamed = list(
+            iter_deduplicated_run_states(
+                sorted(runs, key=_stream_sort_key),
+                policy=policy,
+                sort_key=_stream_sort_key,
+                counts=counts,
+            )
+        )
+
+        assert streamed == sorted(batch.run_states, key=_stream_sort_key)
+        assert counts.collapsed_rows == batch.collapsed_rows
+        assert counts.duplicated_runs == batch.duplicated_runs
+    assert early not in deduplicate_run_states(runs).run_states
+
+
+def test_streaming_collapses_retries_while_their_run_is_open():
+    def attempt(job: str, application: str, start_minute: int, status: str) -> SparkRunState:
+        return SparkRunState.from_payload(
+            {
+                "application_id": application,
+                "spark_jobid": job,
+                "application_start_time": f"2024-05-01T00:{start_minute:02d}:00+00:00",
+                "application_end_time": f"2024-05-01T00:{start_minute + 1:02d}:00+00:00",
+                "status": status,
+            }
+        )
+
+    runs = [
+        attempt("ingest_a1b2c3d4", "application_1", 0, "FAILED"),
+        attempt("export_00000001", "application_2", 10, "SUCCEEDED"),
+        attempt("export_00000002", "application_3", 20, "SUCCEEDED"),
+        attempt("ingest_a1b2c3d4", "application_4", 30, "SUCCEEDED"),
+        attempt("export_00000003", "application_5", 40, "SUCCEEDED"),
+        attempt("export_00000001", "application_6", 50, "SUCCEEDED"),
+    ]
+    batch = deduplicate_run_states(runs)
+
+    counts = DeduplicationCounts()
+    streamed = list(
+        iter_deduplicated_run_states(
+            runs, sort_key=_stream_sort_key, counts=counts, max_open_runs=4
+        )
+    )
+    assert streamed == sorted(batch.run_states, key=_stream_sort_key)
+    assert (counts.collapsed_rows, counts.duplicated_runs) == (2, 2)
+
+    # With one open run, each retry's run has been yielded already: the
+    # retries are dropped and counted rather than replacing it.
+    counts = DeduplicationCounts()
+    narrow = list(
+        iter_deduplicated_run_states(
+            runs, sort_key=_stream_sort_key, counts=counts, max_open_runs=1
+        )
+    )
+    assert narrow[0] is runs[0]
+    assert len(narrow) == len(batch.run_states)
+    assert (counts.collapsed_rows, counts.duplicated_runs) == (2, 2)
@@ -0,0 +1,130 @@
+from datetime import date, datetime, timedelta, timezone
+import json
+import logging
+import sys
+from unittest import mock
+
+import pytest
+
+from dataproc_monitoring_agent.config.settings import load_config
+from dataproc_monitoring_agent.repositories import run_state_cache, run_state_repository
+from dataproc_monitoring_agent.repositories.run_state_cache import (
+    RunStateResultCache,
+    SourceTableState,
+)
+
+
+WINDOW_END = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+WINDOW_START = WINDOW_END - timedelta(hours=12)
+
+
+def _columns(*starts: datetime | None) -> dict:
+    return {
+        "run_date": [date(2024, 5, 1)] * len(starts),
+        "application_start_time": list(starts),
+        "application_end_time": [None] * len(starts),
+        "spark_jobid": [f"load_{index:08x}" for index in range(len(starts))],
+        "cluster_config_details": [{"config": {}}] * len(starts),
+        "spark_event_metrics": [json.dumps({"app": {"executor_peak": index}}) for index in range(len(starts))],
+    }
+
+
+def _key(**overrides) -> dict:
+    key = {
+        "table": "proj.ds.cag_run_state",
+        "variant": "full",
+        "start_time": WINDOW_START,
+        "end_time": WINDOW_END,
+        "completed_after": None,
+    }
+    key.update(overrides)
+    return key
+
+
+def test_cache_serves_covered_windows_until_table_changes(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = RunStateResultCache(tmp_path, max_bytes=10 * 1024 * 1024)
+    state = SourceTableState(modified=(WINDOW_END - timedelta(minutes=5)).isoformat(), streaming=False)
+    cache.store(
+        **_key(),
+        table_state=state,
+        columns=_columns(WINDOW_START + timedelta(hours=1), WINDOW_END - timedelta(hours=1), None),
+    )
+
+    # A re-run minutes later covers the same rows: nothing was written since.
+    later = cache.lookup(
+        **_key(start_time=WINDOW_START + timedelta(hours=2), end_time=WINDOW_END + timedelta(minutes=3)),
+        table_state=state,
+    )
+    assert later["spark_jobid"] == ["load_00000001", "load_00000002"]
+    assert later["application_start_time"][0] == WINDOW_END - timedelta(hours=1)
+    assert json.loads(later["cluster_config_details"][0]) == {"config": {}}
+
+    assert cache.lookup(**_key(start_time=WINDOW_START - timedelta(hours=1)), table_state=state) is None
+    assert cache.lookup(**_key(variant="projected:abc"), table_state=state) is None
+    assert cache.lookup(**_key(), table_state=SourceTableState(state.modified, streaming=True)) is None
+
+    modified = SourceTableState(modified=WINDOW_END.isoformat(), streaming=False)
+    assert cache.lookup(**_key(), table_state=modified) is None
+    assert cache.lookup(**_key(), table_state=state) is None
+    assert list(tmp_path.glob("*.arrow")) == []
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = RunStateResultCache(tmp_path, max_bytes=1)
+    state = SourceTableState(modified=WINDOW_START.isoformat(), streaming=False)
+    cache.store(**_key(), table_state=state, columns=_columns(WINDOW_END))
+    cache.store(**_key(variant="other"), table_state=state, columns=_columns(WINDOW_END))
+
+    assert cache.lookup(**_key(), table_state=state) is None
+    assert len(list(tmp_path.glob("*.arrow"))) <= 1
+
+
+def test_fetch_run_state_records_reuses_cached_result(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "run_state_cache": True,
+            "state_dir": str(tmp_path),
+        }
+    )
+    columns = _columns(WINDOW_START + timedelta(hours=3), WINDOW_START + timedelta(hours=1))
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    run_query = mock.Mock(return_value=(None, rows))
+    table = mock.Mock(modified=WINDOW_START + timedelta(hours=4), streaming_buffer=None)
+    client = mock.Mock(**{"get_table.return_value": table})
+    monkeypatch.setattr(run_state_repository.bigquery, "Client", mock.Mock(return_value=client))
+    monkeypatch.setattr(run_state_repository, "_run_run_state_query", run_query)
+
+    first = run_state_repository.fetch_run_state_records(
+        config, start_time=WINDOW_START, end_time=WINDOW_END
+    )
+    second = run_state_repository.fetch_run_state_records(
+        config, start_time=WINDOW_START, end_time=WINDOW_END + timedelta(minutes=2)
+    )
+
+    assert run_query.call_count == 1
+    assert [run.to_payload() for run in second] == [run.to_payload() for run in first]
+
+
+def test_an_enabled_cache_without_pyarrow_warns_once(tmp_path, monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setattr(run_state_cache, "_warned_missing_pyarrow", False)
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "run_state_cache": True,
+            "state_dir": str(tmp_path),
+        }
+    )
+
+    with caplog.at_level(logging.WARNING):
+        assert run_state_cache.open_result_cache(config) is None
+        assert run_state_cache.open_result_cache(config) is None
+
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert "needs pyarrow" in caplog.text
@@ -0,0 +1,212 @@
+from datetime import date, datetime, timezone
+import json
+import logging
+import sys
+
+import pytest
+
+from dataproc_monitoring_agent.repositories import run_state_repository
+from dataproc_monitoring_agent.repositories.run_state_projection import SPARK_METRIC_PROJECTION
+from dataproc_monitoring_agent.repositories.run_state_repository import (
+    RunStateBatch,
+    SparkRunState,
+)
+
+
+def _row(index: int) -> dict:
+    return {
+        "run_date": date(2024, 5, 1),
+        "application_start_time": datetime(2024, 5, 1, 1, index, tzinfo=timezone.utc),
+        "application_end_time": datetime(2024, 5, 1, 2, index, tzinfo=timezone.utc),
+        "status": "SUCCEEDED",
+        "dataproc_jobid": f"cluster-{index % 2}",
+        "dataproc_cluster_uuid": f"uuid-{index % 2}",
+        "spark_taskid": f"task_{index:08x}",
+        "spark_jobid": f"daily_load_{index:08x}",
+        "cluster_config_details": json.dumps({"config": {"workerConfig": {"numInstances": 4}}}),
+        "log_location": None,
+        "application_id": f"application_{index}",
+        "spark_event_metrics": json.dumps({"app": {"app_vcore_seconds": 10.0 * index}}),
+    }
+
+
+def test_batch_payloads_match_row_conversion():
+    rows = [_row(index) for index in range(3)]
+
+    batch = RunStateBatch.from_rows(rows)
+
+    assert len(batch) == 3
+    assert list(batch.iter_payloads()) == [
+        SparkRunState.from_row(row).to_payload() for row in rows
+    ]
+    assert batch.distinct("dataproc_jobid") == {"cluster-0", "cluster-1"}
+
+
+def test_batch_from_arrow_record_batches():
+    pyarrow = pytest.importorskip("pyarrow")
+    rows = [_row(index) for index in range(4)]
+    table = pyarrow.Table.from_pylist(rows)
+
+    batch = RunStateBatch.from_record_batches(table.to_batches(max_chunksize=3), stream_count=2)
+
+    assert batch.read_mode == "storage"
+    assert list(batch.iter_payloads()) == list(RunStateBatch.from_rows(rows).iter_payloads())
+
+
+def test_projection_reassembles_needed_metric_slices():
+    metrics = {
+        "app": {"app_vcore_seconds": 12.5, "executor_peak": 4},
+        "jobs": [{"job_id": 7, "job_name": "load", "max_over_median_ratio": 3.5, "tasks": [1, 2]}],
+        "stages": [{"stageId": 3, "name": "scan", "maxTaskDurationMs": 900, "accumulables": []}],
+    }
+    # Shape of a projected row when the source columns are JSON text.
+    row = {
+        "spark_app_metrics": json.dumps(metrics["app"]),
+        "spark_jobs": [
+            {"job_id": "7", "job_name": "load", "max_over_median_ratio": "3.5", "num_tasks": None}
+        ],
+        "spark_stages": [{"stageId": "3", "name": "scan", "maxTaskDurationMs": "900"}],
+        "cluster_worker_config": '{"numInstances": 4}',
+        "cluster_secondary_worker_config": None,
+        "cluster_autoscaling_config": None,
+    }
+
+    cluster_details, projected = SPARK_METRIC_PROJECTION.assemble(row)
+
+    assert cluster_details == {"config": {"workerConfig": {"numInstances": 4}}}
+    assert projected == {
+        "app": metrics["app"],
+        "jobs": [{"job_id": 7, "job_name": "load", "max_over_median_ratio": 3.5}],
+        "stages": [{"stageId": 3, "name": "scan", "maxTaskDurationMs": 900}],
+    }
+    assert "JSON_QUERY_ARRAY(spark_event_metrics, '$.stages')" in "\n".join(
+        SPARK_METRIC_PROJECTION.select_expressions()
+    )
+
+
+def test_run_state_derives_fields_once_and_decodes_json_lazily():
+    row = _row(5)
+    row["spark_event_metrics"] = json.dumps(
+        {"app": {"appVcoreSeconds": 42.0, "app_memory_gb_seconds": 7.0, "executorPeak": 3}}
+    )
+
+    run_state = SparkRunState.from_row(row)
+
+    assert run_state.spark_event_metrics_json == row["spark_event_metrics"]
+    assert run_state.job_family == "daily_load"
+    assert run_state.primary_job_id == "daily_load"
+    assert run_state.run_identifier == "daily_load_00000005"
+    assert run_state.duration_seconds == 3600.0
+    assert run_state.end_epoch - run_state.start_epoch == 3600.0
+    assert run_state.cost_summary == {
+        "app_vcore_seconds": 42.0,
+        "app_memory_gb_seconds": 7.0,
+        "executor_peak": 3,
+    }
+    assert run_state.spark_event_metrics_json is None
+    assert run_state.cost_summary is run_state.cost_summary
+
+
+def test_decoding_json_does_not_change_run_state_equality():
+    row = _row(3)
+    row["spark_event_metrics"] = json.dumps(
+        {"app": {"app_vcore_seconds": 5.0}, "stages": [{"inputBytes": 10}, {"input_bytes": 5}]}
+    )
+    first, second = SparkRunState.from_row(row), SparkRunState.from_row(row)
+    assert first == second
+
+    assert first.spark_event_metrics and first.cluster_config_details
+    assert first.input_bytes == 15.0
+    assert first == second and first in [second]
+    # Stages are walked once; later reads come from the memoised value.
+    first.spark_event_metrics["stages"].clear()
+    assert first.input_bytes == 15.0
+
+
+def test_sharded_fetch_merges_shards_newest_first(monkeypatch):
+    from datetime import timedelta
+    from unittest import mock
+
+    from dataproc_monitoring_agent.config.settings import load_config
+    from dataproc_monitoring_agent.repositories import run_state_repository
+
+    config = load_config(
+        {"project_id": "demo-project", "region": "us-central1", "run_state_shard_hours": 6}
+    )
+    end_time = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    start_time = end_time - timedelta(hours=12)
+    rows_by_start = {
+        start_time + timedelta(hours=6): [_row(1), _row(3)],
+        start_time: [_row(0)],
+    }
+    undated = dict(_row(9), application_start_time=None)
+
+    def run_query(client, config, *, window_slice, **kwargs):
+        assert kwargs["ordered"] is False
+        if not window_slice.dated:
+            return None, [undated]
+        shifted = []
+        for row in rows_by_start[window_slice.start]:
+            offset = timedelta(minutes=row["application_start_time"].minute)
+            shifted.append(dict(row, application_start_time=window_slice.start + offset))
+        return None, shifted
+
+    monkeypatch.setattr(run_state_repository.bigquery, "Client", mock.Mock())
+    monkeypatch.setattr(run_state_repository, "_run_run_state_query", run_query)
+
+    records = run_state_repository.fetch_run_state_records(
+        config, start_time=start_time, end_time=end_time
+    )
+
+    assert [record.application_id for record in records] == [
+        "application_3",
+        "application_1",
+        "application_0",
+        "application_9",
+    ]
+
+
+def test_byte_volumes_prefer_application_totals_over_summed_stages():
+    row = _row(1)
+    stages = [
+        {"stage_id": 1, "inputBytes": 3 << 30, "shuffleReadBytes": None},
+        {"stage_id": 2, "input_bytes": 1 << 30, "shuffle_read_bytes": "512"},
+    ]
+    row["spark_event_metrics"] = json.dumps({"app": {}, "stages": stages})
+    summed = SparkRunState.from_row(row)
+
+    row["spark_event_metrics"] = json.dumps({"app": {"inputBytes": 10}, "stages": stages})
+    reported = SparkRunState.from_row(row)
+
+    assert (summed.input_bytes, summed.shuffle_read_bytes) == (4 << 30, 512.0)
+    assert (reported.input_bytes, reported.shuffle_read_bytes) == (10.0, 512.0)
+    assert SparkRunState.from_row(_row(2)).input_bytes is None
+
+
+def test_an_unknown_read_mode_is_rejected():
+    from datetime import timedelta
+
+    from dataproc_monitoring_agent.config.settings import load_config
+    from dataproc_monitoring_agent.repositories import run_state_repository
+
+    config = load_config(
+        {"project_id": "demo-project", "region": "us-central1", "run_state_read_mode": "arrow"}
+    )
+    end_time = datetime(2024, 5, 2, tzinfo=timezone.utc)
+
+    with pytest.raises(ValueError, match="Unknown run state read mode 'arrow'"):
+        run_state_repository.fetch_run_state_batch(
+            config, start_time=end_time - timedelta(hours=1), end_time=end_time
+        )
+
+
+def test_missing_storage_extras_fall_back_with_one_warning(monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setattr(run_state_repository, "_warned_missing_read_client", False)
+
+    with caplog.at_level(logging.WARNING):
+        assert run_state_repository._create_read_client() is None
+        assert run_state_repository._create_read_client() is None
+
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert "paging run state through REST" in caplog.records[0].getMessage()
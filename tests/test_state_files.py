@@ -0,0 +1,29 @@
+import pytest
+
+from dataproc_monitoring_agent.repositories.state_files import replace_atomically
+
+
+def test_writers_get_their_own_temp_file_and_failures_leave_the_target(tmp_path):
+    path = tmp_path / "state" / "watermark.json"
+    temp_paths = []
+
+    def write(text):
+        def writer(temp_path):
+            temp_paths.append(temp_path)
+            temp_path.write_text(text, encoding="utf-8")
+
+        return writer
+
+    replace_atomically(path, write("first"))
+    replace_atomically(path, write("second"))
+
+    def torn(temp_path):
+        temp_path.write_text("par", encoding="utf-8")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        replace_atomically(path, torn)
+
+    assert path.read_text(encoding="utf-8") == "second"
+    assert temp_paths[0] != temp_paths[1]
+    assert list(path.parent.iterdir()) == [path]
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+
+from dataproc_monitoring_agent.config.settings import load_config
+from dataproc_monitoring_agent.repositories.run_state_repository import SparkRunState
+from dataproc_monitoring_agent.repositories.watermark_repository import (
+    WatermarkTracker,
+    advance_watermark,
+    load_watermark,
+    save_watermark,
+)
+
+
+def _run(job_id: str, end: str) -> SparkRunState:
+    return SparkRunState.from_payload(
+        {
+            "spark_jobid": job_id,
+            "application_start_time": "2024-05-01T00:00:00+00:00",
+            "application_end_time": end,
+        }
+    )
+
+
+def test_watermark_round_trip_keeps_overlap_boundary(tmp_path):
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "incremental": True,
+            "incremental_overlap_minutes": 10,
+            "state_dir": str(tmp_path),
+        }
+    )
+    as_of = datetime(2024, 5, 1, 2, tzinfo=timezone.utc)
+
+    watermark = advance_watermark(
+        config,
+        None,
+        [
+            _run("load_aaaaaa01", "2024-05-01T01:00:00+00:00"),
+            _run("load_aaaaaa02", "2024-05-01T01:55:00+00:00"),
+            _run("load_aaaaaa03", "2024-05-01T01:58:00+00:00"),
+        ],
+        as_of=as_of,
+    )
+    save_watermark(config, watermark)
+    restored = load_watermark(config)
+
+    assert restored == watermark
+    assert restored.high_watermark == "2024-05-01T01:58:00+00:00"
+    assert sorted(restored.boundary_runs) == ["load_aaaaaa02", "load_aaaaaa03"]
+    assert restored.is_boundary_run(_run("load_aaaaaa02", "2024-05-01T01:55:00+00:00"))
+    assert not restored.is_boundary_run(_run("load_aaaaaa04", "2024-05-01T01:50:00+00:00"))
+    assert restored.fetch_after(config.incremental_overlap) == datetime(
+        2024, 5, 1, 1, 48, tzinfo=timezone.utc
+    )
+
+
+def test_tracker_pruning_keeps_the_final_boundary():
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "incremental": True,
+            "incremental_overlap_minutes": 10,
+        }
+    )
+    as_of = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    runs = [
+        _run(f"load_{index:08x}", (start + timedelta(seconds=index)).isoformat())
+        for index in range(10_000)
+    ]
+
+    tracker = WatermarkTracker(config, None)
+    for run in runs:
+        tracker.observe(run)
+    watermark = tracker.result(as_of=as_of)
+
+    assert len(tracker._observed) < 2 * 4096
+    assert watermark.high_watermark == runs[-1].application_end_time
+    assert len(watermark.boundary_runs) == 601
+
+
+def test_a_run_seen_in_flight_is_ingested_again_once_it_completes():
+    config = load_config(
+        {
+            "project_id": "demo-project",
+            "region": "us-central1",
+            "incremental": True,
+            "incremental_overlap_minutes": 10,
+        }
+    )
+    payload = {
+        "spark_jobid": "load_aaaaaa01",
+        "application_start_time": "2024-05-01T01:50:00+00:00",
+        "status": "RUNNING",
+    }
+    running = SparkRunState.from_payload(payload)
+    done = SparkRunState.from_payload(
+        {**payload, "status": "SUCCEEDED", "application_end_time": "2024-05-01T01:56:00+00:00"}
+    )
+
+    first = advance_watermark(
+        config, None, [running], as_of=datetime(2024, 5, 1, 1, 55, tzinfo=timezone.utc)
+    )
+    assert first.boundary_runs == {}
+    assert not first.is_boundary_run(done)
+
+    second = advance_watermark(
+        config, first, [done], as_of=datetime(2024, 5, 1, 2, tzinfo=timezone.utc)
+    )
+    assert second.is_boundary_run(done)
+    # A boundary recorded from an earlier snapshot does not hide a later one.
+    rerun = SparkRunState.from_payload(
+        {**payload, "status": "FAILED", "application_end_time": "2024-05-01T01:58:00+00:00"}
+    )
+    assert not second.is_boundary_run(rerun)